@@ -0,0 +1,162 @@
+"""
+Audio stream planning.
+
+Decides, per input audio track, whether it is kept, copied as-is or re-encoded to AAC, and how many
+bits the kept tracks will use. The compression engine subtracts that exact audio budget from the
+target size before computing the video bitrate.
+"""
+from dataclasses import dataclass
+
+COPY = "copy"
+ENCODE = "encode"
+
+# Codecs that can be stream-copied into each container
+COPY_AUDIO_CODECS = {
+    "mp4": {"aac", "mp3", "ac3", "eac3", "alac"},
+    "mkv": {"aac", "mp3", "ac3", "eac3", "alac", "opus", "vorbis", "flac", "dts", "truehd"},
+}
+# Copied tracks above this rate are re-encoded instead, they would eat the video budget
+DEFAULT_COPY_MAX_KBPS = 384
+
+# ISO 639-1 code and ISO 639-2 code(s) of every ISO 639-1 language, bibliographic/terminologic when they differ
+_ISO_639 = """
+aa aar, ab abk, ae ave, af afr, ak aka, am amh, an arg, ar ara, as asm, av ava, ay aym, az aze,
+ba bak, be bel, bg bul, bh bih, bi bis, bm bam, bn ben, bo tib/bod, br bre, bs bos, ca cat, ce che,
+ch cha, co cos, cr cre, cs cze/ces, cu chu, cv chv, cy wel/cym, da dan, de ger/deu, dv div, dz dzo,
+ee ewe, el gre/ell, en eng, eo epo, es spa, et est, eu baq/eus, fa per/fas, ff ful, fi fin, fj fij,
+fo fao, fr fre/fra, fy fry, ga gle, gd gla, gl glg, gn grn, gu guj, gv glv, ha hau, he heb, hi hin,
+ho hmo, hr hrv, ht hat, hu hun, hy arm/hye, hz her, ia ina, id ind, ie ile, ig ibo, ii iii, ik ipk,
+io ido, is ice/isl, it ita, iu iku, ja jpn, jv jav, ka geo/kat, kg kon, ki kik, kj kua, kk kaz, kl kal,
+km khm, kn kan, ko kor, kr kau, ks kas, ku kur, kv kom, kw cor, ky kir, la lat, lb ltz, lg lug, li lim,
+ln lin, lo lao, lt lit, lu lub, lv lav, mg mlg, mh mah, mi mao/mri, mk mac/mkd, ml mal, mn mon, mr mar,
+ms may/msa, mt mlt, my bur/mya, na nau, nb nob, nd nde, ne nep, ng ndo, nl dut/nld, nn nno, no nor,
+nr nbl, nv nav, ny nya, oc oci, oj oji, om orm, or ori, os oss, pa pan, pi pli, pl pol, ps pus, pt por,
+qu que, rm roh, rn run, ro rum/ron, ru rus, rw kin, sa san, sc srd, sd snd, se sme, sg sag, si sin,
+sk slo/slk, sl slv, sm smo, sn sna, so som, sq alb/sqi, sr srp, ss ssw, st sot, su sun, sv swe, sw swa,
+ta tam, te tel, tg tgk, th tha, ti tir, tk tuk, tl tgl, tn tsn, to ton, tr tur, ts tso, tt tat, tw twi,
+ty tah, ug uig, uk ukr, ur urd, uz uzb, ve ven, vi vie, vo vol, wa wln, wo wol, xh xho, yi yid, yo yor,
+za zha, zh chi/zho, zu zul
+"""
+
+
+def _language_codes():
+    """
+    Returns:
+        dict: Any code of a language -> frozenset of every code of that language.
+    """
+    codes = {}
+    for entry in _ISO_639.split(","):
+        alpha2, alpha3 = entry.split()
+        same = frozenset([alpha2] + alpha3.split("/"))
+        for code in same:
+            codes[code] = same
+    return codes
+
+
+_LANGUAGE_CODES = _language_codes()
+
+
+@dataclass
+class AudioTrackPlan:
+    """
+    What happens to one input audio track.
+    """
+    stream_index: int   # index of the stream in the input file
+    codec_name: str
+    language: str
+    action: str         # COPY or ENCODE
+    bitrate: int        # bps this track will use in the output
+
+    @property
+    def bitrate_kbps(self):
+        return int(self.bitrate / 1000)
+
+
+def language_matches(track_language, wanted):
+    """
+    Compare a track language tag (usually ISO 639-2, e.g. 'eng') with a user code ('en', 'eng', 'fre'...).
+    Codes are compared exactly after mapping ISO 639-1 and both ISO 639-2 forms to each other, so 'es'
+    matches 'spa' but not 'est'.
+    Args:
+        track_language (str): Language tag from the stream (may be None).
+        wanted (str): Language requested by the user.
+    Returns:
+        bool: True if both designate the same language.
+    """
+    if not track_language or not wanted:
+        return False
+    track_language = track_language.lower()
+    wanted = wanted.lower().split("-")[0]
+    return track_language in _LANGUAGE_CODES.get(wanted, (wanted,))
+
+
+def default_encode_bitrate(channels):
+    """
+    AAC bitrate for a track: 64 kbps per channel, between 96 and 384 kbps.
+    Args:
+        channels (int): Channel count (None if unknown, treated as stereo).
+    Returns:
+        int: Bitrate in bps.
+    """
+    return min(384, max(96, 64 * (channels or 2))) * 1000
+
+
+def plan_audio(media, ext, languages=None, bitrate_kbps=None, allow_copy=True, copy_max_kbps=DEFAULT_COPY_MAX_KBPS):
+    """
+    Plan every audio track of a file.
+    Args:
+        media (MediaInfo): Probed input.
+        ext (str): Output container ('mp4' or 'mkv').
+        languages (list): Keep only tracks in these languages (None keeps all tracks).
+        bitrate_kbps (int): AAC bitrate for re-encoded tracks (default: based on channel count).
+        allow_copy (bool): Allow copying compatible tracks.
+        copy_max_kbps (int): Copied tracks must not exceed this bitrate.
+    Returns:
+        tuple: (list of AudioTrackPlan, list of warning strings)
+    """
+    warnings = []
+    tracks = media.audio_streams
+    if languages:
+        selected = [t for t in tracks if any(language_matches(t.language, lang) for lang in languages)]
+        if tracks and not selected:
+            warnings.append(f"No audio track matches {', '.join(languages)}, keeping the first track.")
+            selected = tracks[:1]
+        tracks = selected
+
+    plans = []
+    for track in tracks:
+        compatible = track.codec_name in COPY_AUDIO_CODECS.get(ext, ())
+        if allow_copy and compatible and track.bit_rate and track.bit_rate <= copy_max_kbps * 1000:
+            plans.append(AudioTrackPlan(track.index, track.codec_name, track.language, COPY, track.bit_rate))
+            continue
+        rate = bitrate_kbps * 1000 if bitrate_kbps else default_encode_bitrate(track.channels)
+        plans.append(AudioTrackPlan(track.index, track.codec_name, track.language, ENCODE, rate))
+    return plans, warnings
+
+
+def audio_bitrate_total(plans):
+    """
+    Returns:
+        int: Combined bitrate (bps) of all planned audio tracks.
+    """
+    return sum(p.bitrate for p in plans)
+
+
+def audio_ffmpeg_args(plans, input_index=0):
+    """
+    Build the -map and per-output-stream codec arguments for the planned tracks.
+    Args:
+        plans (list): AudioTrackPlan list, in output order.
+        input_index (int): ffmpeg input number of the source file.
+    Returns:
+        list: ffmpeg arguments.
+    """
+    args = []
+    for plan in plans:
+        args += ["-map", f"{input_index}:{plan.stream_index}"]
+    for i, plan in enumerate(plans):
+        if plan.action == COPY:
+            args += [f"-c:a:{i}", "copy"]
+        else:
+            args += [f"-c:a:{i}", "aac", f"-b:a:{i}", f"{plan.bitrate_kbps}k"]
+    return args
@@ -0,0 +1,337 @@
+"""
+Reproducible benchmarks for the compression and subtitle translation paths.
+
+Inputs are generated locally and cached in the work folder: videos come from ffmpeg's lavfi sources
+(testsrc2 for the picture, sine tones for the audio, in several lengths, resolutions and channel
+layouts), subtitle files are synthetic SRT with a share of repeated lines. The suite then times:
+    compression   one `engine.CompressionJob` per input, with the engine's per-stage timings
+                  (probe, encode, and mux for segmented encodes) and the end-to-end wall time
+    concurrency   the whole input set through `videocompress.run_batch` at several --jobs levels
+    translation   `subtitle_stream.translate_subtitles` through the shared engine against the offline
+                  `LocalBackend` (with simulated latency), with a cold and a warm translation memory
+    imports       the import time of the entry points and engine modules (`python -X importtime`) and
+                  the modules each of them should not load but did
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --output new.json --compare bench.json
+
+Results are written as JSON with the machine, ffmpeg and git revision they were measured on; --compare
+prints the wall time ratio of every case against an earlier result file. The import time budget itself
+is enforced by tests/test_imports.py.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Synthetic video inputs: name -> (duration s, size, frame rate, audio layout or None)
+VIDEO_INPUTS = {
+    "short_360p_stereo": (10, "640x360", 25, "stereo"),
+    "medium_720p_stereo": (60, "1280x720", 30, "stereo"),
+    "medium_720p_5.1": (60, "1280x720", 24, "5.1"),
+    "short_1080p_mono": (20, "1920x1080", 30, "mono"),
+    "short_480p_silent": (15, "854x480", 25, None),
+    "long_720p_stereo": (300, "1280x720", 24, "stereo"),
+    "long_360p_stereo": (150, "640x360", 25, "stereo"),
+}
+QUICK_VIDEO_INPUTS = ("short_360p_stereo", "short_480p_silent")
+# Inputs of the two-segment encode, long enough to be split (segments.MIN_SEGMENT_SECONDS each)
+SEGMENTED_VIDEO_INPUT = "long_720p_stereo"
+QUICK_SEGMENTED_VIDEO_INPUT = "long_360p_stereo"
+# Synthetic subtitle inputs: name -> (cue count, share of repeated lines)
+SRT_INPUTS = {
+    "episode": (800, 0.3),
+    "feature": (2000, 0.2),
+    "marathon": (20000, 0.5),
+}
+QUICK_SRT_INPUTS = ("episode",)
+# Modules whose import is checked: name -> modules it must not pull in at import time
+_GUI_AND_TRANSLATION = ("tkinter", "colorama", "asyncio", "requests", "deep_translator")
+IMPORT_CHECKS = {
+    "engine": _GUI_AND_TRANSLATION,
+    "scheduler": _GUI_AND_TRANSLATION,
+    "distributed": _GUI_AND_TRANSLATION,
+    "videocompress": ("tkinter", "asyncio", "requests", "deep_translator", "engine"),
+    "main": ("colorama", "asyncio", "requests", "deep_translator", "engine"),
+    "gui_film": ("asyncio", "requests", "deep_translator", "engine"),
+    "gui_subtitle": ("asyncio", "requests", "deep_translator", "sqlite3", "engine"),
+}
+TARGET_RATIO = 0.5  # target size as a share of the input size, so every run really encodes
+
+
+def make_video(work_dir, name):
+    """
+    Generate a synthetic video input with ffmpeg's lavfi sources (cached by name).
+    Returns:
+        str: Path to the .mp4 file.
+    """
+    duration, size, rate, layout = VIDEO_INPUTS[name]
+    path = os.path.join(work_dir, f"{name}.mp4")
+    if os.path.exists(path):
+        return path
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+           "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={rate}:duration={duration}"]
+    if layout:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={duration}",
+                "-af", f"aformat=channel_layouts={layout}", "-c:a", "aac", "-b:a", "128k"]
+    cmd += ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path]
+    subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+    return path
+
+
+def make_srt(work_dir, name):
+    """
+    Generate a synthetic SRT file (cached by name). Repeated lines exercise deduplication and the memory.
+    Returns:
+        str: Path to the .srt file.
+    """
+    count, repeated = SRT_INPUTS[name]
+    path = os.path.join(work_dir, f"{name}.srt")
+    if os.path.exists(path):
+        return path
+    pool = max(1, int(count * (1 - repeated)))
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            start, end = i * 3, i * 3 + 2
+            line = i if i < pool else (i * 7919) % pool
+            f.write(f"{i + 1}\n{start // 3600:02d}:{start // 60 % 60:02d}:{start % 60:02d},000 --> "
+                    f"{end // 3600:02d}:{end // 60 % 60:02d}:{end % 60:02d},500\n"
+                    f"Synthetic line number {line}\nwith a second row {line % 13}\n\n")
+    return path
+
+
+def _remove_outputs(result):
+    if result and result.output_file and os.path.exists(result.output_file):
+        os.remove(result.output_file)
+
+
+def bench_compression(inputs, repeat=1, segments=None):
+    """
+    Time one compression job per input.
+    Args:
+        inputs (list): Input video paths.
+        repeat (int): Runs per input (the median wall time is reported).
+        segments (int or str): Parallel segments per job.
+    Returns:
+        list: One dict per input with wall time, stage timings and sizes.
+    """
+    from engine import CompressionJob
+    cases = []
+    for path in inputs:
+        max_size_gb = os.path.getsize(path) * TARGET_RATIO / 1024 ** 3
+        runs = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = CompressionJob(path, "none", None, "mp4", max_size_gb, allow_copy=False, segments=segments).run()
+            wall = time.perf_counter() - t0
+            runs.append((wall, result))
+            _remove_outputs(result)
+        wall, result = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+        cases.append({
+            "name": os.path.splitext(os.path.basename(path))[0] + (f"_seg{segments}" if segments else ""),
+            "wall": wall,
+            "walls": [run[0] for run in runs],
+            "stages": result.timings,
+            "success": result.success,
+            "error": result.error,
+            "mode": result.mode,
+            "input_size": os.path.getsize(path),
+            "output_size": result.output_size,
+        })
+    return cases
+
+
+def bench_concurrency(inputs, levels):
+    """
+    Time the whole input set through the batch scheduler at several concurrency levels.
+    Returns:
+        list: One dict per level with the wall time and the number of failed jobs.
+    """
+    from progress_bus import ProgressBus
+    from videocompress import STATUS_OK, build_jobs, run_batch
+    cases = []
+    for level in levels:
+        defaults = {"sub_option": "none", "sub_file": None, "ext": "mp4", "max_size_gb": None,
+                    "audio_lang": None, "audio_bitrate": None}
+        entries = [{"file": path, "max_size_gb": os.path.getsize(path) * TARGET_RATIO / 1024 ** 3} for path in inputs]
+        bus = ProgressBus()  # no subscribers: progress is not drawn while timing
+        t0 = time.perf_counter()
+        results = run_batch(build_jobs(entries, defaults), max_jobs=level, allow_copy=False, bus=bus)
+        wall = time.perf_counter() - t0
+        bus.close()
+        for result in results:
+            if result["output"] and os.path.exists(result["output"]):
+                os.remove(result["output"])
+        cases.append({"name": f"jobs_{level}", "jobs": level, "files": len(inputs), "wall": wall,
+                      "failed": sum(1 for result in results if result["status"] != STATUS_OK)})
+    return cases
+
+
+def bench_translation(inputs, latency=0.05, rate=50.0):
+    """
+    Translate each SRT input through the shared engine and the offline backend, first with an empty
+    translation memory, then again with the memory filled by the first run.
+    Args:
+        inputs (list): SRT paths.
+        latency (float): Simulated seconds per backend request.
+        rate (float): Engine requests per second.
+    Returns:
+        list: One dict per input and memory state with wall time, cue and request counts.
+    """
+    from subtitle_stream import translate_subtitles
+    from translation_backends import LocalBackend
+    from translation_engine import TranslationEngine, WindowTranslator
+    from translation_memory import TranslationMemory
+    cases = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in inputs:
+            memory = TranslationMemory(os.path.join(tmp, os.path.basename(path) + ".sqlite3"))
+            for state in ("cold", "warm"):
+                backend = LocalBackend({"with a second row 1": "avec une seconde ligne 1"}, latency=latency)
+                engine = TranslationEngine(backend, rate=rate, burst=rate)
+                translator = WindowTranslator(engine, "en", "fr", memory)
+                output = os.path.join(tmp, "out.srt")
+                t0 = time.perf_counter()
+                cues = translate_subtitles(path, output, translator.submit, on_window=lambda *args: translator.store())
+                wall = time.perf_counter() - t0
+                engine.close()
+                cases.append({"name": f"{os.path.splitext(os.path.basename(path))[0]}_{state}", "wall": wall,
+                              "cues": cues, "from_cache": translator.from_cache, "requests": backend.calls,
+                              "cues_per_second": cues / wall if wall else None})
+            memory.close()
+    return cases
+
+
+def import_time(module, forbidden=()):
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+    Args:
+        module (str): Module to import.
+        forbidden (tuple): Modules to look for in sys.modules after the import.
+    Returns:
+        tuple: (cumulative import time in seconds, forbidden modules that were loaded, error or None)
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {tuple(forbidden)!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), stdin=subprocess.DEVNULL)
+    if out.returncode != 0:
+        return None, [], out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"
+    cumulative = None
+    for line in out.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+        fields = line.split("|")
+        if line.startswith("import time:") and len(fields) == 3 and fields[2] == " " + module:
+            cumulative = int(fields[1]) / 1e6
+    loaded = out.stdout.strip()
+    return cumulative, loaded.split(",") if loaded else [], None
+
+
+def bench_imports(checks, repeat=3):
+    """
+    Measure the import time of each module and list the forbidden modules it loaded.
+    Args:
+        checks (dict): Module -> modules it must not load.
+        repeat (int): Imports per module (the fastest is reported, the first one also warms the bytecode cache).
+    Returns:
+        list: One dict per module with the import time and the forbidden modules it loaded.
+    """
+    cases = []
+    for module, forbidden in checks.items():
+        runs = [import_time(module, forbidden) for _ in range(repeat)]
+        times = [run[0] for run in runs if run[0] is not None]
+        wall = min(times) if times else None
+        loaded, error = runs[-1][1], runs[-1][2]
+        cases.append({"name": module, "wall": wall, "forbidden_loaded": loaded, "error": error})
+    return cases
+
+
+def environment():
+    """
+    Returns:
+        dict: Machine, Python, ffmpeg and git revision the results were measured on.
+    """
+    def first_line(cmd):
+        try:
+            out = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            return out.stdout.splitlines()[0] if out.returncode == 0 and out.stdout else None
+        except OSError:
+            return None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ffmpeg": first_line(["ffmpeg", "-version"]),
+        "git": first_line(["git", "rev-parse", "--short", "HEAD"]),
+    }
+
+
+def compare(results, baseline):
+    """
+    Print the wall time of every case next to the same case in an earlier result file.
+    """
+    for section in ("compression", "concurrency", "translation", "imports"):
+        before = {case["name"]: case["wall"] for case in baseline.get(section, [])}
+        for case in results.get(section, []):
+            if case["wall"] and before.get(case["name"]):
+                ratio = case["wall"] / before[case["name"]]
+                print(f"{section:12s} {case['name']:28s} {before[case['name']]:8.2f}s -> {case['wall']:8.2f}s  x{ratio:.2f}")
+
+
+def main(argv=None):
+    """
+    Generate the inputs, run the selected benchmarks and write the JSON results.
+    Returns:
+        int: Process exit code.
+    """
+    parser = argparse.ArgumentParser(description="VideoCompress benchmarks.")
+    parser.add_argument("--output", help="Write results as JSON to this path (default: print them).")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "videocompress-bench"),
+                        help="Folder for the generated inputs (kept between runs).")
+    parser.add_argument("--quick", action="store_true", help="Small inputs only.")
+    parser.add_argument("--only", choices=("compression", "concurrency", "translation", "imports"), action="append",
+                        help="Run only these benchmarks (repeatable).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per compression case (median reported).")
+    parser.add_argument("--jobs", default="1,2,4", help="Concurrency levels, comma-separated.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated translation request latency (s).")
+    parser.add_argument("--probe-cache", action="store_true", help="Keep the probe cache enabled.")
+    args = parser.parse_args(argv)
+    if not args.probe_cache:
+        # Probing is part of what is measured
+        os.environ["VIDEOCOMPRESS_PROBE_CACHE"] = "0"
+    os.makedirs(args.work_dir, exist_ok=True)
+    only = set(args.only or ("compression", "concurrency", "translation", "imports"))
+    results = {"environment": environment()}
+    if only & {"compression", "concurrency"}:
+        names = QUICK_VIDEO_INPUTS if args.quick else list(VIDEO_INPUTS)
+        videos = [make_video(args.work_dir, name) for name in names]
+        if "compression" in only:
+            results["compression"] = bench_compression(videos, args.repeat)
+            segmented = make_video(args.work_dir, QUICK_SEGMENTED_VIDEO_INPUT if args.quick else SEGMENTED_VIDEO_INPUT)
+            results["compression"] += bench_compression([segmented], args.repeat, segments=2)
+        if "concurrency" in only:
+            results["concurrency"] = bench_concurrency(videos, [int(level) for level in args.jobs.split(",")])
+    if "translation" in only:
+        names = QUICK_SRT_INPUTS if args.quick else list(SRT_INPUTS)
+        results["translation"] = bench_translation([make_srt(args.work_dir, name) for name in names], args.latency)
+    if "imports" in only:
+        results["imports"] = bench_imports(IMPORT_CHECKS)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
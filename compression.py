@@ -1,115 +1,81 @@
 
 import os
 from colorama import Fore, Style
-from utils import ffprobe
-import subprocess
-# Import reusable GUI helpers for modern, DRY window/dialog creation
-from main import apply_modern_theme, create_styled_frame, create_styled_label
+from engine import CompressionJob, CompressionError, CompressionResult
 
-def run_compression(file_path, sub_option, sub_file, ext, max_size_gb, gui_progress=None):
+def run_compression(file_path, sub_option, sub_file, ext, max_size_gb, gui_progress=None, threads=None, segments=None,
+                    bus=None, metrics=None, on_job=None):
     """
     Compress a video file using FFmpeg, with optional subtitle handling and GUI/CLI progress bars.
+    Thin interactive wrapper around `engine.CompressionJob`.
     Args:
         file_path (str): Path to the video file.
         sub_option (str): Subtitle option ('none', 'soft', 'hard').
         sub_file (str): Path to the subtitle file (if any).
         ext (str): Output file extension ('mp4' or 'mkv').
         max_size_gb (float): Target maximum file size in GB.
+        threads (int): Number of ffmpeg encoder threads (default: let ffmpeg decide).
+        segments (int or str): Encode in this many parallel segments ('auto' for long inputs on multi-core machines).
+        bus (ProgressBus): Publish progress there instead of opening a progress window (batch mode).
+        metrics (MetricsRegistry): Record the job's stage timings, encode speed, sizes and bitrates there.
+        on_job (callable): Called with the CompressionJob before it is planned, so a batch scheduler can
+            pause or cancel it.
+    Returns:
+        bool: True if ffmpeg finished successfully.
     """
-    def ffmpeg_escape(path):
-        """
-        Escape a file path for FFmpeg compatibility (Windows).
-        Args:
-            path (str): The file path to escape.
-        Returns:
-            str: Escaped path.
-        """
-        # Use forward slashes and escape special chars for FFmpeg
-        return os.path.abspath(path).replace("\\", "/").replace(":", "\\:")
-
-    # Metadata extraction
-    duration_str = ffprobe([
-        "ffprobe", "-v", "error", "-show_entries",
-        "format=duration", "-of",
-        "default=noprint_wrappers=1:nokey=1", file_path
-    ])
+    job = CompressionJob(file_path, sub_option, sub_file, ext, max_size_gb, threads=threads, segments=segments)
+    record = metrics.compression_job(file_path) if metrics is not None else None
+    if on_job:
+        on_job(job)
     try:
-        duration = float(duration_str)
-        if duration <= 0:
-            raise ValueError
-    except Exception:
-        print(Fore.RED + f"Could not determine video duration (got '{duration_str}'). Aborting." + Style.RESET_ALL)
-        return
-
-    audio_bitrate_str = ffprobe([
-        "ffprobe", "-v", "error", "-select_streams",
-        "a:0", "-show_entries", "stream=bit_rate",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        file_path
-    ])
-    if not audio_bitrate_str or audio_bitrate_str == "N/A" or audio_bitrate_str == "0":
-        print(Fore.YELLOW + "Warning: Could not determine audio bitrate. Using default 128000 bps." + Style.RESET_ALL)
-        audio_bitrate = 128000
-    else:
-        try:
-            audio_bitrate = int(audio_bitrate_str)
-        except Exception:
-            print(Fore.YELLOW + f"Warning: Unexpected audio bitrate value '{audio_bitrate_str}'. Using default 128000 bps." + Style.RESET_ALL)
-            audio_bitrate = 128000
+        plan = job.plan()
+    except (CompressionError, OSError) as e:
+        print(Fore.RED + f"{e} Aborting." + Style.RESET_ALL)
+        if record:
+            record.finish(CompressionResult(input_file=file_path, error=str(e)))
+        return False
+    for warning in plan.warnings:
+        print(Fore.YELLOW + f"Warning: {warning}" + Style.RESET_ALL)
+    duration = plan.duration
+    video_name = os.path.basename(file_path)
+    output_file = plan.output_file
 
     print(f"Duration: {duration:.2f} s")
-    print(f"Audio Bitrate: {audio_bitrate} bps")
-
-    # Bitrate calculation
-    target_bits = max_size_gb * 1024 * 1024 * 1024 * 8  # in bits
-    audio_bits_total = audio_bitrate * duration # in bits
-    video_bits_total = target_bits - audio_bits_total # in bits
-    video_bitrate = video_bits_total / duration # in bits per second
-    video_bitrate_kbps = int(video_bitrate / 1000) # in kbps
-
-    print(f"Target Video Bitrate: {video_bitrate_kbps} kbps")
-
-    output_file = os.path.splitext(file_path)[0] + f"_compressed.{ext}"
-
-    # Build ffmpeg command
-    video_dir = os.path.dirname(file_path)
-    video_name = os.path.basename(file_path)
-    output_name = os.path.basename(output_file)
-    # For subtitles, use only the filename and set cwd to video_dir
-    if sub_option == "soft":
-        sub_filename = os.path.basename(sub_file) if sub_file else None
-        ffmpeg_cmd = [
-            "ffmpeg", "-i", video_name,
-            "-i", sub_filename,
-            "-c:s", "mov_text",
-            "-map", "0:v", "-map", "0:a", "-map", "1:s",
-            "-c:v", "libx264", "-b:v", f"{video_bitrate_kbps}k",
-            "-preset", "medium", "-c:a", "aac", "-b:a", "192k",
-            "-movflags", "+faststart",
-            output_name, "-y"
-        ]
+    video = plan.media.video
+    if video:
+        fps = f" @ {video.frame_rate:.3f} fps" if video.frame_rate else ""
+        print(f"Video: {video.codec_name} {video.width}x{video.height}{fps} ({video.pix_fmt})")
+    for track in plan.audio_tracks:
+        action = "copy" if track.action == "copy" else f"re-encode to AAC {track.bitrate_kbps}k"
+        print(f"Audio track {track.stream_index} ({track.language or 'und'}, {track.codec_name}): {action}")
+    print(f"Audio Bitrate: {plan.audio_bitrate} bps")
+    if plan.copy_video:
+        print(Fore.GREEN + f"Input already fits in {max_size_gb} GB, using fast path: {plan.mode}" + Style.RESET_ALL)
     else:
-        ffmpeg_cmd = [
-            "ffmpeg", "-i", video_name,
-            "-c:v", "libx264", "-b:v", f"{video_bitrate_kbps}k",
-            "-preset", "medium", "-c:a", "aac", "-b:a", "192k",
-            "-movflags", "+faststart"
-        ]
-        if sub_option == "hard" and sub_file:
-            sub_filename = os.path.basename(sub_file)
-            # Always use forward slashes for ffmpeg filter
-            ffmpeg_cmd += ["-vf", f"subtitles={sub_filename.replace('\\', '/')}" ]
-        ffmpeg_cmd += [output_name, "-y"]
+        print(f"Target Video Bitrate: {plan.video_bitrate_kbps} kbps")
+        print(f"Encoder: {plan.encoder.label}")
+        if plan.prediction is not None:
+            crf = f" CRF {plan.prediction.crf:g}" if plan.prediction.crf is not None else ""
+            print(f"Rate control: {plan.prediction.rate_mode}{crf}, predicted size {plan.predicted_size / 1024 ** 2:.1f} MB")
 
     print(Fore.YELLOW + f"\nRunning ffmpeg with subtitles option: {sub_option}\n\n" + Style.RESET_ALL)
-    print("\tCommand:", " ".join(ffmpeg_cmd))
+    if plan.segments:
+        print(Fore.YELLOW + f"Encoding {len(plan.segments)} segments in parallel, then joining them." + Style.RESET_ALL)
+        for cmd, _ in plan.segment_cmds:
+            print("\tSegment:", " ".join(cmd))
+    print("\tCommand:", " ".join(plan.cmd))
     print()
 
     # GUI progress bar setup (only if not in batch mode)
     import threading
-    import tkinter as tk
-    import tkinter.ttk as ttk
-    if gui_progress is None:
+    own_window = gui_progress is None and bus is None
+    if own_window:
+        # Tk is only needed here, so headless callers never import it
+        import tkinter as tk
+        import tkinter.ttk as ttk
+        # Import reusable GUI helpers for modern, DRY window/dialog creation
+        from gui_helpers import apply_modern_theme, create_styled_frame, create_styled_label, TkBridge
+        from progress_bus import ProgressBus, TerminalProgress, format_eta, subscribe_json_from_env
         # Use Toplevel if a root window exists, else Tk
         try:
             root = tk._default_root
@@ -129,37 +95,26 @@ def run_compression(file_path, sub_option, sub_file, ext, max_size_gb, gui_progr
         frame.pack(fill="both", expand=True, padx=10, pady=10)
         create_styled_label(frame, text=f"Compressing: {video_name}", style='Title.TLabel').pack(pady=(0, 8))
         progress_var = tk.DoubleVar(master=progress_win)
-        progress_bar = ttk.Progressbar(frame, variable=progress_var, maximum=duration, length=350, style='TProgressbar')
+        progress_bar = ttk.Progressbar(frame, variable=progress_var, maximum=100, length=350, style='TProgressbar')
         progress_bar.pack(pady=6)
         percent_label = create_styled_label(frame, text="0%", style='TLabel')
         percent_label.pack()
         time_label = create_styled_label(frame, text="Estimated time left: --:--", style='TLabel', font=("Segoe UI", 10, "italic"))
         time_label.pack()
 
-        def update_gui(cur_time, percent, mins, secs):
+        def update_gui(update):
             if not progress_win.winfo_exists():
                 return
             try:
-                progress_var.set(cur_time)
-                percent_label.config(text=f"{percent}%")
-                if mins is not None and secs is not None:
-                    time_label.config(text=f"Estimated time left: {mins:02d}:{secs:02d}")
-                else:
-                    time_label.config(text="Estimated time left: --:--")
-                progress_win.update_idletasks()
+                progress_var.set(update["percent"] or 0)
+                percent_label.config(text=f"{update['percent'] or 0}%")
+                time_label.config(text=f"Estimated time left: {format_eta(update['eta'])}")
             except Exception:
                 pass
 
         def finalize_gui():
             if not progress_win.winfo_exists():
                 return
-            try:
-                progress_var.set(duration)
-                percent_label.config(text="100%")
-                time_label.config(text="Estimated time left: 00:00")
-                progress_win.update_idletasks()
-            except Exception:
-                pass
             # Schedule window close after 500ms if still open
             def safe_destroy():
                 try:
@@ -173,80 +128,74 @@ def run_compression(file_path, sub_option, sub_file, ext, max_size_gb, gui_progr
             except Exception:
                 pass
 
-    import sys
+        # One throttled stream of progress feeds the window, the terminal bar and the optional JSON lines
+        bus = ProgressBus()
+        bridge = TkBridge(progress_win)
+        bus.subscribe(lambda updates: bridge.post(update_gui, updates[-1]))
+        bus.subscribe(TerminalProgress(single=True))
+        json_sink = subscribe_json_from_env(bus)
+
+        def on_close():
+            # Closing the window stops ffmpeg instead of leaving it running in the background
+            job.cancel()
+            progress_win.destroy()
+        progress_win.protocol("WM_DELETE_WINDOW", on_close)
+
     def run_ffmpeg():
         """
-        Run FFmpeg as a subprocess, parse its output for progress, and update both GUI and CLI progress bars.
+        Run the compression job and publish its progress.
         """
-        import time
-        proc = subprocess.Popen(ffmpeg_cmd, cwd=video_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-        last_time = 0
-        start_time = time.time()
-        bar_len = 40
-        while True:
-            line = proc.stderr.readline()
-            if not line:
-                if proc.poll() is not None:
-                    break
-                continue
-            if "time=" in line:
-                import re
-                match = re.search(r'time=(\d+):(\d+):(\d+\.\d+)', line)
-                if match:
-                    h, m, s = match.groups()
-                    cur_time = int(h) * 3600 + int(m) * 60 + float(s)
-                    last_time = cur_time
-                    percent = min(100, int(cur_time / duration * 100))
-                    elapsed = time.time() - start_time
-                    if cur_time > 0 and percent < 100:
-                        est_total = elapsed / (cur_time / duration)
-                        remaining = est_total - elapsed
-                        mins, secs = divmod(int(remaining), 60)
-                    else:
-                        mins, secs = None, None
-                    if gui_progress:
-                        gui_progress(percent, mins, secs)
-                    else:
-                        progress_win.after(0, update_gui, cur_time, percent, mins, secs)
-                        # CMD progress bar
-                        filled_len = int(round(bar_len * cur_time / float(duration)))
-                        bar = '=' * filled_len + '-' * (bar_len - filled_len)
-                        sys.stdout.write(f'\rCompressing: [{bar}] {percent}% | ETA: {mins if mins is not None else 0:02d}:{secs if secs is not None else 0:02d}')
-                        sys.stdout.flush()
-        proc.wait()
+        def on_progress(event):
+            if record:
+                record.observe(event)
+            if gui_progress:
+                gui_progress(event.percent, *event.eta)
+            else:
+                bus.publish(file_path, kind="compress", state="running", percent=event.percent,
+                            eta=event.remaining, speed=event.speed)
+        job.on_progress = on_progress
+        result = job.run()
+        if record:
+            record.finish(result, plan)
         # Always set to 100% at the end
         if gui_progress:
             try:
                 gui_progress(100, 0, 0)
             except Exception:
                 pass
-        else:
-            progress_win.after(0, finalize_gui)
-            # Force CMD progress bar to 100%
-            bar_len = 40
-            bar = '=' * bar_len
-            sys.stdout.write(f'\rCompressing: [{bar}] 100% | ETA: 00:00\n')
-            sys.stdout.flush()
-        if proc.returncode == 0:
+        elif own_window:
+            if result.success:
+                bus.publish(file_path, state="done", percent=100, eta=0)
+            else:
+                bus.publish(file_path, state="failed")
+            bus.close()
+            if json_sink:
+                json_sink.close()
+        if result.success:
             print(Fore.GREEN + f"\n✅ Compression finished. Output: {output_file}" + Style.RESET_ALL)
+            if result.predicted_size:
+                error = (result.output_size - result.predicted_size) / result.predicted_size * 100
+                print(f"Size: {result.output_size / 1024 ** 2:.1f} MB (predicted {result.predicted_size / 1024 ** 2:.1f} MB, {error:+.1f}%)")
         else:
-            print(Fore.RED + f"\n❌ Compression failed." + Style.RESET_ALL)
+            print(Fore.RED + f"\n❌ Compression failed ({result.error})." + Style.RESET_ALL)
+            if result.log:
+                print(Style.DIM + result.log + Style.RESET_ALL)
+        return result.success
 
-    if gui_progress is None:
+    if own_window:
         # Use a flag to signal when done
         done_flag = threading.Event()
+        success = [False]
         def run_ffmpeg_and_finalize():
-            run_ffmpeg()
+            success[0] = run_ffmpeg()
             # Finalize GUI from main thread, only if window still exists
-            try:
-                if progress_win.winfo_exists():
-                    progress_win.after(0, finalize_gui)
-            except Exception:
-                pass
+            bridge.post(finalize_gui)
             done_flag.set()
         thread = threading.Thread(target=run_ffmpeg_and_finalize)
         thread.start()
         progress_win.mainloop()
         thread.join()  # Wait for compression to finish before returning
+        bridge.close()
+        return success[0]
     else:
-        run_ffmpeg()
+        return run_ffmpeg()
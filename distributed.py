@@ -0,0 +1,400 @@
+"""
+Distributed encoding: one coordinator holds the batch, workers on other hosts pull jobs over HTTP.
+
+The protocol is plain JSON over HTTP (standard library only):
+    POST /claim                 {"worker": name}              -> 200 job spec, 202 {"retry_after"} while
+                                                                 jobs are leased, or 204 once all are finished
+    POST /jobs/<id>/progress    {"worker", "percent", "eta", "fps", "speed"}
+    POST /jobs/<id>/result      {"worker", "success", "output", "error", ...}
+    GET  /status                                              -> state of every job
+Progress posts double as heartbeats: a job whose worker stays silent for `lease_timeout` seconds is
+queued again (up to `max_attempts` times). Workers read inputs from and write outputs to a shared
+path; `path_map` translates prefixes when the share is mounted differently on each host. Each job is
+run with `engine.CompressionJob`, so a worker can still split it into local parallel segments.
+
+Try it on one machine:
+    python -m videocompress coordinator movie1.mkv movie2.mkv --max-size 2 --bind 127.0.0.1:8765
+    python -m videocompress worker http://127.0.0.1:8765      (in two or more other terminals)
+"""
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scheduler import DONE, FAILED, QUEUED, RUNNING, JobScheduler
+
+TOKEN_HEADER = "X-VideoCompress-Token"
+
+
+class Coordinator:
+    """
+    HTTP server that hands out batch jobs to workers and collects their progress and results.
+    """
+
+    def __init__(self, jobs, host="127.0.0.1", port=8765, token=None, lease_timeout=120, max_attempts=3, on_state=None,
+                 bus=None):
+        """
+        Args:
+            jobs (list): Job specs (dicts with file, sub_option, sub_file, ext, max_size_gb, ...).
+            host (str): Address to bind.
+            port (int): Port to bind (0 picks a free port).
+            token (str): Shared secret workers must send (None disables the check).
+            lease_timeout (float): Seconds without a heartbeat before a job is given to another worker.
+            max_attempts (int): How many times a job may be handed out.
+            on_state (callable): Called as on_state(job_id, state) on every state change.
+            bus (ProgressBus): Publish job states and the progress reported by workers there.
+        """
+        self.jobs = [{
+            "id": i, "spec": spec, "state": QUEUED, "worker": None, "attempts": 0,
+            "progress": None, "result": None, "last_seen": None,
+        } for i, spec in enumerate(jobs)]
+        self.bus = bus
+        self.token = token
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.on_state = on_state
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """
+        Returns:
+            str: Base URL workers should connect to.
+        """
+        host, port = self._server.server_address[:2]
+        if host in ("0.0.0.0", ""):
+            host = socket.gethostname()
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Serve requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        if not self.jobs:
+            self._finished.set()
+        return self
+
+    def stop(self, grace=0.0):
+        """
+        Shut the server down.
+        Args:
+            grace (float): Seconds to keep answering first, so workers that just reported their last
+                result are told the batch is drained instead of finding the port closed.
+        """
+        if grace:
+            time.sleep(grace)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def wait(self, poll_interval=1.0):
+        """
+        Block until every job is done or failed, re-queueing jobs whose worker went silent.
+        Returns:
+            list: Final job records.
+        """
+        while not self._finished.wait(poll_interval):
+            self._expire_leases()
+        return self.jobs
+
+    def _set_state(self, job, state):
+        job["state"] = state
+        if self.bus:
+            self.bus.publish(job["spec"]["file"], kind="compress", state=state, worker=job["worker"],
+                             percent=100 if state == DONE else None)
+        if self.on_state:
+            try:
+                self.on_state(job["id"], state)
+            except Exception:
+                pass
+        if all(j["state"] in (DONE, FAILED) for j in self.jobs):
+            self._finished.set()
+
+    def _expire_leases(self):
+        now = time.time()
+        with self._lock:
+            for job in self.jobs:
+                if job["state"] != RUNNING or now - job["last_seen"] < self.lease_timeout:
+                    continue
+                if job["attempts"] >= self.max_attempts:
+                    job["result"] = {"success": False, "error": f"worker {job['worker']} stopped responding"}
+                    self._set_state(job, FAILED)
+                else:
+                    job["worker"] = None
+                    self._set_state(job, QUEUED)
+
+    def claim(self, worker):
+        """
+        Hand the next queued job to a worker.
+        Returns:
+            dict: {"id", "spec"} or None if nothing is queued right now.
+        """
+        self._expire_leases()
+        with self._lock:
+            for job in self.jobs:
+                if job["state"] == QUEUED:
+                    job["worker"] = worker
+                    job["attempts"] += 1
+                    job["last_seen"] = time.time()
+                    self._set_state(job, RUNNING)
+                    return {"id": job["id"], "spec": job["spec"]}
+        return None
+
+    def drained(self):
+        """
+        Returns:
+            bool: True once every job is done or failed. Until then a leased job may still be queued
+                again, so idle workers are asked to retry instead of exiting.
+        """
+        with self._lock:
+            return all(job["state"] in (DONE, FAILED) for job in self.jobs)
+
+    def retry_after(self):
+        """
+        Returns:
+            float: Seconds an idle worker should wait before claiming again while jobs are leased.
+        """
+        return min(5.0, self.lease_timeout / 4)
+
+    def report_progress(self, job_id, payload):
+        with self._lock:
+            job = self.jobs[job_id]
+            if job["state"] != RUNNING or job["worker"] != payload.get("worker"):
+                return False
+            job["last_seen"] = time.time()
+            job["progress"] = payload
+        if self.bus and payload.get("percent") is not None:
+            mins, secs = payload.get("eta") or [None, None]
+            self.bus.publish(job["spec"]["file"], percent=payload["percent"], speed=payload.get("speed"),
+                             eta=mins * 60 + secs if mins is not None and secs is not None else None)
+        return True
+
+    def report_result(self, job_id, payload):
+        with self._lock:
+            job = self.jobs[job_id]
+            if job["state"] != RUNNING or job["worker"] != payload.get("worker"):
+                return False
+            job["result"] = payload
+            self._set_state(job, DONE if payload.get("success") else FAILED)
+        return True
+
+    def status(self):
+        with self._lock:
+            return [dict({k: job[k] for k in ("id", "state", "worker", "attempts", "progress", "result")}, file=job["spec"].get("file"))
+                    for job in self.jobs]
+
+    def _make_handler(self):
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # keep the terminal for progress output
+
+            def _reply(self, code, payload=None):
+                body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _authorized(self):
+                if coordinator.token and self.headers.get(TOKEN_HEADER) != coordinator.token:
+                    self._reply(403, {"error": "invalid token"})
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._authorized():
+                    return
+                if self.path == "/status":
+                    self._reply(200, coordinator.status())
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if not self._authorized():
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._reply(400, {"error": "invalid JSON"})
+                    return
+                parts = self.path.strip("/").split("/")
+                if parts == ["claim"]:
+                    job = coordinator.claim(payload.get("worker"))
+                    if job:
+                        self._reply(200, job)
+                    elif coordinator.drained():
+                        self._reply(204)
+                    else:
+                        # Leases may still expire and put jobs back in the queue
+                        self._reply(202, {"retry_after": coordinator.retry_after()})
+                elif len(parts) == 3 and parts[0] == "jobs" and parts[1].isdigit() and int(parts[1]) < len(coordinator.jobs):
+                    job_id = int(parts[1])
+                    if parts[2] == "progress":
+                        ok = coordinator.report_progress(job_id, payload)
+                    elif parts[2] == "result":
+                        ok = coordinator.report_result(job_id, payload)
+                    else:
+                        self._reply(404, {"error": "not found"})
+                        return
+                    if ok:
+                        self._reply(200, {"ok": True})
+                    else:
+                        # Tells a worker its lease was lost and the job belongs to someone else now
+                        self._reply(409, {"error": "job not leased to this worker"})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+        return Handler
+
+
+def map_path(path, path_map, reverse=False):
+    """
+    Translate a shared path between the coordinator's and the worker's mount points.
+    Args:
+        path (str): Path to translate (None is returned unchanged).
+        path_map (list): (coordinator prefix, worker prefix) pairs.
+        reverse (bool): Translate from the worker's view back to the coordinator's.
+    Returns:
+        str: Translated path.
+    """
+    if not path:
+        return path
+    for remote, local in path_map or []:
+        src, dst = (local, remote) if reverse else (remote, local)
+        if path.startswith(src):
+            return dst + path[len(src):]
+    return path
+
+
+class Worker:
+    """
+    Pull jobs from a coordinator and compress them locally.
+    """
+
+    def __init__(self, url, token=None, name=None, concurrency=1, total_threads=None, path_map=None,
+                 heartbeat=2.0, wait_for_jobs=False, poll_interval=5.0):
+        """
+        Args:
+            url (str): Coordinator base URL.
+            token (str): Shared secret expected by the coordinator.
+            name (str): Worker name reported to the coordinator (default: host name + random suffix).
+            concurrency (int): Number of jobs run at once on this worker.
+            total_threads (int): ffmpeg thread budget shared by the concurrent jobs.
+            path_map (list): (coordinator prefix, worker prefix) pairs for the shared storage.
+            heartbeat (float): Seconds between two progress posts.
+            wait_for_jobs (bool): Keep polling after the batch is drained instead of exiting.
+            poll_interval (float): Seconds between two claims when waiting for jobs.
+        """
+        self.url = url.rstrip("/")
+        self.token = token
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        self.threads = JobScheduler(max_jobs=self.concurrency, total_threads=total_threads).threads_per_job(self.concurrency)
+        self.path_map = path_map
+        self.heartbeat = heartbeat
+        self.wait_for_jobs = wait_for_jobs
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def _request(self, path, payload):
+        data = json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=data, method="POST",
+                                         headers={"Content-Type": "application/json"})
+        if self.token:
+            request.add_header(TOKEN_HEADER, self.token)
+        with urllib.request.urlopen(request, timeout=30) as response:
+            body = response.read()
+            return response.status, (json.loads(body) if body else None)
+
+    def _run_job(self, job):
+        from engine import CompressionJob
+        spec = job["spec"]
+        latest = {}
+        handle = CompressionJob(
+            map_path(spec["file"], self.path_map), spec.get("sub_option") or "none",
+            map_path(spec.get("sub_file"), self.path_map), spec.get("ext") or "mp4", float(spec["max_size_gb"]),
+            threads=self.threads, on_progress=lambda event: latest.update(event=event),
+            allow_copy=spec.get("allow_copy", True), audio_languages=spec.get("audio_lang"),
+            audio_bitrate_kbps=spec.get("audio_bitrate"), segments=spec.get("segments"),
+        ).start()
+        path = f"/jobs/{job['id']}"
+        while not handle.done():
+            event = latest.get("event")
+            payload = {"worker": self.name}
+            if event is not None:
+                payload.update(percent=event.percent, eta=list(event.eta), fps=event.fps, speed=event.speed)
+            try:
+                status, _ = self._request(path + "/progress", payload)
+            except urllib.error.HTTPError as e:
+                if e.code == 409:
+                    # Lease lost (we were too slow to report), someone else owns the job now
+                    handle.cancel()
+                    handle.wait()
+                    return False
+            except OSError:
+                pass  # coordinator briefly unreachable, keep encoding
+            handle.wait(self.heartbeat)
+        result = handle.result
+        try:
+            self._request(path + "/result", {
+                "worker": self.name, "success": result.success, "error": result.error, "mode": result.mode,
+                "output": map_path(result.output_file, self.path_map, reverse=True),
+                "output_size": result.output_size, "timings": result.timings, "log": result.log,
+            })
+        except OSError as e:
+            print(f"[{self.name}] Could not report result of job {job['id']}: {e}")
+        return result.success
+
+    def _loop(self):
+        while True:
+            try:
+                status, job = self._request("/claim", {"worker": self.name})
+            except OSError as e:
+                print(f"[{self.name}] Coordinator unreachable: {e}")
+                if not self.wait_for_jobs:
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            if status == 202:
+                # Nothing queued, but jobs leased to other workers may come back if they die
+                time.sleep((job or {}).get("retry_after", self.poll_interval))
+                continue
+            if status == 204 or not job:
+                if not self.wait_for_jobs:
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            print(f"[{self.name}] Job {job['id']}: {job['spec'].get('file')}")
+            ok = self._run_job(job)
+            with self._lock:
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def run(self):
+        """
+        Claim and run jobs until the coordinator has none left (or forever with wait_for_jobs).
+        Returns:
+            tuple: (completed, failed) job counts.
+        """
+        threads = [threading.Thread(target=self._loop, daemon=True) for _ in range(self.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.completed, self.failed
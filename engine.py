@@ -0,0 +1,750 @@
+"""
+UI-free compression engine.
+
+`CompressionJob` owns the whole lifecycle of one compression: probing, planning the ffmpeg command,
+running it, reporting progress and returning a `CompressionResult`. It never imports tkinter or
+colorama, so it can be embedded in worker processes; the GUI (`compression.run_compression`) and the
+CLI (`videocompress.py`) are thin consumers of it.
+
+Example:
+    job = CompressionJob("movie.mkv", "none", None, "mp4", 2.0)
+    plan = job.plan()
+    job.start()
+    for event in job.events():
+        print(event.percent)
+    result = job.wait()
+
+A running job can be paused (`pause()` suspends its ffmpeg processes, `unpause()` continues them) and
+cancelled (`cancel()` terminates ffmpeg and removes the partial output).
+"""
+import json
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import queue
+from dataclasses import dataclass, field
+from audio_planner import COPY, audio_bitrate_total, audio_ffmpeg_args, plan_audio
+from ffmpeg_progress import PROGRESS_ARGS, StderrRing, read_progress
+from probe_cache import cached_probe_media
+from scheduler import physical_core_count
+from tuner import DEFAULT_ENCODER
+from segments import auto_segment_count, plan_segments, segment_cmd, subtitle_filter_for_segment, write_concat_list
+
+# Encode paths chosen by the planner
+MODE_REMUX = "remux"
+MODE_AUDIO_ONLY = "audio-only re-encode"
+MODE_FULL = "full encode"
+
+# Video codecs that can be stream-copied into each container
+COPY_VIDEO_CODECS = {
+    "mp4": {"h264", "hevc", "av1"},
+    "mkv": {"h264", "hevc", "av1", "vp9", "vp8", "mpeg4"},
+}
+
+
+CANCEL_GRACE = 10  # seconds ffmpeg gets to exit after SIGTERM before it is killed
+
+
+def _suspend_process(proc):
+    if os.name == "nt":
+        try:
+            import psutil
+        except ImportError:
+            raise CompressionError("Pausing ffmpeg on Windows requires the psutil package.")
+        psutil.Process(proc.pid).suspend()
+    else:
+        proc.send_signal(signal.SIGSTOP)
+
+
+def _resume_process(proc):
+    if os.name == "nt":
+        import psutil
+        psutil.Process(proc.pid).resume()
+    else:
+        proc.send_signal(signal.SIGCONT)
+
+
+def partial_path(path):
+    """
+    Temporary name an output is written under until it is complete, e.g. 'dir/.movie_compressed.partial.mp4'.
+    It is in the same folder so the final rename is atomic, and keeps the extension so ffmpeg picks the muxer.
+    """
+    folder, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.partial{ext}")
+
+
+def _replace_if_ok(returncode, partial, final):
+    # Publish a finished file atomically, or drop what ffmpeg left behind
+    if returncode == 0 and os.path.exists(partial):
+        os.replace(partial, final)
+    elif os.path.exists(partial):
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+
+
+class CompressionError(Exception):
+    """
+    Raised when a compression job cannot be planned (e.g. unreadable input).
+    """
+
+
+@dataclass
+class CompressionPlan:
+    """
+    Everything decided before ffmpeg starts.
+    """
+    media: object
+    duration: float
+    audio_bitrate: int  # combined bps of all kept audio tracks
+    video_bitrate_kbps: int
+    output_file: str
+    cmd: list
+    cwd: str
+    mode: str = MODE_FULL
+    copy_video: bool = False
+    copy_audio: bool = False
+    audio_tracks: list = field(default_factory=list)  # AudioTrackPlan per kept track
+    segments: list = field(default_factory=list)      # (start, end) per parallel segment, empty if not segmented
+    segment_cmds: list = field(default_factory=list)  # (command, segment file) per segment
+    work_dir: str = None                              # temporary folder for segments
+    concat_list: str = None
+    warnings: list = field(default_factory=list)
+    partial_file: str = None  # ffmpeg writes here, renamed to output_file once it succeeded
+    encoder: object = None    # EncoderSetting used for the video
+    tuning: object = None     # TuneResult when the encoder was picked by the tuner
+    prediction: object = None # SizePrediction when the rate control was picked from samples
+    predicted_size: int = None  # bytes the output should take (video + audio)
+
+
+@dataclass
+class ProgressEvent:
+    """
+    One progress update, in seconds of encoded media.
+    """
+    cur_time: float
+    duration: float
+    percent: int
+    elapsed: float
+    remaining: float = None
+    fps: float = None
+    speed: float = None
+    total_size: int = None
+    bitrate: float = None
+
+    @property
+    def eta(self):
+        """
+        Returns:
+            tuple: (mins, secs) left, or (None, None) if unknown.
+        """
+        if self.remaining is None:
+            return None, None
+        return divmod(int(self.remaining), 60)
+
+
+@dataclass
+class CompressionResult:
+    """
+    Outcome of a finished (or failed/cancelled) job.
+    """
+    input_file: str
+    output_file: str = None
+    success: bool = False
+    cancelled: bool = False
+    mode: str = None
+    returncode: int = None
+    output_size: int = 0
+    timings: dict = field(default_factory=dict)
+    error: str = None
+    log: str = None  # tail of ffmpeg's stderr when the job failed
+    predicted_size: int = None  # bytes the planner expected, to compare with output_size
+
+
+class CompressionJob:
+    """
+    Handle for compressing one video file.
+    """
+
+    def __init__(self, file_path, sub_option, sub_file, ext, max_size_gb, threads=None, on_progress=None, progress_interval=0.25,
+                 allow_copy=True, audio_languages=None, audio_bitrate_kbps=None, segments=None, resume=False,
+                 encoder=None, tuner=None, predictor=None):
+        """
+        Args:
+            file_path (str): Path to the video file.
+            sub_option (str): Subtitle option ('none', 'soft', 'hard').
+            sub_file (str): Path to the subtitle file (if any).
+            ext (str): Output file extension ('mp4' or 'mkv').
+            max_size_gb (float): Target maximum file size in GB.
+            threads (int): Number of ffmpeg encoder threads (default: let ffmpeg decide).
+            on_progress (callable): Called with a ProgressEvent from the worker thread.
+            progress_interval (float): Minimum number of seconds between two progress events.
+            allow_copy (bool): Let the planner stream-copy video/audio that already meets the target.
+            audio_languages (list): Keep only audio tracks in these languages (default: keep all tracks).
+            audio_bitrate_kbps (int): AAC bitrate for re-encoded audio tracks (default: based on channel count).
+            segments (int or str): Encode the video as this many parallel segments ('auto': one per physical
+                core for long inputs). None or 1 encodes in a single process.
+            resume (bool): Reuse segments finished by an interrupted earlier run of the same plan, and keep
+                the finished segments if this run fails so it can be resumed in turn.
+            encoder (EncoderSetting): Video encoder and preset (default: libx264 medium).
+            tuner (PresetTuner): Pick the encoder setting by trial-encoding samples of the input
+                (overrides `encoder` for full encodes).
+            predictor (SizePredictor): Pick CRF or capped VBR from sampled encodes instead of encoding at
+                the flat average bitrate.
+        """
+        self.file_path = file_path
+        self.sub_option = sub_option
+        self.sub_file = sub_file
+        self.ext = ext
+        self.max_size_gb = max_size_gb
+        self.threads = threads
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.allow_copy = allow_copy
+        self.audio_languages = audio_languages
+        self.audio_bitrate_kbps = audio_bitrate_kbps
+        self.segments = segments
+        self.resume = resume
+        self.encoder = encoder or DEFAULT_ENCODER
+        self.tuner = tuner
+        self.predictor = predictor
+        self._rate_args = None
+        self.result = None
+        self._plan = None
+        self._procs = []
+        self._procs_lock = threading.Lock()
+        self._thread = None
+        self._events = queue.Queue()  # created here so no event is missed, whenever `events()` is first iterated
+        self._cancelled = threading.Event()
+        self._paused = threading.Event()
+        self._paused_since = None
+        self._paused_total = 0.0
+        self._done = threading.Event()
+        self._timings = {}
+
+    def plan(self):
+        """
+        Probe the input and build the ffmpeg command. Cached after the first call.
+        Returns:
+            CompressionPlan: The planned encode.
+        Raises:
+            CompressionError: If the input cannot be read or the target size cannot even hold the audio.
+        """
+        if self._plan is not None:
+            return self._plan
+        t0 = time.time()
+        warnings = []
+        file_path = self.file_path
+        # Metadata extraction (single ffprobe call, cached across runs)
+        media = cached_probe_media(file_path)
+        duration = media.duration
+        if not duration or duration <= 0:
+            raise CompressionError(f"Could not determine video duration (got '{duration}').")
+        if media.video is None:
+            raise CompressionError("No video stream found.")
+        self._timings["probe"] = time.time() - t0
+
+        # Audio tracks decide their own bit budget, the video gets the rest
+        audio_tracks, audio_warnings = plan_audio(media, self.ext, self.audio_languages, self.audio_bitrate_kbps, self.allow_copy)
+        warnings += audio_warnings
+        audio_bitrate = audio_bitrate_total(audio_tracks)
+
+        # Bitrate calculation
+        target_bits = self.max_size_gb * 1024 * 1024 * 1024 * 8  # in bits
+        audio_bits_total = audio_bitrate * duration # in bits
+        video_bits_total = target_bits - audio_bits_total # in bits
+        video_bitrate = video_bits_total / duration # in bits per second
+        video_bitrate_kbps = int(video_bitrate / 1000) # in kbps
+
+        copy_video = self._can_copy_video(media, target_bits / 8)
+        copy_audio = all(track.action == COPY for track in audio_tracks)
+        if copy_video and copy_audio:
+            mode = MODE_REMUX
+        elif copy_video:
+            mode = MODE_AUDIO_ONLY
+        else:
+            mode = MODE_FULL
+            if video_bitrate_kbps <= 0:
+                raise CompressionError(f"Target size is too small: audio alone needs {audio_bits_total / 8 / 1024 ** 3:.2f} GB.")
+
+        tuning = None
+        if mode == MODE_FULL and self.tuner is not None:
+            t1 = time.time()
+            tuning = self.tuner.tune(media, video_bitrate_kbps, self.threads)
+            self.encoder = tuning.setting
+            self._timings["tune"] = time.time() - t1
+        prediction = None
+        predicted_size = int(audio_bits_total / 8 + video_bits_total / 8) if mode == MODE_FULL else None
+        if mode == MODE_FULL and self.predictor is not None:
+            t1 = time.time()
+            try:
+                prediction = self.predictor.predict(media, self.encoder, video_bits_total / 8, self.threads)
+            except RuntimeError as e:
+                raise CompressionError(str(e))
+            self._rate_args = prediction.rate_args
+            predicted_size = int(audio_bits_total / 8 + prediction.predicted_video_size)
+            self._timings["predict"] = time.time() - t1
+
+        output_file = os.path.splitext(file_path)[0] + f"_compressed.{self.ext}"
+        partial_file = partial_path(output_file)
+        cwd = os.path.dirname(file_path)
+        cmd = self._build_cmd(media, video_bitrate_kbps, partial_file, copy_video, audio_tracks)
+        segments, segment_cmds, work_dir, concat_list = [], [], None, None
+        count = self.segments
+        if count == "auto":
+            count = auto_segment_count(duration, physical_core_count())
+        if mode == MODE_FULL and count and int(count) > 1:
+            t1 = time.time()
+            segments = plan_segments(file_path, media.video.index, duration, int(count))
+            self._timings["segment_plan"] = time.time() - t1
+            if len(segments) > 1:
+                # Absolute, so segments and the concat list land in the same place whatever ffmpeg's cwd
+                work_dir = os.path.join(os.path.abspath(cwd), "." + os.path.basename(output_file) + ".segments")
+                concat_list = os.path.join(work_dir, "concat.txt")
+                segment_cmds = self._build_segment_cmds(media, video_bitrate_kbps, segments, work_dir)
+                cmd = self._build_concat_cmd(concat_list, partial_file, audio_tracks)
+            else:
+                segments = []
+                warnings.append("Input is too short to be split into segments, encoding in one process.")
+
+        self._plan = CompressionPlan(
+            media=media,
+            duration=duration,
+            audio_bitrate=audio_bitrate,
+            video_bitrate_kbps=video_bitrate_kbps,
+            output_file=output_file,
+            cmd=cmd,
+            cwd=cwd,
+            mode=mode,
+            copy_video=copy_video,
+            copy_audio=copy_audio,
+            audio_tracks=audio_tracks,
+            segments=segments,
+            segment_cmds=segment_cmds,
+            work_dir=work_dir,
+            concat_list=concat_list,
+            warnings=warnings,
+            partial_file=partial_file,
+            encoder=self.encoder,
+            tuning=tuning,
+            prediction=prediction,
+            predicted_size=predicted_size,
+        )
+        return self._plan
+
+    def _can_copy_video(self, media, target_bytes):
+        """
+        The video is copied when the whole input already fits in the target size, its codec can be muxed
+        into the output container and no subtitles are burned in.
+        Returns:
+            bool: True if the video stream can be copied as-is.
+        """
+        if not self.allow_copy or self.sub_option == "hard":
+            return False
+        size = media.size or os.path.getsize(self.file_path)
+        return size <= target_bytes and media.video.codec_name in COPY_VIDEO_CODECS.get(self.ext, ())
+
+    def _video_encode_args(self, video_bitrate_kbps, threads, vf=None):
+        return self.encoder.args(video_bitrate_kbps, threads, vf, self._rate_args)
+
+    def _hevc_tag_args(self, codec_name):
+        # Apple players only recognise HEVC in MP4 with the hvc1 tag
+        return ["-tag:v", "hvc1"] if self.ext == "mp4" and codec_name in ("hevc", "libx265") else []
+
+    def _hard_sub_filename(self):
+        if self.sub_option == "hard" and self.sub_file:
+            # Always use forward slashes for ffmpeg filter
+            return os.path.basename(self.sub_file).replace('\\', '/')
+        return None
+
+    def _output_args(self, audio_tracks, media_input, sub_input):
+        """
+        Audio, subtitle and container arguments shared by the single-pass and concat commands.
+        """
+        args = audio_ffmpeg_args(audio_tracks, media_input)
+        if self.sub_option == "soft":
+            # MP4 only supports mov_text, Matroska takes SRT/ASS as they are
+            args += ["-map", f"{sub_input}:s", "-c:s", "mov_text" if self.ext == "mp4" else "copy"]
+        elif self.ext == "mkv":
+            # Keep embedded subtitle tracks when the container can hold them as-is
+            args += ["-map", f"{media_input}:s?", "-c:s", "copy"]
+        if self.ext == "mp4":
+            args += ["-movflags", "+faststart"]
+        return args
+
+    def _build_cmd(self, media, video_bitrate_kbps, output_file, copy_video, audio_tracks):
+        video_name = os.path.basename(self.file_path)
+        output_name = os.path.basename(output_file)
+        # For subtitles, use only the filename and set cwd to the video's folder
+        cmd = ["ffmpeg", "-i", video_name]
+        if self.sub_option == "soft":
+            cmd += ["-i", os.path.basename(self.sub_file) if self.sub_file else None]
+        cmd += ["-map", f"0:{media.video.index}"]
+        if copy_video:
+            cmd += ["-c:v", "copy"] + self._hevc_tag_args(media.video.codec_name)
+        else:
+            sub_filename = self._hard_sub_filename()
+            cmd += self._video_encode_args(video_bitrate_kbps, self.threads, f"subtitles={sub_filename}" if sub_filename else None)
+            cmd += self._hevc_tag_args(self.encoder.codec)
+        cmd += self._output_args(audio_tracks, 0, 1)
+        cmd += PROGRESS_ARGS + [output_name, "-y"]
+        return cmd
+
+    def _build_segment_cmds(self, media, video_bitrate_kbps, segments, work_dir):
+        """
+        Build one video-only encode command per segment, splitting the thread budget between them (all
+        logical cores when no budget was given, ffmpeg's own default would oversubscribe them once per segment).
+        Each command writes to the partial name of its segment file.
+        Returns:
+            list: (command, segment file) tuples, in order.
+        """
+        video_name = os.path.basename(self.file_path)
+        threads = max(1, (self.threads or os.cpu_count() or 1) // len(segments))
+        sub_filename = self._hard_sub_filename()
+        cmds = []
+        for i, (start, end) in enumerate(segments):
+            segment_file = os.path.join(work_dir, f"segment_{i:03d}.mkv")
+            vf = subtitle_filter_for_segment(sub_filename, start) if sub_filename else None
+            cmd = segment_cmd(video_name, start, end, media.video.index,
+                              self._video_encode_args(video_bitrate_kbps, threads, vf) + PROGRESS_ARGS,
+                              partial_path(segment_file), last=i == len(segments) - 1)
+            cmds.append((cmd, segment_file))
+        return cmds
+
+    def _build_concat_cmd(self, list_file, output_file, audio_tracks):
+        """
+        Join the encoded segments without re-encoding and mux audio/subtitles from the original file.
+        """
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_file, "-i", os.path.basename(self.file_path)]
+        if self.sub_option == "soft":
+            cmd += ["-i", os.path.basename(self.sub_file) if self.sub_file else None]
+        cmd += ["-map", "0:v:0", "-c:v", "copy"] + self._hevc_tag_args(self.encoder.codec)
+        cmd += self._output_args(audio_tracks, 1, 2)
+        cmd += PROGRESS_ARGS + [os.path.basename(output_file), "-y"]
+        return cmd
+
+    def start(self):
+        """
+        Start compressing in a background thread.
+        Returns:
+            CompressionJob: self, for chaining.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def run(self):
+        """
+        Compress synchronously in the calling thread.
+        Returns:
+            CompressionResult: The job result.
+        """
+        self._run()
+        return self.result
+
+    def wait(self, timeout=None):
+        """
+        Block until the job has finished.
+        Returns:
+            CompressionResult: The job result (None if the timeout expired).
+        """
+        self._done.wait(timeout)
+        return self.result
+
+    def done(self):
+        """
+        Returns:
+            bool: True once a result is available.
+        """
+        return self._done.is_set()
+
+    def cancel(self):
+        """
+        Stop the job. Running ffmpeg processes are terminated (killed if they have not exited after
+        CANCEL_GRACE seconds) and partial output removed.
+        """
+        self._cancelled.set()
+        self._terminate_all()
+        timer = threading.Timer(CANCEL_GRACE, self._kill_all)
+        timer.daemon = True
+        timer.start()
+
+    def pause(self):
+        """
+        Suspend the running ffmpeg processes (SIGSTOP, or psutil on Windows). Processes started while
+        the job is paused, such as the next segment, are suspended as soon as they start.
+        Raises:
+            CompressionError: On Windows without psutil.
+        """
+        with self._procs_lock:
+            if self._paused.is_set() or self._done.is_set():
+                return
+            self._paused.set()
+            self._paused_since = time.time()
+            try:
+                for proc in self._procs:
+                    if proc.poll() is None:
+                        _suspend_process(proc)
+            except CompressionError:
+                self._paused.clear()
+                raise
+
+    def unpause(self):
+        """
+        Continue ffmpeg processes suspended by `pause()`.
+        """
+        with self._procs_lock:
+            if not self._paused.is_set():
+                return
+            self._paused.clear()
+            self._paused_total += time.time() - self._paused_since
+            for proc in self._procs:
+                if proc.poll() is None:
+                    _resume_process(proc)
+
+    @property
+    def paused(self):
+        return self._paused.is_set()
+
+    def _paused_seconds(self):
+        with self._procs_lock:
+            if self._paused.is_set():
+                return self._paused_total + time.time() - self._paused_since
+            return self._paused_total
+
+    def _terminate_all(self):
+        with self._procs_lock:
+            procs = list(self._procs)
+            paused = self._paused.is_set()
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+                if paused:
+                    # A stopped process only acts on the signal once it is continued
+                    _resume_process(proc)
+
+    def _kill_all(self):
+        with self._procs_lock:
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+
+    def events(self):
+        """
+        Iterate over progress events until the job finishes. Events are queued from the start of the job,
+        so they are all seen whether this is called before or after `start()`. Iterate once per job.
+        Yields:
+            ProgressEvent: Progress updates, in order.
+        """
+        while True:
+            if self._done.is_set() and self._events.empty():
+                return
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if event is None:
+                return
+            yield event
+
+    def _emit(self, event):
+        if self.on_progress:
+            self.on_progress(event)
+        self._events.put(event)
+
+    def _finish(self, result):
+        self.result = result
+        self._events.put(None)
+        self._done.set()
+
+    def _run(self):
+        t0 = time.time()
+        result = CompressionResult(input_file=self.file_path)
+        try:
+            self._encode(result)
+        except (CompressionError, OSError) as e:
+            # OSError covers a missing ffmpeg/ffprobe executable
+            result.error = str(e)
+        except Exception as e:
+            # Unexpected ffprobe output or a failing progress callback: still a result, never a hung wait()
+            result.success = False
+            result.error = f"{type(e).__name__}: {e}"
+        finally:
+            if not result.success and self._plan is not None:
+                # Whatever stopped the job, never leave its partial output behind
+                _replace_if_ok(1, self._plan.partial_file, self._plan.output_file)
+            result.timings = dict(self._timings, total=time.time() - t0)
+            self._finish(result)
+
+    def _encode(self, result):
+        plan = self.plan()
+        result.output_file = plan.output_file
+        result.mode = plan.mode
+        result.predicted_size = plan.predicted_size
+        if self._cancelled.is_set():
+            result.cancelled = True
+            result.error = "cancelled"
+            return
+
+        encode_start = time.time()
+        duration = plan.duration
+        if plan.segments:
+            returncode, log, last_block = self._encode_segments(plan, encode_start)
+        else:
+            def on_block(block):
+                self._emit_progress(block.out_time, duration, encode_start, block)
+            returncode, log, last_block = self._run_ffmpeg(plan.cmd, plan.cwd, on_block)
+        # Segmented encodes stop the clock before the concat step, which is timed as "mux"
+        self._timings.setdefault("encode", time.time() - encode_start)
+
+        result.returncode = returncode
+        result.cancelled = self._cancelled.is_set()
+        result.success = returncode == 0 and not result.cancelled
+        _replace_if_ok(0 if result.success else 1, plan.partial_file, plan.output_file)
+        if result.success:
+            if last_block is None or last_block.out_time < duration:
+                self._emit(ProgressEvent(duration, duration, 100, self._timings["encode"], 0))
+            result.output_size = os.path.getsize(plan.output_file) if os.path.exists(plan.output_file) else 0
+        else:
+            result.error = "cancelled" if result.cancelled else f"ffmpeg exited with code {returncode}"
+            result.log = log
+
+    def _emit_progress(self, cur_time, duration, encode_start, block=None):
+        cur_time = min(cur_time, duration)
+        percent = min(100, int(cur_time / duration * 100))
+        elapsed = time.time() - encode_start - self._paused_seconds()  # paused time does not skew the ETA
+        remaining = None
+        if percent >= 100:
+            remaining = 0
+        elif cur_time > 0:
+            remaining = elapsed / (cur_time / duration) - elapsed
+        if block is None:
+            self._emit(ProgressEvent(cur_time, duration, percent, elapsed, remaining))
+        else:
+            self._emit(ProgressEvent(cur_time, duration, percent, elapsed, remaining,
+                                     fps=block.fps, speed=block.speed, total_size=block.total_size, bitrate=block.bitrate))
+
+    def _run_ffmpeg(self, cmd, cwd, on_block):
+        """
+        Run one ffmpeg process to completion, feeding its -progress blocks to `on_block`.
+        Returns:
+            tuple: (return code, stderr tail or None on success, last progress block)
+        """
+        proc = subprocess.Popen(cmd, cwd=cwd or None, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True, errors="replace")
+        with self._procs_lock:
+            self._procs.append(proc)
+            if self._paused.is_set() and not self._cancelled.is_set():
+                _suspend_process(proc)
+        if self._cancelled.is_set():
+            proc.terminate()
+        log = StderrRing(proc.stderr)
+        try:
+            last_block = read_progress(proc.stdout, on_block, self.progress_interval)
+        except BaseException:
+            # A failing progress callback must not leave ffmpeg running on its own
+            proc.kill()
+            raise
+        finally:
+            proc.wait()
+            with self._procs_lock:
+                self._procs.remove(proc)
+        return proc.returncode, (log.tail() if proc.returncode else None), last_block
+
+    def _encode_segments(self, plan, encode_start):
+        """
+        Encode every segment in its own ffmpeg process, then concatenate them and mux the audio.
+        Progress from all segments is merged into one stream of events.
+        Returns:
+            tuple: (return code, stderr tail or None, last progress block)
+        """
+        duration = plan.duration
+        work_dir = plan.work_dir
+        finished = self._prepare_work_dir(plan)
+        done_time = [end - start if i in finished else 0.0 for i, (start, end) in enumerate(plan.segments)]
+        lock = threading.Lock()
+        last_emit = [0.0]
+        failed = threading.Event()
+        failure = [None]  # first failing segment, its log is the useful one
+        assembled = [False]  # the output was muxed, the segments are no longer needed
+
+        def run_segment(i, cmd, segment_file):
+            if failed.is_set() or i in finished:
+                return 0, None, None
+            def on_block(block):
+                with lock:
+                    done_time[i] = block.out_time
+                    now = time.monotonic()
+                    if now - last_emit[0] < self.progress_interval:
+                        return
+                    last_emit[0] = now
+                    total = sum(done_time)
+                # Merged fps/speed are not meaningful, only the encoded time is reported
+                self._emit_progress(total, duration, encode_start)
+            outcome = self._run_ffmpeg(cmd, plan.cwd, on_block)
+            _replace_if_ok(outcome[0], partial_path(segment_file), segment_file)
+            if outcome[0] != 0:
+                with lock:
+                    if failure[0] is None:
+                        failure[0] = outcome
+                # Stop the other segments, the output cannot be assembled anyway
+                failed.set()
+                self._terminate_all()
+            return outcome
+
+        import concurrent.futures
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(plan.segment_cmds)) as executor:
+                futures = [executor.submit(run_segment, i, cmd, segment_file)
+                           for i, (cmd, segment_file) in enumerate(plan.segment_cmds)]
+                concurrent.futures.wait(futures)
+            if failure[0] is not None:
+                returncode, log, _ = failure[0]
+                return returncode, log, None
+            if self._cancelled.is_set():
+                return -1, None, None
+            self._timings["encode"] = time.time() - encode_start
+            mux_start = time.time()
+            write_concat_list(plan.concat_list, [segment_file for _, segment_file in plan.segment_cmds])
+            returncode, log, _ = self._run_ffmpeg(plan.cmd, plan.cwd, lambda block: None)
+            self._timings["mux"] = time.time() - mux_start
+            failure[0] = (returncode, log, None) if returncode else None
+            assembled[0] = not returncode
+            return returncode, log, None
+        finally:
+            # Finished segments of a resumable run that failed or was cancelled (Ctrl+C cancels the batch)
+            # are kept for the next attempt
+            if not self.resume or assembled[0]:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _prepare_work_dir(self, plan):
+        """
+        Create the segment folder. When resuming the same plan, keep the segments already encoded.
+        Returns:
+            set: Indexes of segments that do not need to be encoded again.
+        """
+        manifest_path = os.path.join(plan.work_dir, "plan.json")
+        # The thread count may differ between runs without changing the encoded result
+        manifest = [[arg for j, arg in enumerate(cmd) if "-threads" not in cmd[max(0, j - 1):j + 1]]
+                    for cmd, _ in plan.segment_cmds]
+        finished = set()
+        if self.resume:
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    if json.load(f) == manifest:
+                        finished = {i for i, (_, segment_file) in enumerate(plan.segment_cmds) if os.path.exists(segment_file)}
+            except (OSError, ValueError):
+                pass
+        if not finished:
+            shutil.rmtree(plan.work_dir, ignore_errors=True)
+        os.makedirs(plan.work_dir, exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        return finished
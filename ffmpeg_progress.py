@@ -0,0 +1,118 @@
+"""
+Readers for a running ffmpeg process.
+
+ffmpeg is started with `-nostats -progress pipe:1`, so stdout carries blocks of key=value lines, each
+terminated by a `progress=continue` (or `progress=end`) line. `read_progress` turns those blocks into
+typed `FFmpegProgress` events, and `StderrRing` keeps the last lines of the log for error reports.
+"""
+import collections
+import threading
+import time
+from dataclasses import dataclass
+
+PROGRESS_ARGS = ["-nostats", "-progress", "pipe:1"]
+
+
+@dataclass
+class FFmpegProgress:
+    """
+    One block of ffmpeg `-progress` output.
+    """
+    out_time: float = 0.0      # seconds of output written
+    fps: float = None
+    speed: float = None        # encoding speed relative to real time (1.0 = real time)
+    total_size: int = None     # bytes written so far
+    bitrate: float = None      # kbit/s
+    frame: int = None
+    end: bool = False
+
+
+def _number(value, cast=float):
+    # ffmpeg reports "N/A" until the first frame is written
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_block(block, end):
+    out_us = block.get("out_time_us") or block.get("out_time_ms")  # out_time_ms is in microseconds too
+    out_time = _number(out_us, int)
+    if out_time is not None:
+        out_time /= 1000000.0
+    else:
+        h, _, rest = (block.get("out_time") or "").partition(":")
+        m, _, s = rest.partition(":")
+        try:
+            out_time = int(h) * 3600 + int(m) * 60 + float(s)
+        except ValueError:
+            out_time = 0.0
+    speed = block.get("speed")
+    bitrate = block.get("bitrate")
+    return FFmpegProgress(
+        out_time=max(0.0, out_time),
+        fps=_number(block.get("fps")),
+        speed=_number(speed[:-1]) if speed and speed.endswith("x") else None,
+        total_size=_number(block.get("total_size"), int),
+        bitrate=_number(bitrate[:-7]) if bitrate and bitrate.endswith("kbits/s") else None,
+        frame=_number(block.get("frame"), int),
+        end=end,
+    )
+
+
+def read_progress(stream, on_event, min_interval=0.25):
+    """
+    Read `-progress` blocks from a stream until EOF.
+    Blocks arriving faster than `min_interval` are dropped (the final block is always delivered).
+    Args:
+        stream: Text stream connected to ffmpeg's stdout.
+        on_event (callable): Called with an FFmpegProgress for each delivered block.
+        min_interval (float): Minimum number of seconds between two events.
+    Returns:
+        FFmpegProgress: The last parsed block, or None if ffmpeg produced no progress.
+    """
+    block = {}
+    last = None
+    last_emit = 0.0
+    for line in stream:
+        key, sep, value = line.partition("=")
+        if not sep:
+            continue
+        value = value.strip()
+        if key != "progress":
+            block[key] = value
+            continue
+        end = value == "end"
+        now = time.monotonic()
+        if end or now - last_emit >= min_interval:
+            last = _parse_block(block, end)
+            last_emit = now
+            on_event(last)
+        block.clear()
+    return last
+
+
+class StderrRing:
+    """
+    Drain a stream in a background thread, keeping only its last `maxlen` lines.
+    """
+
+    def __init__(self, stream, maxlen=200):
+        self.lines = collections.deque(maxlen=maxlen)
+        self._thread = threading.Thread(target=self._drain, args=(stream,), daemon=True)
+        self._thread.start()
+
+    def _drain(self, stream):
+        for line in stream:
+            self.lines.append(line.rstrip())
+
+    def tail(self, count=20):
+        """
+        Wait for the stream to close and return its last lines.
+        Args:
+            count (int): Number of lines to return.
+        Returns:
+            str: Newline-joined log tail.
+        """
+        self._thread.join(timeout=5)
+        return "\n".join(list(self.lines)[-count:])
@@ -1,9 +1,8 @@
-import concurrent.futures
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox
 from colorama import Fore, Style
 import os
-from compression import run_compression
+from scheduler import JobScheduler, QUEUED, RUNNING, PAUSED, DONE, FAILED, CANCELLED, PRIORITIES, PRIORITY_HIGH
 
 def apply_modern_theme(root):
     from tkinter import ttk
@@ -37,9 +36,11 @@ def create_styled_button(parent, text, command, width=None):
     from tkinter import ttk
     return ttk.Button(parent, text=text, command=command, width=width, style='TButton')
 
-def run_video_compression():
+def run_video_compression(max_jobs=None):
     """
     Unified GUI workflow for compressing one or more video files with optional subtitle handling.
+    Args:
+        max_jobs (int): Maximum number of concurrent ffmpeg jobs in batch mode (default: physical core count).
     """
     from tkinter import ttk
     # Step 1: Select one or more video files
@@ -55,6 +56,8 @@ def run_video_compression():
         messagebox.showerror("File Error", "No video files selected. Please choose at least one video file.", parent=msg_root)
         msg_root.destroy()
         return
+    # Imported once files are chosen, so cancelling the dialog never pays for loading the engine
+    from compression import run_compression
 
     # If only one file, use single-file workflow
     if len(file_paths) == 1:
@@ -149,7 +152,8 @@ def run_video_compression():
                 messagebox.showerror("Size Error", "Invalid size. Must be greater than 0.", parent=msg_root)
                 msg_root.destroy()
 
-        run_compression(path, sub_option, sub_file, ext, max_size_gb)
+        # A single file would leave most cores idle, let long inputs be split into parallel segments
+        run_compression(path, sub_option, sub_file, ext, max_size_gb, segments="auto")
         return
 
     # MULTIPLE FILES WORKFLOW (improved subtitle selection)
@@ -267,11 +271,11 @@ def run_video_compression():
             messagebox.showerror("Size Error", "Invalid size. Must be greater than 0.", parent=msg_root)
             msg_root.destroy()
 
-    import threading
-    import queue
-    from tkinter import ttk
+    from gui_helpers import BatchProgressView, CANCELLED as VIEW_CANCELLED
+    from progress_bus import ProgressBus, TerminalProgress, format_eta, subscribe_json_from_env
+    from metrics import MetricsRegistry, exporters_from_env
 
-    # GUI window for batch progress with scrollbar
+    # GUI window for batch progress: a virtualized list, cheap to build and repaint for any batch size
     progress_root = tk.Tk()
     progress_root.title("Multiple Videos Compression Progress")
     w, h = 540, 420
@@ -283,72 +287,100 @@ def run_video_compression():
     apply_modern_theme(progress_root)
     create_styled_label(progress_root, "Multiple Videos Compression Progress", style='Title.TLabel').pack(pady=(14, 8))
 
-    # Scrollable frame setup
-    canvas = tk.Canvas(progress_root, bg="#23272e", highlightthickness=0, width=w-20, height=h-80)
-    scrollbar = ttk.Scrollbar(progress_root, orient="vertical", command=canvas.yview)
-    scroll_frame = create_styled_frame(canvas)
-    scroll_frame_id = canvas.create_window((0, 0), window=scroll_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-    canvas.pack(side="left", fill="both", expand=True, padx=(10,0), pady=(0,10))
-    scrollbar.pack(side="right", fill="y", pady=(0,10))
+    def on_action(action, indexes):
+        # Buttons and menu of the list: pause, resume, cancel or reorder the selected jobs
+        if action == "top":
+            indexes = reversed(indexes)  # the first selected file ends up first in the queue
+        for idx in indexes:
+            try:
+                if action == "pause":
+                    scheduler.pause(idx)
+                elif action == "resume":
+                    scheduler.resume(idx)
+                elif action == "cancel":
+                    scheduler.cancel(idx)
+                elif action == "top":
+                    scheduler.set_priority(idx, PRIORITY_HIGH)
+                    scheduler.move_to_front(idx)
+                else:
+                    scheduler.set_priority(idx, PRIORITIES[action])
+                if action not in ("pause", "resume", "cancel") and scheduler.states.get(idx) == QUEUED:
+                    view.update(idx, status="Queued (next)" if action == "top" else f"Queued ({action})")
+            except Exception as e:
+                # Pausing needs psutil on Windows
+                messagebox.showerror("Batch Error", str(e), parent=progress_root)
+                return
 
-    def on_frame_configure(event):
-        canvas.configure(scrollregion=canvas.bbox("all"))
-    scroll_frame.bind("<Configure>", on_frame_configure)
+    view = BatchProgressView(progress_root, [os.path.basename(path) for path in file_paths], on_action=on_action)
 
-    bars = []
-    labels = []
-    eta_labels = []
-    for i, path in enumerate(file_paths):
-        label = create_styled_label(scroll_frame, os.path.basename(path))
-        label.pack(pady=(8, 0), anchor="w")
-        bar = ttk.Progressbar(scroll_frame, length=400, mode='determinate', maximum=100, style='TProgressbar')
-        bar.pack(pady=(2, 0), anchor="w")
-        eta_label = create_styled_label(scroll_frame, "Time left: --:--", font=("Segoe UI", 10, "italic"))
-        eta_label.pack(pady=(0, 2), anchor="w")
-        bars.append(bar)
-        labels.append(label)
-        eta_labels.append(eta_label)
-    progress_root.update()
+    state_text = {QUEUED: "Queued", RUNNING: "Starting...", PAUSED: "Paused", DONE: "Done", FAILED: "Failed",
+                  CANCELLED: "Cancelled"}
+    job_index = {path: idx for idx, path in enumerate(file_paths)}
+
+    def show_updates(updates):
+        # Bus thread: the view only records the values and repaints on its own timer
+        for update in updates:
+            status = state_text.get(update["state"])
+            if update["state"] == RUNNING and update["percent"] is not None:
+                status = f"Time left: {format_eta(update['eta'])}"
+            finished = {DONE: True, FAILED: False, CANCELLED: VIEW_CANCELLED}.get(update["state"])
+            view.update(job_index[update["job"]], update["percent"], status, finished)
 
-    # Thread-safe queue for progress updates
-    progress_queues = [queue.Queue() for _ in file_paths]
+    # One throttled stream of progress feeds the list, the terminal and the optional JSON lines
+    bus = ProgressBus()
+    bus.subscribe(show_updates)
+    bus.subscribe(TerminalProgress(single=False))
+    json_sink = subscribe_json_from_env(bus)
+    # Per-job metrics, exported when VIDEOCOMPRESS_METRICS_* is set
+    metrics = MetricsRegistry()
+    exporters = exporters_from_env(metrics)
 
-    def compress_one(idx, path, sub_option, sub_file):
-        def gui_progress(percent, mins, secs):
-            progress_queues[idx].put((percent, mins, secs))
-        run_compression(path, sub_option, sub_file, ext, max_size_gb, gui_progress=gui_progress)
-        # Ensure bar is set to 100% at the end
-        progress_queues[idx].put((100, 0, 0))
+    def on_state(idx, state):
+        # Only DONE sets the percent, other state changes (pause, resume...) keep the last reported one
+        extra = {"percent": 100} if state == DONE else {}
+        bus.publish(file_paths[idx], kind="compress", state=state, **extra)
+
+    scheduler = JobScheduler(max_jobs=max_jobs, on_state=on_state)
+
+    def compress_one(idx, path, sub_option, sub_file, threads=None):
+        return run_compression(path, sub_option, sub_file, ext, max_size_gb, threads=threads, bus=bus,
+                               metrics=metrics if exporters else None, on_job=lambda job: scheduler.attach(idx, job))
 
-    threads = []
     for idx, (path, (sub_option, sub_file)) in enumerate(zip(file_paths, subtitle_choices)):
-        t = threading.Thread(target=compress_one, args=(idx, path, sub_option, sub_file))
-        t.start()
-        threads.append(t)
+        scheduler.submit(idx, compress_one, idx, path, sub_option, sub_file)
+    print(Fore.YELLOW + f"Running {min(scheduler.max_jobs, len(file_paths))} job(s) at a time, "
+          f"{scheduler.threads_per_job()} ffmpeg thread(s) each." + Style.RESET_ALL)
+    scheduler.start()
+    closing = [False]
+
+    def on_close():
+        # Closing the window cancels the batch: ffmpeg is stopped and partial outputs removed
+        closing[0] = True
+        scheduler.cancel_all()
+        progress_root.withdraw()
+    progress_root.protocol("WM_DELETE_WINDOW", on_close)
 
     def update_bars():
-        for i, q in enumerate(progress_queues):
-            try:
-                while True:
-                    percent, mins, secs = q.get_nowait()
-                    bars[i]['value'] = percent
-                    if mins is not None and secs is not None:
-                        eta_labels[i]['text'] = f"Time left: {mins:02d}:{secs:02d}"
-                    else:
-                        eta_labels[i]['text'] = "Time left: --:--"
-                    progress_root.update_idletasks()
-            except queue.Empty:
-                pass
-        if any(t.is_alive() for t in threads):
-            progress_root.after(200, update_bars)
+        if scheduler.is_running():
+            progress_root.after(500, update_bars)
+            return
+        bus.close()
+        if json_sink:
+            json_sink.close()
+        if exporters:
+            exporters.close()
+        view.close()
+        if closing[0]:
+            progress_root.destroy()
         else:
-            # Finalize all bars to 100% and ETA to 00:00
-            for bar, eta in zip(bars, eta_labels):
-                bar['value'] = 100
-                eta['text'] = "Time left: 00:00"
-            progress_root.update_idletasks()
-            create_styled_label(progress_root, "Multiple videos compression complete.", style='TLabel', foreground="green").pack(pady=10)
+            failed = sum(1 for state in scheduler.states.values() if state == FAILED)
+            cancelled = sum(1 for state in scheduler.states.values() if state == CANCELLED)
+            if failed:
+                create_styled_label(progress_root, f"Compression finished with {failed} failure(s).", style='TLabel', foreground="red").pack(pady=10)
+            elif cancelled:
+                create_styled_label(progress_root, f"Compression finished, {cancelled} file(s) cancelled.", style='TLabel', foreground="orange").pack(pady=10)
+            else:
+                create_styled_label(progress_root, "Multiple videos compression complete.", style='TLabel', foreground="green").pack(pady=10)
             progress_root.after(2000, progress_root.destroy)
 
     update_bars()
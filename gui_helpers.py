@@ -33,3 +33,177 @@ def create_styled_label(parent, text, style='TLabel', **kwargs):
 def create_styled_button(parent, text, command, width=None):
     from tkinter import ttk
     return ttk.Button(parent, text=text, command=command, width=width, style='TButton')
+
+class TkBridge:
+    """
+    Run callbacks posted from worker threads on the Tk thread.
+    Tk widgets must only be touched from the thread running mainloop; workers call `post` instead of
+    `root.after`, and one timer drains the queue.
+    """
+
+    def __init__(self, root, interval_ms=100):
+        import queue
+        self.root = root
+        self.interval_ms = interval_ms
+        self._queue = queue.Queue()
+        self._closed = False
+        root.after(interval_ms, self._drain)
+
+    def post(self, callback, *args):
+        """
+        Queue `callback(*args)` for the Tk thread. Safe to call from any thread.
+        """
+        self._queue.put((callback, args))
+
+    def _drain(self):
+        import queue
+        while True:
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        if not self._closed:
+            self.root.after(self.interval_ms, self._drain)
+
+    def close(self):
+        self._closed = True
+
+CANCELLED = "cancelled"  # BatchProgressView.update(finished=...) value for a cancelled job
+
+class BatchProgressView:
+    """
+    Progress list for large batches: one ttk.Treeview row per job (Tk only draws the visible rows) and a
+    line of aggregate totals. `update` may be called from any thread at any rate; updates are coalesced
+    per job and the view repaints the changed rows every `repaint_ms`.
+    With `on_action`, a row of buttons and a right-click menu act on the selected rows.
+    """
+    BAR_WIDTH = 20
+    # (label, action) pairs of the buttons; the menu also offers the priority levels
+    ACTIONS = (("Pause", "pause"), ("Resume", "resume"), ("Cancel", "cancel"), ("Move to top", "top"))
+    PRIORITY_ACTIONS = (("High priority", "high"), ("Normal priority", "normal"), ("Low priority", "low"))
+
+    def __init__(self, parent, names, repaint_ms=250, height=14, on_action=None):
+        """
+        Args:
+            parent: Tk container to pack the view into.
+            names (list): One display name per job, in job index order.
+            repaint_ms (int): Interval between repaints.
+            height (int): Visible rows.
+            on_action (callable): Called on the Tk thread as on_action(action, indexes) with an action of
+                ACTIONS or PRIORITY_ACTIONS and the selected job indexes.
+        """
+        import threading
+        from tkinter import ttk
+        self.parent = parent
+        self.repaint_ms = repaint_ms
+        self.percent = [0.0] * len(names)
+        self.status = ["Queued"] * len(names)
+        self.finished = [None] * len(names)  # True when done, False when failed, CANCELLED when cancelled
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        style = ttk.Style(parent)
+        style.configure('Batch.Treeview', background="#2d323b", fieldbackground="#2d323b", foreground="#f5f6fa", rowheight=22)
+        style.configure('Batch.Treeview.Heading', background="#353b48", foreground="#f5f6fa")
+        self.totals = create_styled_label(parent, "", font=("Segoe UI", 10, "bold"))
+        self.totals.pack(pady=(0, 6), anchor="w", padx=10)
+        if on_action:
+            # Packed before the list so the buttons keep their space when the window is small
+            buttons = create_styled_frame(parent)
+            buttons.pack(side="bottom", pady=(0, 10))
+            for label, action in self.ACTIONS:
+                create_styled_button(buttons, label, lambda action=action: self._act(action)).pack(side="left", padx=3)
+        frame = create_styled_frame(parent)
+        frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.tree = ttk.Treeview(frame, columns=("progress", "status"), height=height, style='Batch.Treeview')
+        self.tree.heading("#0", text="File")
+        self.tree.heading("progress", text="Progress")
+        self.tree.heading("status", text="Status")
+        self.tree.column("#0", width=220, stretch=True)
+        self.tree.column("progress", width=170, stretch=False)
+        self.tree.column("status", width=110, stretch=False)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        for idx, name in enumerate(names):
+            self.tree.insert("", "end", iid=str(idx), text=name, values=(self._bar(0), "Queued"))
+        self.on_action = on_action
+        if on_action:
+            self.menu = tk.Menu(self.tree, tearoff=0)
+            for label, action in self.ACTIONS:
+                self.menu.add_command(label=label, command=lambda action=action: self._act(action))
+            self.menu.add_separator()
+            for label, action in self.PRIORITY_ACTIONS:
+                self.menu.add_command(label=label, command=lambda action=action: self._act(action))
+            self.tree.bind("<Button-3>", self._show_menu)
+        self._paint_totals()
+        parent.after(repaint_ms, self._repaint)
+
+    def _show_menu(self, event):
+        row = self.tree.identify_row(event.y)
+        if row and row not in self.tree.selection():
+            self.tree.selection_set(row)
+        if self.tree.selection():
+            self.menu.tk_popup(event.x_root, event.y_root)
+
+    def _act(self, action):
+        indexes = [int(row) for row in self.tree.selection()]
+        if indexes:
+            self.on_action(action, indexes)
+
+    def update(self, idx, percent=None, status=None, finished=None):
+        """
+        Record new progress for job `idx`. Safe to call from any thread; only the latest values are drawn.
+        Args:
+            idx (int): Job index.
+            percent (float): Progress from 0 to 100.
+            status (str): Status text (state or time left).
+            finished (bool or str): True once the job is done, False if it failed, CANCELLED if it was cancelled.
+        """
+        with self._lock:
+            pending = self._dirty.setdefault(idx, {})
+            if percent is not None:
+                pending["percent"] = percent
+            if status is not None:
+                pending["status"] = status
+            if finished is not None:
+                pending["finished"] = finished
+
+    def _bar(self, percent):
+        filled = int(self.BAR_WIDTH * percent / 100)
+        return "█" * filled + "░" * (self.BAR_WIDTH - filled) + f" {int(percent):3d}%"
+
+    def _repaint(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        for idx, pending in dirty.items():
+            self.percent[idx] = pending.get("percent", self.percent[idx])
+            self.status[idx] = pending.get("status", self.status[idx])
+            self.finished[idx] = pending.get("finished", self.finished[idx])
+            self.tree.item(str(idx), values=(self._bar(self.percent[idx]), self.status[idx]))
+        if dirty:
+            self._paint_totals()
+        if not self._closed:
+            self.parent.after(self.repaint_ms, self._repaint)
+
+    def _paint_totals(self):
+        count = len(self.percent)
+        done = self.finished.count(True)
+        failed = self.finished.count(False)
+        cancelled = self.finished.count(CANCELLED)
+        overall = sum(self.percent) / count if count else 100
+        text = f"{done}/{count} done, {count - done - failed - cancelled} remaining"
+        if failed:
+            text += f", {failed} failed"
+        if cancelled:
+            text += f", {cancelled} cancelled"
+        self.totals.config(text=f"{text} - {overall:.0f}% overall")
+
+    def close(self):
+        """
+        Apply pending updates one last time and stop repainting.
+        """
+        self._closed = True
+        self._repaint()
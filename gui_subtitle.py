@@ -3,12 +3,10 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 from colorama import Fore, Style
 import os
-import pysrt
-from deep_translator import GoogleTranslator
-import concurrent.futures
+from subtitle_stream import translate_subtitles, translated_path
+from progress_bus import ProgressBus, TerminalProgress, subscribe_json_from_env
 # Import reusable GUI helpers for modern, DRY window/dialog creation
-from gui_helpers import apply_modern_theme, create_styled_frame, create_styled_label, create_styled_button
-import threading 
+from gui_helpers import apply_modern_theme, create_styled_frame, create_styled_label, create_styled_button, TkBridge
 
 
 def run_subtitle_translation():
@@ -53,6 +51,39 @@ def run_subtitle_translation():
         ("Tswana", "tn"), ("Tsonga", "ts"), ("Venda", "ve"), ("Xitsonga", "xh")
     ]
 
+    # The translation stack (asyncio engine, HTTP backend, SQLite memory) is imported here, not with the module
+    import concurrent.futures
+    from translation_engine import TranslationEngine, WindowTranslator
+    from translation_backends import get_backend
+    from translation_memory import get_default_memory
+    from metrics import MetricsRegistry, exporters_from_env
+
+    # One backend and one engine for every file: pooled connections and a single global request budget
+    backend = get_backend()
+    engine = TranslationEngine(backend)
+    # Worker threads hand their Tk updates to this bridge instead of touching widgets
+    bridge = TkBridge(root)
+    # Reading, deduplicating and writing files; translation requests never run on these threads
+    file_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    # Every file publishes its progress here; the bus feeds the Tk bars, the terminal and the optional JSON lines
+    bus = ProgressBus()
+    progress_widgets = {}  # file -> (progress variable, status label)
+
+    def show_updates(updates):
+        # Runs on the Tk thread through the bridge
+        for update in updates:
+            progress_var, status_label = progress_widgets[update["job"]]
+            progress_var.set(update["percent"] or 0)
+            if update["message"]:
+                status_label.config(text=update["message"])
+    bus.subscribe(lambda updates: bridge.post(show_updates, updates))
+    bus.subscribe(TerminalProgress(single=False))
+    json_sink = subscribe_json_from_env(bus)
+    # Per-file metrics and the engine's request counters, exported when VIDEOCOMPRESS_METRICS_* is set
+    metrics = MetricsRegistry()
+    metrics.engine = engine
+    exporters = exporters_from_env(metrics)
+
     src_lang = tk.StringVar(value="en")
     tgt_lang = tk.StringVar(value="fr")
 
@@ -139,9 +170,9 @@ def run_subtitle_translation():
         status_label = create_styled_label(frame, "", style='TLabel', font=("Segoe UI", 10, "italic"))
         status_label.pack(pady=(4, 0))
         def on_done():
-            messagebox.showinfo("Translation Complete", f"Translation completed!\nOutput saved as:\n{os.path.splitext(subfile)[0]}_translated.srt")
+            messagebox.showinfo("Translation Complete", f"Translation completed!\nOutput saved as:\n{translated_path(subfile)}")
             root.destroy()
-        threading.Thread(target=translate_file, args=(subfile, progress_var, status_label, on_done), daemon=True).start()
+        file_pool.submit(translate_file, subfile, progress_var, status_label, on_done)
 
     def show_batch_progress():
         # New window for batch progress
@@ -166,21 +197,21 @@ def run_subtitle_translation():
             slabel.pack(anchor="w", pady=(0, 8))
             progress_bars.append((pvar, pbar))
             status_labels.append(slabel)
-        # Start all translations in parallel (1 thread per file)
+        # Queue every file on the shared engine, which bounds the requests in flight
         def on_file_done(idx, subfile):
             def finish():
                 status_labels[idx].config(text="Done!")
-                messagebox.showinfo("Translation Complete", f"Translation completed!\nOutput saved as:\n{os.path.splitext(subfile)[0]}_translated.srt")
+                messagebox.showinfo("Translation Complete", f"Translation completed!\nOutput saved as:\n{translated_path(subfile)}")
                 # If all done, close window
                 if all(status_labels[i].cget("text") == "Done!" for i in range(len(subfile_paths))):
                     batch_win.destroy()
                     root.destroy()
             root.after(0, finish)
         for idx, subfile in enumerate(subfile_paths):
-            threading.Thread(target=translate_file, args=(subfile, progress_bars[idx][0], status_labels[idx], lambda idx=idx, subfile=subfile: on_file_done(idx, subfile)), daemon=True).start()
+            file_pool.submit(translate_file, subfile, progress_bars[idx][0], status_labels[idx], lambda idx=idx, subfile=subfile: on_file_done(idx, subfile))
 
     def translate_file(subfile, progress_var, status_label, on_done):
-        # Always use only the language code for GoogleTranslator
+        # Always use only the language code for the translation backend
         source = src_lang.get()
         target = tgt_lang.get()
         # Defensive: if value is like 'English (en)', extract code
@@ -190,43 +221,44 @@ def run_subtitle_translation():
             target = target.split('(')[-1].split(')')[0].strip()
         print(Fore.GREEN + f"Selected subtitle file for translation: {subfile}" + Style.RESET_ALL)
         print(Fore.YELLOW + f"Translating from {source} to {target}" + Style.RESET_ALL)
-        subs = pysrt.open(subfile, encoding='utf-8')
-        translator = GoogleTranslator(source=source, target=target)
-        total = len(subs)
-        results = [None] * total
-        import time, concurrent.futures
-        completed = [0]
+        output = translated_path(subfile)
+        import time
+        translator = WindowTranslator(engine, source, target, get_default_memory(), backend.max_chars)
         start_time = time.time()
-        def update_progress(count):
-            percent = int(100.0 * count / float(total))
-            progress_var.set(percent)
-            status_label.config(text=f"Translating... {percent}% ({count}/{total})")
-        def translate_and_update(idx, text):
-            try:
-                translated = translator.translate(text)
-            except Exception as e:
-                print(Fore.RED + f"Error translating: {e}" + Style.RESET_ALL)
-                translated = text
-            results[idx] = translated
-            def update():
-                completed[0] += 1
-                update_progress(completed[0])
-                # Print ETA in terminal
-                elapsed = time.time() - start_time
-                if completed[0] > 0 and completed[0] < total:
-                    eta = elapsed / completed[0] * (total - completed[0])
-                    mins, secs = divmod(int(eta), 60)
-                    print(f"[{os.path.basename(subfile)}] {completed[0]}/{total} - ETA: {mins:02d}:{secs:02d}", end='\r')
-                elif completed[0] == total:
-                    print(f"[{os.path.basename(subfile)}] 100% - Done!{' '*20}")
-            root.after(0, update)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-            futures = [executor.submit(translate_and_update, idx, sub.text) for idx, sub in enumerate(subs)]
-            concurrent.futures.wait(futures)
-        for sub, translated in zip(subs, results):
-            sub.text = translated
-        subs.save(f"{os.path.splitext(subfile)[0]}_translated.srt", encoding='utf-8')
-        root.after(0, on_done)
+        record = metrics.translation_job(subfile)
+        progress_widgets[subfile] = (progress_var, status_label)
+        bus.publish(subfile, kind="translate", state="running", percent=0, message="Translating... 0%")
+        def on_window(cues, bytes_read, size):
+            # File thread: store what the window learned, then publish the progress
+            translator.store()
+            while translator.errors:
+                print(Fore.RED + f"Error translating {subfile}: {translator.errors.pop(0)}" + Style.RESET_ALL)
+            percent = int(100.0 * bytes_read / size) if size else 100
+            elapsed = time.time() - start_time
+            eta = elapsed / bytes_read * (size - bytes_read) if bytes_read else None
+            bus.publish(subfile, percent=percent, eta=eta, cues=cues, from_cache=translator.from_cache,
+                        message=f"Translating... {percent}% ({cues} cues, {translator.from_cache} from cache)")
+        try:
+            # Cues are read, translated and written window by window; an interrupted run leaves <output>.part
+            translate_subtitles(subfile, output, translator.submit, on_window=on_window)
+        except Exception as e:
+            print(Fore.RED + f"Error translating {subfile}: {e}" + Style.RESET_ALL)
+            bus.publish(subfile, state="failed", message=f"Failed, partial output kept in {os.path.basename(output)}.part")
+            record.finish(False, translator.cues, translator.from_cache, translator.batches)
+            return
+        record.finish(True, translator.cues, translator.from_cache, translator.batches)
+        bus.publish(subfile, state="done", percent=100, eta=0, message="Done!")
+        bus.flush()
+        bridge.post(on_done)
 
     root.mainloop()
+    bus.close()
+    if json_sink:
+        json_sink.close()
+    if exporters:
+        exporters.close()
+    bridge.close()
+    engine.close()
+    file_pool.shutdown(wait=False)
+    backend.close()
     root.destroy()
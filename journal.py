@@ -0,0 +1,129 @@
+"""
+Crash-safe batch journal.
+
+Every job of a command-line batch is recorded in an SQLite database (state, output path, size and
+SHA-256 checksum), committed at each state change, so an interrupted batch leaves an exact record of
+what finished. `videocompress compress --resume` skips jobs whose output is still the one recorded.
+
+Jobs are keyed by their input file (path, size, modification time) and the options that change the
+output, so editing a file or its settings makes it run again.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from scheduler import DONE, RUNNING
+from utils import user_cache_dir
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """
+    Returns:
+        str: Hex SHA-256 of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def job_key(spec, **options):
+    """
+    Identify a job by its input file and every option that affects the output.
+    Args:
+        spec (dict): Job spec as built by `videocompress.build_jobs`.
+        **options: Extra batch-wide options (e.g. allow_copy).
+    Returns:
+        str: Hex digest.
+    """
+    st = os.stat(spec["file"])
+    identity = dict(spec, file=os.path.abspath(spec["file"]), size=st.st_size, mtime=st.st_mtime_ns, **options)
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class BatchJournal:
+    """
+    SQLite record of batch jobs. Safe to share between threads.
+    """
+
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str): Database file (default: journal.sqlite3 in the user cache folder).
+        """
+        self.db_path = db_path or os.path.join(user_cache_dir(), "journal.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        with self._conn:
+            # WAL keeps committed rows intact if the process dies in the middle of a write
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " key TEXT PRIMARY KEY, file TEXT, state TEXT, output TEXT, output_size INTEGER,"
+                " checksum TEXT, error TEXT, updated REAL)"
+            )
+
+    def mark(self, key, file, state, output=None, error=None):
+        """
+        Record a job state. For DONE, the output size and checksum are recorded too.
+        Args:
+            key (str): Output of `job_key`.
+            file (str): Input file (for humans reading the journal).
+            state (str): RUNNING, DONE or FAILED.
+            output (str): Output file.
+            error (str): Failure reason.
+        """
+        size = checksum = None
+        if state == DONE and output and os.path.exists(output):
+            size = os.path.getsize(output)
+            checksum = file_checksum(output)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (key, file, state, output, output_size, checksum, error, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, os.path.abspath(file), state, output, size, checksum, error, time.time())
+            )
+
+    def get(self, key):
+        """
+        Returns:
+            dict: The recorded job (key, file, state, output, output_size, checksum, error, updated) or None.
+        """
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE key = ?", (key,))
+            row = cursor.fetchone()
+            return dict(zip([c[0] for c in cursor.description], row)) if row else None
+
+    def completed(self, key, verify=False):
+        """
+        Check whether a job finished and its output is still in place.
+        Args:
+            key (str): Output of `job_key`.
+            verify (bool): Also compare the output checksum (reads the whole file).
+        Returns:
+            dict: The journal entry if the job can be skipped, else None.
+        """
+        entry = self.get(key)
+        if entry is None or entry["state"] != DONE or not entry["output"]:
+            return None
+        output = entry["output"]
+        if not os.path.exists(output) or os.path.getsize(output) != entry["output_size"]:
+            return None
+        if verify and file_checksum(output) != entry["checksum"]:
+            return None
+        return entry
+
+    def interrupted(self):
+        """
+        Returns:
+            list: Input files of jobs left RUNNING by a batch that did not finish.
+        """
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT file FROM jobs WHERE state = ?", (RUNNING,))]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
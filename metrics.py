@@ -0,0 +1,385 @@
+"""
+Per-job performance metrics and their exporters.
+
+`MetricsRegistry` collects one record per job. Compression records hold the wall time of every stage
+(probe, tune, predict, encode, mux), encode fps and speed sampled over time, input and output bytes,
+the achieved bitrate next to the planned one, and the exit status, which tells a probe-bound, an
+encode-bound and a disk-bound batch apart. Translation records hold cues, translation memory hits and
+requests per file, plus the shared engine's request, retry and throttle counters and latency percentiles.
+
+The registry is exposed in two formats:
+    - `render_prometheus()`: Prometheus text format, written atomically to a node_exporter textfile
+      (`write_textfile`) or served on /metrics by `MetricsServer`
+    - `summary()`: a JSON-ready dict, served on /summary and written at the end of each batch
+      (`write_summary`)
+
+Example:
+    metrics = MetricsRegistry()
+    record = metrics.compression_job("movie.mkv")
+    job = CompressionJob(..., on_progress=record.observe)
+    record.finish(job.run(), job.plan())
+    metrics.write_summary("metrics.json")
+
+The GUI reads VIDEOCOMPRESS_METRICS_TEXTFILE, VIDEOCOMPRESS_METRICS_PORT and VIDEOCOMPRESS_METRICS_JSON
+(see `exporters_from_env`).
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_SAMPLES = 240  # fps/speed samples kept per job (older ones are thinned out)
+
+
+class CompressionMetrics:
+    """
+    Metrics of one compression job. `observe` is a progress callback, `finish` records the outcome.
+    """
+
+    def __init__(self, registry, job):
+        self._registry = registry
+        self.job = job
+        self.status = "running"
+        self.started = time.time()
+        self.stages = {}
+        self.samples = []  # (seconds since start, fps, speed)
+        self.input_bytes = None
+        self.output_bytes = None
+        self.duration = None
+        self.target_bitrate_kbps = None
+        self.achieved_bitrate_kbps = None
+        self.mode = None
+        self.error = None
+        self.returncode = None
+
+    def observe(self, event):
+        """
+        Record the fps and speed of a ProgressEvent.
+        """
+        if event.fps is None and event.speed is None:
+            return
+        with self._registry.lock:
+            self.samples.append((round(time.time() - self.started, 3), event.fps, event.speed))
+            if len(self.samples) > MAX_SAMPLES:
+                # Keep the shape of the curve: drop every other sample
+                self.samples = self.samples[::2]
+
+    def finish(self, result, plan=None):
+        """
+        Args:
+            result (CompressionResult): Outcome of the job.
+            plan (CompressionPlan): Its plan, for the target bitrate (None if planning failed).
+        """
+        with self._registry.lock:
+            self.status = "ok" if result.success else "failed"
+            self.stages = dict(result.timings)
+            self.mode = result.mode
+            self.error = result.error
+            self.returncode = result.returncode
+            self.input_bytes = os.path.getsize(self.job) if os.path.isfile(self.job) else None
+            self.output_bytes = result.output_size or 0
+            if plan is not None:
+                self.duration = plan.duration
+                self.target_bitrate_kbps = plan.video_bitrate_kbps + plan.audio_bitrate / 1000
+                if result.success and plan.duration:
+                    self.achieved_bitrate_kbps = self.output_bytes * 8 / plan.duration / 1000
+
+    def to_dict(self):
+        fps = [s[1] for s in self.samples if s[1] is not None]
+        speed = [s[2] for s in self.samples if s[2] is not None]
+        return {
+            "job": self.job, "kind": "compress", "status": self.status, "mode": self.mode, "error": self.error,
+            "returncode": self.returncode,
+            "stages": self.stages, "input_bytes": self.input_bytes, "output_bytes": self.output_bytes,
+            "duration": self.duration, "target_bitrate_kbps": self.target_bitrate_kbps,
+            "achieved_bitrate_kbps": self.achieved_bitrate_kbps,
+            "mean_fps": sum(fps) / len(fps) if fps else None,
+            "mean_speed": sum(speed) / len(speed) if speed else None,
+            "samples": list(self.samples),
+        }
+
+
+class TranslationMetrics:
+    """
+    Metrics of one translated subtitle file.
+    """
+
+    def __init__(self, registry, job):
+        self._registry = registry
+        self.job = job
+        self.status = "running"
+        self.started = time.time()
+        self.wall = None
+        self.cues = 0
+        self.cache_hits = 0
+        self.batches = 0
+
+    def finish(self, success, cues, cache_hits, batches):
+        """
+        Args:
+            success (bool): The file was written completely.
+            cues (int): Cues read.
+            cache_hits (int): Cues answered by the translation memory.
+            batches (int): Requests sent for the file (before per-cue fallbacks and retries).
+        """
+        with self._registry.lock:
+            self.status = "ok" if success else "failed"
+            self.wall = time.time() - self.started
+            self.cues, self.cache_hits, self.batches = cues, cache_hits, batches
+
+    def to_dict(self):
+        return {"job": self.job, "kind": "translate", "status": self.status, "wall": self.wall,
+                "cues": self.cues, "cache_hits": self.cache_hits, "batches": self.batches}
+
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of job metrics for one batch or session.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.started = time.time()
+        self.jobs = []
+        self.engine = None  # TranslationEngine whose counters are exported
+
+    def compression_job(self, job):
+        """
+        Returns:
+            CompressionMetrics: New record for input file `job`.
+        """
+        record = CompressionMetrics(self, job)
+        with self.lock:
+            self.jobs.append(record)
+        return record
+
+    def translation_job(self, job):
+        """
+        Returns:
+            TranslationMetrics: New record for subtitle file `job`.
+        """
+        record = TranslationMetrics(self, job)
+        with self.lock:
+            self.jobs.append(record)
+        return record
+
+    def engine_stats(self):
+        """
+        Returns:
+            dict: Counters and latency percentiles of the translation engine, or None without one.
+        """
+        return self.engine.stats() if self.engine is not None else None
+
+    def summary(self):
+        """
+        Returns:
+            dict: Batch totals, per-job records and translation engine counters.
+        """
+        with self.lock:
+            jobs = [record.to_dict() for record in self.jobs]
+        stage_totals = {}
+        for job in jobs:
+            for stage, seconds in (job.get("stages") or {}).items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+        return {
+            "wall": time.time() - self.started,
+            "jobs": len(jobs),
+            "ok": sum(1 for job in jobs if job["status"] == "ok"),
+            "failed": sum(1 for job in jobs if job["status"] == "failed"),
+            "input_bytes": sum(job.get("input_bytes") or 0 for job in jobs),
+            "output_bytes": sum(job.get("output_bytes") or 0 for job in jobs),
+            "stage_seconds": stage_totals,
+            "translation_engine": self.engine_stats(),
+            "per_job": jobs,
+        }
+
+    def render_prometheus(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format.
+        """
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples, suffixed=()):
+            # Per-file series are labelled `file`: Prometheus reserves `job` for the scrape target
+            samples = [(labels, value) for labels, value in samples if value is not None]
+            if not samples:
+                return
+            lines.append(f"# HELP videocompress_{name} {help_text}")
+            lines.append(f"# TYPE videocompress_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"videocompress_{name}{{{label_text}}} {float(value):g}" if label_text
+                             else f"videocompress_{name} {float(value):g}")
+            for suffix, value in suffixed:
+                lines.append(f"videocompress_{name}{suffix} {float(value):g}")
+
+        compress = [job for job in summary["per_job"] if job["kind"] == "compress"]
+        translate = [job for job in summary["per_job"] if job["kind"] == "translate"]
+        metric("jobs", "gauge", "Jobs by kind and status.",
+               [({"kind": kind, "status": status},
+                 sum(1 for job in summary["per_job"] if job["kind"] == kind and job["status"] == status))
+                for kind in ("compress", "translate") for status in ("running", "ok", "failed")])
+        metric("job_stage_seconds", "gauge", "Wall time of each stage of a compression job.",
+               [({"file": job["job"], "stage": stage}, seconds)
+                for job in compress for stage, seconds in job["stages"].items()])
+        metric("job_input_bytes", "gauge", "Size of the input file.",
+               [({"file": job["job"]}, job["input_bytes"]) for job in compress])
+        metric("job_output_bytes", "gauge", "Size of the output file.",
+               [({"file": job["job"]}, job["output_bytes"]) for job in compress])
+        metric("job_target_bitrate_kbps", "gauge", "Planned bitrate (video + audio).",
+               [({"file": job["job"]}, job["target_bitrate_kbps"]) for job in compress])
+        metric("job_achieved_bitrate_kbps", "gauge", "Bitrate of the output file.",
+               [({"file": job["job"]}, job["achieved_bitrate_kbps"]) for job in compress])
+        metric("job_encode_fps", "gauge", "Mean encoding frames per second.",
+               [({"file": job["job"]}, job["mean_fps"]) for job in compress])
+        metric("job_encode_speed", "gauge", "Mean encoding speed relative to real time.",
+               [({"file": job["job"]}, job["mean_speed"]) for job in compress])
+        metric("job_success", "gauge", "1 if the job succeeded, 0 if it failed.",
+               [({"file": job["job"], "kind": job["kind"]}, 1 if job["status"] == "ok" else 0)
+                for job in summary["per_job"] if job["status"] != "running"])
+        metric("job_exit_code", "gauge", "Exit code of the job's ffmpeg process (absent if ffmpeg never ran).",
+               [({"file": job["job"]}, job["returncode"]) for job in compress])
+        metric("translation_cues", "gauge", "Cues read from a subtitle file.",
+               [({"file": job["job"]}, job["cues"]) for job in translate])
+        metric("translation_cache_hits", "gauge", "Cues answered by the translation memory.",
+               [({"file": job["job"]}, job["cache_hits"]) for job in translate])
+        metric("translation_batches", "gauge", "Batched requests sent for a subtitle file.",
+               [({"file": job["job"]}, job["batches"]) for job in translate])
+        engine = summary["translation_engine"]
+        if engine:
+            metric("translation_requests_total", "counter", "Requests sent to the translation service.",
+                   [({}, engine["requests"])])
+            metric("translation_retries_total", "counter", "Requests retried after a transient error.",
+                   [({}, engine["retries"])])
+            metric("translation_throttled_total", "counter", "Responses with HTTP 429.", [({}, engine["throttled"])])
+            metric("translation_latency_seconds", "summary", "Latency of successful translation requests.",
+                   [({"quantile": q}, engine["latency"].get(q)) for q in ("0.5", "0.9", "0.99")],
+                   [("_sum", engine["latency_sum"]), ("_count", engine["latency_count"])])
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """
+        Write the Prometheus metrics for node_exporter's textfile collector (atomic rename, so the
+        collector never reads a half-written file).
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+    def write_summary(self, path):
+        """
+        Write `summary()` as JSON.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsServer:
+    """
+    Serve the registry on http://host:port/metrics (Prometheus) and /summary (JSON) from a background thread.
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        handler = self._make_handler(registry)
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    @staticmethod
+    def _make_handler(registry):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # keep the terminal for progress output
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+                elif self.path == "/summary":
+                    body, content_type = json.dumps(registry.summary()).encode("utf-8"), "application/json"
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        return Handler
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class Exporters:
+    """
+    The exporters of one batch: textfile refreshes, HTTP endpoint and final JSON summary.
+    """
+
+    def __init__(self, registry, textfile=None, port=None, summary_path=None, interval=15.0):
+        """
+        Args:
+            registry (MetricsRegistry): Metrics to export.
+            textfile (str): Prometheus textfile to refresh every `interval` seconds and at the end.
+            port (int): Serve /metrics and /summary on this local port.
+            summary_path (str): Write the JSON summary there when the batch ends.
+            interval (float): Seconds between textfile refreshes.
+        """
+        self.registry = registry
+        self.textfile = textfile
+        self.summary_path = summary_path
+        self.server = MetricsServer(registry, port=port) if port else None
+        self._stop = threading.Event()
+        self._thread = None
+        if textfile:
+            self._thread = threading.Thread(target=self._refresh, args=(interval,), daemon=True)
+            self._thread.start()
+
+    def _refresh(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.registry.write_textfile(self.textfile)
+            except OSError:
+                pass
+
+    def close(self):
+        """
+        Write the final textfile and summary and stop the HTTP endpoint.
+        """
+        self._stop.set()
+        if self.textfile:
+            self.registry.write_textfile(self.textfile)
+        if self.summary_path:
+            self.registry.write_summary(self.summary_path)
+        if self.server:
+            self.server.stop()
+
+
+def exporters_from_env(registry):
+    """
+    Build the exporters configured by VIDEOCOMPRESS_METRICS_TEXTFILE, VIDEOCOMPRESS_METRICS_PORT and
+    VIDEOCOMPRESS_METRICS_JSON.
+    Returns:
+        Exporters: Exporters to close at the end of the batch, or None if none is configured.
+    """
+    textfile = os.environ.get("VIDEOCOMPRESS_METRICS_TEXTFILE") or None
+    port = os.environ.get("VIDEOCOMPRESS_METRICS_PORT")
+    summary_path = os.environ.get("VIDEOCOMPRESS_METRICS_JSON") or None
+    if not (textfile or port or summary_path):
+        return None
+    return Exporters(registry, textfile, int(port) if port else None, summary_path)
@@ -0,0 +1,130 @@
+"""
+Sample-based size prediction and rate-control choice.
+
+Instead of encoding every file at one flat average bitrate, a few short windows are encoded at a
+probe CRF and the output size is extrapolated to the whole input. The CRF that should land on the
+size budget is then derived from the usual rule that the size halves every few CRF steps, checked with
+a second sample pass, and used for the full encode (capped with -maxrate). When the model cannot be
+trusted within the tolerance, a capped VBR encode at the average bitrate is used instead; easy content
+is encoded at the best CRF of the range even if that leaves it under the target.
+"""
+import math
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from sampling import SAMPLE_SECONDS, encode_sample, sample_windows
+
+RATE_CRF = "crf"
+RATE_VBR = "capped vbr"
+
+# Per encoder: (best CRF used, worst CRF used, probe CRF, CRF steps that halve the size)
+CRF_MODELS = {
+    "libx264": (18, 30, 23, 6.0),
+    "libx265": (20, 32, 28, 6.0),
+    "libsvtav1": (20, 50, 35, 10.0),
+}
+DEFAULT_TOLERANCE = 0.05
+PREDICT_SAMPLES = 5
+
+
+@dataclass
+class SizePrediction:
+    """
+    Rate control chosen for the full encode and the size it should produce.
+    """
+    rate_mode: str              # RATE_CRF or RATE_VBR
+    rate_args: list             # ffmpeg rate-control arguments replacing -b:v
+    video_budget: int           # bytes available for the video
+    predicted_video_size: int   # bytes the video stream should take
+    crf: float = None
+    samples: list = field(default_factory=list)  # (crf, bytes per second) per sample pass
+
+
+def _round_crf(codec, crf):
+    # x264/x265 accept fractional CRF, SVT-AV1 only integers
+    return float(round(crf)) if codec == "libsvtav1" else round(crf * 2) / 2
+
+
+class SizePredictor:
+    """
+    Choose CRF or capped VBR for one input from sampled trial encodes.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, samples=PREDICT_SAMPLES, sample_seconds=SAMPLE_SECONDS):
+        """
+        Args:
+            tolerance (float): Acceptable relative error of the predicted size (0.05 = 5%).
+            samples (int): Number of sampled windows per pass.
+            sample_seconds (float): Length of each window.
+        """
+        self.tolerance = tolerance
+        self.samples = samples
+        self.sample_seconds = sample_seconds
+
+    def _sample_rate(self, media, encoder, crf, threads, work_dir):
+        """
+        Returns:
+            float: Encoded bytes per second of input at this CRF, over all windows.
+        """
+        total_bytes = total_seconds = 0
+        for i, (start, length) in enumerate(sample_windows(media.duration, self.samples, self.sample_seconds)):
+            sample_file = os.path.join(work_dir, f"crf{crf}_{i}.mkv")
+            args = encoder.args(None, threads, rate_args=["-crf", f"{crf:g}"])
+            result = encode_sample(media.path, media.video.index, start, length, args, sample_file)
+            total_bytes += result.size
+            total_seconds += length
+        return total_bytes / total_seconds if total_seconds else 0.0
+
+    def _vbr(self, video_budget, duration, samples):
+        kbps = max(1, int(video_budget * 8 / duration / 1000))
+        args = ["-b:v", f"{kbps}k", "-maxrate", f"{int(kbps * 1.5)}k", "-bufsize", f"{kbps * 3}k"]
+        return SizePrediction(RATE_VBR, args, int(video_budget), int(video_budget), samples=samples)
+
+    def predict(self, media, encoder, video_budget, threads=None):
+        """
+        Args:
+            media (MediaInfo): Probed input.
+            encoder (EncoderSetting): Encoder and preset of the full encode.
+            video_budget (float): Bytes available for the video stream.
+            threads (int): ffmpeg threads for the sample encodes.
+        Returns:
+            SizePrediction: Rate control for the full encode.
+        Raises:
+            RuntimeError: If a sample encode fails.
+        """
+        duration = media.duration
+        if encoder.codec not in CRF_MODELS:
+            return self._vbr(video_budget, duration, [])
+        best, worst, probe, step = CRF_MODELS[encoder.codec]
+        target_rate = video_budget / duration
+        work_dir = tempfile.mkdtemp(prefix="videocompress-predict-")
+        try:
+            rate0 = self._sample_rate(media, encoder, probe, threads, work_dir)
+            samples = [(probe, rate0)]
+            if rate0 <= 0:
+                return self._vbr(video_budget, duration, samples)
+            crf = _round_crf(encoder.codec, min(worst, max(best, probe + step * math.log2(rate0 / target_rate))))
+            predicted_rate = rate0 * 2 ** ((probe - crf) / step)
+            if crf != probe:
+                # Check the model on the real content and fit the local slope
+                rate1 = self._sample_rate(media, encoder, crf, threads, work_dir)
+                samples.append((crf, rate1))
+                if rate1 <= 0 or abs(rate1 - predicted_rate) / predicted_rate > self.tolerance * 4:
+                    return self._vbr(video_budget, duration, samples)
+                if rate1 != rate0:
+                    step = min(12.0, max(3.0, (crf - probe) / math.log2(rate0 / rate1)))
+                refined = _round_crf(encoder.codec, min(worst, max(best, crf + step * math.log2(rate1 / target_rate))))
+                predicted_rate = rate1 * 2 ** ((crf - refined) / step)
+                crf = refined
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        predicted = predicted_rate * duration
+        if predicted > video_budget * (1 + self.tolerance):
+            # Even the worst CRF of the range is too big: only a bitrate target fits
+            return self._vbr(video_budget, duration, samples)
+        # The cap keeps peaks in check if the samples missed the hardest scenes
+        cap_kbps = max(1, int(video_budget * 8 / duration / 1000 * 2))
+        args = ["-crf", f"{crf:g}", "-maxrate", f"{cap_kbps}k", "-bufsize", f"{cap_kbps * 2}k"]
+        return SizePrediction(RATE_CRF, args, int(video_budget), int(predicted), crf=crf, samples=samples)
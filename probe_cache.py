@@ -0,0 +1,192 @@
+"""
+Persistent cache for ffprobe results.
+
+Probe reports are stored in a SQLite database in the user cache folder, keyed by absolute path,
+file size and modification time, so a file that changes is probed again. The database is bounded in
+size: the least recently used entries are evicted first.
+
+Set the environment variable VIDEOCOMPRESS_PROBE_CACHE=0 to disable the cache.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils import MediaInfo, probe_media, probe_media_json, user_cache_dir
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024  # 32 MB of probe reports is tens of thousands of files
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".m4v", ".webm", ".ts", ".wmv")
+
+
+class ProbeCache:
+    """
+    SQLite-backed LRU cache of ffprobe JSON reports. Safe to share between threads.
+    """
+
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            db_path (str): Database file (default: probe_cache.sqlite3 in the user cache folder).
+            max_bytes (int): Maximum total size of stored reports before LRU eviction.
+        """
+        self.db_path = db_path or os.path.join(user_cache_dir(), "probe_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER,"
+                " data TEXT, bytes INTEGER, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used)")
+
+    @staticmethod
+    def _key(path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns
+
+    def get(self, path):
+        """
+        Look up a cached probe report.
+        Args:
+            path (str): Media file path.
+        Returns:
+            dict: The ffprobe JSON report, or None on a miss (or if the file changed).
+        """
+        abspath, size, mtime = self._key(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM probes WHERE path = ? AND size = ? AND mtime = ?",
+                (abspath, size, mtime)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE probes SET last_used = ? WHERE path = ?", (time.time(), abspath))
+        return json.loads(row[0])
+
+    def put(self, path, data):
+        """
+        Store a probe report and evict old entries if the cache grew too large.
+        Args:
+            path (str): Media file path.
+            data (dict): ffprobe JSON report.
+        """
+        abspath, size, mtime = self._key(path)
+        text = json.dumps(data, separators=(",", ":"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO probes (path, size, mtime, data, bytes, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (abspath, size, mtime, text, len(text), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM probes").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for path, nbytes in self._conn.execute("SELECT path, bytes FROM probes ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM probes WHERE path = ?", (path,))
+            total -= nbytes
+            self.evictions += 1
+
+    def probe(self, path):
+        """
+        Probe a media file, using the cache when the file has not changed.
+        Args:
+            path (str): Media file path.
+        Returns:
+            MediaInfo: Parsed metadata.
+        """
+        data = self.get(path)
+        if data is None:
+            data = probe_media_json(path)
+            # Only cache readable files, a failed probe may be transient (e.g. file still copying)
+            if MediaInfo.from_ffprobe(path, data).duration:
+                self.put(path, data)
+        return MediaInfo.from_ffprobe(path, data)
+
+    def warm(self, directory, extensions=VIDEO_EXTENSIONS, workers=8, recursive=True):
+        """
+        Probe every video file in a folder in parallel so later runs hit the cache.
+        Args:
+            directory (str): Folder to scan.
+            extensions (tuple): File extensions to include (lowercase, with dot).
+            workers (int): Number of concurrent ffprobe processes.
+            recursive (bool): Also scan sub-folders.
+        Returns:
+            int: Number of files probed or already cached.
+        """
+        import concurrent.futures
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(extensions))
+            if not recursive:
+                break
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self.probe, paths))
+        return len(paths)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters for this session plus stored entry count and size.
+        """
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM probes").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        """
+        Remove every cached entry.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM probes")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Returns:
+        ProbeCache: The shared cache, or None if disabled or the database cannot be opened.
+    """
+    global _default_cache
+    if os.environ.get("VIDEOCOMPRESS_PROBE_CACHE") == "0":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = ProbeCache()
+            except (sqlite3.Error, OSError):
+                return None
+        return _default_cache
+
+
+def cached_probe_media(path):
+    """
+    Drop-in replacement for `utils.probe_media` that goes through the shared cache when available.
+    Args:
+        path (str): Media file path.
+    Returns:
+        MediaInfo: Parsed metadata.
+    """
+    cache = get_default_cache()
+    if cache is None:
+        return probe_media(path)
+    try:
+        return cache.probe(path)
+    except sqlite3.Error:
+        return probe_media(path)
@@ -0,0 +1,204 @@
+"""
+Throttled progress event bus.
+
+Compression and translation jobs publish progress with `ProgressBus.publish`, which only records the
+latest values of the job and never blocks on the consumers. A dispatcher thread delivers the jobs that
+changed since the last tick, at most `rate` times per second, to every subscriber: the Tk windows
+(through their `TkBridge`), the terminal bar (`TerminalProgress`) and a JSON-lines stream
+(`JsonLinesProgress`) all read the same updates.
+
+An update is a dict with these keys (missing values are None):
+    job: job identifier (usually the input file path)
+    kind: 'compress' or 'translate'
+    state: 'queued', 'running', 'paused', 'done', 'failed' or 'cancelled'
+    percent: progress from 0 to 100
+    eta: seconds left
+    message: short status text
+    time: Unix time of the last publish
+plus any extra key the producer publishes (speed, cues, from_cache...).
+
+Set VIDEOCOMPRESS_PROGRESS_JSON to a file path ('-' for stdout) to get the JSON-lines stream from the GUI.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+DEFAULT_RATE = 4.0  # deliveries per second
+FINAL_STATES = ("done", "failed", "cancelled")
+
+
+class ProgressBus:
+    """
+    Coalesce progress per job and publish it to subscribers at a fixed rate.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE):
+        """
+        Args:
+            rate (float): Maximum deliveries per second.
+        """
+        self.interval = 1.0 / rate
+        self._jobs = {}
+        self._dirty = {}  # jobs changed since the last delivery, in order of first change
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._deliver_lock = threading.Lock()  # keeps deliveries in publish order
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def subscribe(self, callback):
+        """
+        Args:
+            callback (callable): Called from the dispatcher thread with a list of updates (one per changed
+                job, in order of first change). Must not block; Tk consumers hand the list to a TkBridge.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, job, **fields):
+        """
+        Record new values for a job. Never blocks on subscribers; safe to call from any thread.
+        Args:
+            job: Job identifier.
+            **fields: Update keys (kind, state, percent, eta, message or extra counters).
+        """
+        with self._lock:
+            update = self._jobs.get(job)
+            if update is None:
+                update = self._jobs[job] = {"job": job, "kind": None, "state": None, "percent": None,
+                                            "eta": None, "message": None}
+            update.update(fields, time=time.time())
+            self._dirty.setdefault(job)
+        if fields.get("state") in FINAL_STATES:
+            self._wake.set()  # final states are delivered without waiting for the next tick
+
+    def snapshot(self):
+        """
+        Returns:
+            list: Latest update of every job seen so far.
+        """
+        with self._lock:
+            return [dict(update) for update in self._jobs.values()]
+
+    def flush(self):
+        """
+        Deliver pending updates now, from the calling thread.
+        """
+        with self._deliver_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                updates = [dict(self._jobs[job]) for job in dirty]
+                subscribers = list(self._subscribers)
+            if not updates:
+                return
+            for callback in subscribers:
+                try:
+                    callback(updates)
+                except Exception as e:
+                    print(f"Progress subscriber failed: {e}", file=sys.stderr)
+
+    def _loop(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """
+        Deliver the last updates and stop the dispatcher thread.
+        """
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+def format_eta(seconds):
+    """
+    Returns:
+        str: 'mm:ss', or '--:--' if unknown.
+    """
+    if seconds is None:
+        return "--:--"
+    mins, secs = divmod(int(seconds), 60)
+    return f"{mins:02d}:{secs:02d}"
+
+
+class TerminalProgress:
+    """
+    Subscriber drawing progress on the terminal: a redrawn bar for a single job, otherwise one line per
+    job every 10% and on completion.
+    """
+
+    def __init__(self, single=True, label="Compressing", stream=None, bar_len=40):
+        self.single = single
+        self.label = label
+        self.stream = stream or sys.stdout
+        self.bar_len = bar_len
+        self._steps = {}
+
+    def __call__(self, updates):
+        for update in updates:
+            percent = int(update["percent"] or 0)
+            final = update["state"] in FINAL_STATES
+            if self.single:
+                filled_len = int(round(self.bar_len * percent / 100.0))
+                bar = '=' * filled_len + '-' * (self.bar_len - filled_len)
+                self.stream.write(f'\r{self.label}: [{bar}] {percent}% | ETA: {format_eta(update["eta"])}')
+                if final:
+                    self.stream.write('\n')
+                self.stream.flush()
+                continue
+            step = 10 if final else percent // 10
+            if update["percent"] is None or self._steps.get(update["job"]) == step:
+                continue
+            self._steps[update["job"]] = step
+            name = os.path.basename(str(update["job"]))
+            self.stream.write(f"[{name}] {percent}% | ETA: {format_eta(update['eta'])}\n")
+            self.stream.flush()
+
+
+class JsonLinesProgress:
+    """
+    Subscriber writing every update as one JSON object per line.
+    """
+
+    def __init__(self, target):
+        """
+        Args:
+            target (str or file): Path to append to, '-' for stdout, or an open text stream.
+        """
+        self._owned = isinstance(target, str) and target != "-"
+        if target == "-":
+            self.stream = sys.stdout
+        elif self._owned:
+            self.stream = open(target, "a", encoding="utf-8")
+        else:
+            self.stream = target
+
+    def __call__(self, updates):
+        for update in updates:
+            self.stream.write(json.dumps(update, default=str) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        if self._owned:
+            self.stream.close()
+
+
+def subscribe_json_from_env(bus):
+    """
+    Add a JsonLinesProgress subscriber if VIDEOCOMPRESS_PROGRESS_JSON is set.
+    Returns:
+        JsonLinesProgress: The subscriber (close it when done), or None.
+    """
+    target = os.environ.get("VIDEOCOMPRESS_PROGRESS_JSON")
+    if not target:
+        return None
+    sink = JsonLinesProgress(target)
+    bus.subscribe(sink)
+    return sink
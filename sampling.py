@@ -0,0 +1,107 @@
+"""
+Short trial encodes of sampled windows of an input.
+
+Used to measure an encoder setting on the real content before committing to a full encode: each
+window is encoded on its own (video only), timed, and optionally compared with the source through
+ffmpeg's ssim/psnr filters.
+"""
+import os
+import re
+import subprocess
+import time
+from dataclasses import dataclass
+from ffmpeg_progress import PROGRESS_ARGS, read_progress
+
+SAMPLE_COUNT = 3
+SAMPLE_SECONDS = 4.0
+
+_SSIM_RE = re.compile(r"SSIM .*All:([0-9.]+)")
+_PSNR_RE = re.compile(r"PSNR .*average:([0-9.]+|inf)")
+
+
+@dataclass
+class SampleResult:
+    """
+    Outcome of encoding one sampled window.
+    """
+    start: float
+    length: float
+    size: int          # bytes of encoded video
+    elapsed: float     # wall-clock seconds spent encoding
+    frames: int = None
+    ssim: float = None
+    psnr: float = None
+
+    @property
+    def fps(self):
+        return self.frames / self.elapsed if self.frames and self.elapsed > 0 else None
+
+
+def sample_windows(duration, count=SAMPLE_COUNT, length=SAMPLE_SECONDS):
+    """
+    Pick `count` evenly spaced windows, each centred in its share of the input.
+    Args:
+        duration (float): Input duration in seconds.
+        count (int): Number of windows.
+        length (float): Window length in seconds.
+    Returns:
+        list: (start, length) tuples; a single window covering the input if it is too short.
+    """
+    if duration <= count * length:
+        return [(0.0, duration)]
+    return [(max(0.0, duration * (i + 0.5) / count - length / 2), length) for i in range(count)]
+
+
+def encode_sample(path, stream_index, start, length, video_args, output):
+    """
+    Encode one window of the video stream.
+    Args:
+        path (str): Input file.
+        stream_index (int): Index of the video stream.
+        start (float): Window start in seconds.
+        length (float): Window length in seconds.
+        video_args (list): Encoder arguments (codec, rate control, preset, threads).
+        output (str): Sample file to write (.mkv).
+    Returns:
+        SampleResult: Size and timing of the sample (no quality metrics yet).
+    Raises:
+        RuntimeError: If ffmpeg fails.
+    """
+    cmd = ["ffmpeg", "-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", path,
+           "-map", f"0:{stream_index}", "-an", "-sn", "-dn"] + video_args + PROGRESS_ARGS + [output, "-y"]
+    t0 = time.time()
+    proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, errors="replace")
+    elapsed = time.time() - t0
+    if proc.returncode != 0:
+        last_line = (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]
+        raise RuntimeError(f"sample encode failed: {last_line}")
+    last = read_progress(proc.stdout.splitlines(), lambda block: None, min_interval=0)
+    size = os.path.getsize(output) if os.path.exists(output) else 0
+    return SampleResult(start, length, size, elapsed, frames=last.frame if last else None)
+
+
+def measure_quality(path, stream_index, result, sample_file):
+    """
+    Compare an encoded sample with the matching window of the source and fill in SSIM and PSNR.
+    Args:
+        path (str): Source file.
+        stream_index (int): Index of the video stream in the source.
+        result (SampleResult): Output of `encode_sample`.
+        sample_file (str): The encoded sample.
+    Returns:
+        SampleResult: The same result, with ssim/psnr set when ffmpeg reported them.
+    """
+    graph = (f"[0:{stream_index}]split[r1][r2];[1:v:0]split[d1][d2];"
+             "[d1][r1]ssim;[d2][r2]psnr")
+    cmd = ["ffmpeg", "-nostats", "-ss", f"{result.start:.3f}", "-t", f"{result.length:.3f}", "-i", path,
+           "-i", sample_file, "-lavfi", graph, "-f", "null", "-"]
+    proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True, errors="replace")
+    ssim = _SSIM_RE.search(proc.stderr)
+    psnr = _PSNR_RE.search(proc.stderr)
+    if ssim:
+        result.ssim = float(ssim.group(1))
+    if psnr:
+        result.psnr = float(psnr.group(1))
+    return result
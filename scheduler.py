@@ -0,0 +1,299 @@
+import itertools
+import os
+import threading
+import time
+
+# Job states reported to the progress window
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Priority levels: queued jobs start in this order, first come first served within a level
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITIES = {"high": PRIORITY_HIGH, "normal": PRIORITY_NORMAL, "low": PRIORITY_LOW}
+
+
+def physical_core_count():
+    """
+    Return the number of physical CPU cores (hyper-threads are not counted).
+    Uses psutil if available, then /proc/cpuinfo on Linux, else os.cpu_count().
+    Returns:
+        int: Number of physical cores (at least 1).
+    """
+    try:
+        import psutil
+        count = psutil.cpu_count(logical=False)
+        if count:
+            return count
+    except ImportError:
+        pass
+    try:
+        cores = set()
+        physical_id = core_id = None
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":", 1)[1].strip()
+                elif line.startswith("core id"):
+                    core_id = line.split(":", 1)[1].strip()
+                elif not line.strip():
+                    if core_id is not None:
+                        cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+        if core_id is not None:
+            cores.add((physical_id, core_id))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+class JobScheduler:
+    """
+    Run compression jobs with a bounded number of concurrent ffmpeg processes.
+    Remaining jobs wait in a priority queue that can be reordered while the batch runs. Each job receives
+    a `threads` keyword argument so that the sum of ffmpeg threads stays within the machine's logical CPU count.
+
+    Jobs can be paused, resumed and cancelled by id. A queued job is simply held back or dropped; a running
+    job is controlled through the handle its function registers with `attach` (a `CompressionJob`, or any
+    object with pause(), unpause() and cancel()).
+    """
+
+    def __init__(self, max_jobs=None, total_threads=None, on_state=None):
+        """
+        Args:
+            max_jobs (int): Maximum number of concurrent jobs (default: physical core count).
+            total_threads (int): Thread budget shared by running jobs (default: logical CPU count).
+            on_state (callable): Called as on_state(job_id, state) on every state change.
+        """
+        self.max_jobs = max(1, int(max_jobs or physical_core_count()))
+        self.total_threads = max(1, int(total_threads or os.cpu_count() or 1))
+        self.on_state = on_state
+        self.states = {}
+        self.results = {}
+        self.priorities = {}
+        self._pending = {}  # job id -> (sort key, func, args, kwargs)
+        self._order = itertools.count()
+        self._front = itertools.count(-1, -1)  # sort keys for jobs moved to the front of their level
+        self._held = set()  # queued jobs that are paused
+        self._handles = {}  # running job id -> handle registered with attach()
+        self._cancelled = set()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def threads_per_job(self, job_count=None):
+        """
+        Split the thread budget between the jobs that can actually run at once.
+        Args:
+            job_count (int): Number of submitted jobs (default: all jobs known so far).
+        Returns:
+            int: ffmpeg `-threads` value for each job.
+        """
+        if job_count is None:
+            job_count = len(self.states)
+        concurrent = max(1, min(self.max_jobs, job_count))
+        return max(1, self.total_threads // concurrent)
+
+    def _set_state(self, job_id, state):
+        with self._lock:
+            self.states[job_id] = state
+        self._notify(job_id, state)
+
+    def _notify(self, job_id, state):
+        if self.on_state:
+            try:
+                self.on_state(job_id, state)
+            except Exception:
+                pass
+
+    def submit(self, job_id, func, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """
+        Queue a job. `func(*args, threads=N, **kwargs)` is called when a slot frees up;
+        a falsy return value or an exception marks the job as failed.
+        Args:
+            job_id: Identifier reported to `on_state`.
+            func (callable): Job function.
+            priority (int): PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.
+        """
+        with self._lock:
+            self.priorities[job_id] = priority
+            self._pending[job_id] = (next(self._order), func, args, kwargs)
+        self._set_state(job_id, QUEUED)
+
+    def set_priority(self, job_id, priority):
+        """
+        Change the priority of a queued job; it starts before every job of a lower level.
+        Returns:
+            bool: False if the job is no longer queued.
+        """
+        with self._lock:
+            if job_id not in self._pending:
+                return False
+            self.priorities[job_id] = priority
+            return True
+
+    def move_to_front(self, job_id):
+        """
+        Make a queued job the next one to start within its priority level.
+        Returns:
+            bool: False if the job is no longer queued.
+        """
+        with self._lock:
+            if job_id not in self._pending:
+                return False
+            _, func, args, kwargs = self._pending[job_id]
+            self._pending[job_id] = (next(self._front), func, args, kwargs)
+            return True
+
+    def queue_order(self):
+        """
+        Returns:
+            list: Ids of the queued jobs, in the order they will start (held jobs included).
+        """
+        with self._lock:
+            return sorted(self._pending, key=lambda job_id: (self.priorities[job_id], self._pending[job_id][0]))
+
+    def attach(self, job_id, handle):
+        """
+        Register the handle controlling a running job. Called by the job function before it starts ffmpeg.
+        A job cancelled or paused in the meantime is cancelled or paused right away.
+        Args:
+            handle: Object with pause(), unpause() and cancel() (e.g. a CompressionJob).
+        """
+        with self._lock:
+            self._handles[job_id] = handle
+            cancelled = job_id in self._cancelled
+            paused = self.states.get(job_id) == PAUSED
+        if cancelled:
+            handle.cancel()
+        elif paused:
+            handle.pause()
+
+    def pause(self, job_id):
+        """
+        Pause a job: a queued job is held back, a running job has its ffmpeg processes suspended.
+        Returns:
+            bool: False if the job is not queued or running.
+        """
+        with self._lock:
+            state = self.states.get(job_id)
+            handle = self._handles.get(job_id)
+            if state == QUEUED:
+                self._held.add(job_id)
+            elif state != RUNNING:
+                return False
+        if handle is not None:
+            handle.pause()
+        self._set_state(job_id, PAUSED)
+        return True
+
+    def resume(self, job_id):
+        """
+        Resume a paused job.
+        Returns:
+            bool: False if the job was not paused.
+        """
+        with self._lock:
+            if self.states.get(job_id) != PAUSED:
+                return False
+            queued = job_id in self._held
+            self._held.discard(job_id)
+            handle = self._handles.get(job_id)
+        if handle is not None:
+            handle.unpause()
+        self._set_state(job_id, QUEUED if queued else RUNNING)
+        return True
+
+    def cancel(self, job_id):
+        """
+        Cancel a job: a queued job is dropped, a running job has its ffmpeg processes terminated
+        (the job function is expected to remove its partial output, as CompressionJob does).
+        Returns:
+            bool: False if the job had already finished.
+        """
+        with self._lock:
+            if self.states.get(job_id) in (DONE, FAILED, CANCELLED):
+                return False
+            self._cancelled.add(job_id)
+            queued = self._pending.pop(job_id, None) is not None
+            self._held.discard(job_id)
+            handle = self._handles.get(job_id)
+        if queued:
+            self._set_state(job_id, CANCELLED)
+        elif handle is not None:
+            handle.cancel()
+        return True
+
+    def cancel_all(self):
+        """
+        Cancel every queued and running job (e.g. when the progress window is closed).
+        """
+        for job_id in list(self.states):
+            self.cancel(job_id)
+
+    def _next_job(self):
+        with self._lock:
+            ready = [job_id for job_id in self._pending if job_id not in self._held]
+            if not ready:
+                return None
+            job_id = min(ready, key=lambda job_id: (self.priorities[job_id], self._pending[job_id][0]))
+            _, func, args, kwargs = self._pending.pop(job_id)
+            self.states[job_id] = RUNNING
+        return job_id, func, args, kwargs
+
+    def _worker(self, threads):
+        while True:
+            job = self._next_job()
+            if job is None:
+                with self._lock:
+                    held = bool(self._held)
+                if held:
+                    # Paused jobs are still queued: keep the slot until they are resumed or cancelled
+                    time.sleep(0.2)
+                    continue
+                return
+            job_id, func, args, kwargs = job
+            with self._lock:
+                state = self.states[job_id]  # set when the job left the queue, maybe paused since
+            self._notify(job_id, state)
+            try:
+                result = func(*args, threads=threads, **kwargs)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                result = False
+            with self._lock:
+                self.results[job_id] = result
+                self._handles.pop(job_id, None)
+                cancelled = job_id in self._cancelled
+            self._set_state(job_id, DONE if result else CANCELLED if cancelled else FAILED)
+
+    def start(self):
+        """
+        Start the worker threads. Jobs submitted before this call share the thread budget.
+        """
+        pending = len(self._pending)
+        threads = self.threads_per_job(pending)
+        for _ in range(min(self.max_jobs, max(1, pending))):
+            t = threading.Thread(target=self._worker, args=(threads,), daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def is_running(self):
+        """
+        Returns:
+            bool: True while any worker thread is still processing jobs.
+        """
+        return any(t.is_alive() for t in self._workers)
+
+    def join(self):
+        """
+        Block until every queued job has finished.
+        """
+        for t in self._workers:
+            t.join()
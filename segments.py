@@ -0,0 +1,127 @@
+"""
+Segment-parallel encoding helpers.
+
+A long input is cut at keyframes into N segments that are encoded by N concurrent ffmpeg processes
+(video only), then joined losslessly with the concat demuxer while the audio and subtitles are
+muxed in from the original file. `CompressionJob` drives the processes; this module only plans the
+cut points and builds the commands.
+"""
+import os
+from utils import ffprobe
+
+MIN_SEGMENT_SECONDS = 60      # shorter segments waste time on encoder start-up and hurt rate control
+AUTO_SEGMENT_SECONDS = 300    # 'auto' mode aims for segments of at least this length
+KEYFRAME_SEARCH_WINDOW = 15   # seconds scanned after each ideal cut point
+
+
+def auto_segment_count(duration, cores):
+    """
+    Pick a segment count for 'auto' mode: one per core, but only for inputs long enough to benefit.
+    Args:
+        duration (float): Input duration in seconds.
+        cores (int): Number of physical cores.
+    Returns:
+        int: Segment count (1 means no segmentation).
+    """
+    return max(1, min(cores, int(duration // AUTO_SEGMENT_SECONDS)))
+
+
+def find_keyframe(path, stream_index, time_s, window=KEYFRAME_SEARCH_WINDOW):
+    """
+    Return the timestamp of the first video keyframe at or after `time_s`.
+    Only packets in [time_s, time_s + window] are read, so this stays fast on long files.
+    Args:
+        path (str): Input file.
+        stream_index (int): Index of the video stream.
+        time_s (float): Ideal cut point in seconds.
+        window (float): Seconds to scan.
+    Returns:
+        float: Keyframe timestamp, or None if none was found in the window.
+    """
+    output = ffprobe([
+        "ffprobe", "-v", "error", "-select_streams", str(stream_index),
+        "-read_intervals", f"{time_s:.3f}%+{window}",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+    ])
+    candidates = []
+    for line in output.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" not in flags:
+            continue
+        try:
+            candidates.append(float(pts))
+        except ValueError:
+            continue
+    after = [t for t in candidates if t >= time_s]
+    if after:
+        return min(after)
+    # The scan starts at the keyframe before time_s, fall back to it
+    return max(candidates) if candidates else None
+
+
+def plan_segments(path, stream_index, duration, count):
+    """
+    Split an input into up to `count` segments cut at keyframes.
+    Args:
+        path (str): Input file.
+        stream_index (int): Index of the video stream.
+        duration (float): Input duration in seconds.
+        count (int): Requested number of segments.
+    Returns:
+        list: (start, end) tuples in seconds covering the whole input; a single segment means
+        segmentation is not worthwhile.
+    """
+    count = max(1, min(count, int(duration // MIN_SEGMENT_SECONDS)))
+    cuts = [0.0]
+    for i in range(1, count):
+        cut = find_keyframe(path, stream_index, duration * i / count)
+        if cut is not None and cut - cuts[-1] >= MIN_SEGMENT_SECONDS and duration - cut >= MIN_SEGMENT_SECONDS:
+            cuts.append(cut)
+    cuts.append(duration)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def segment_cmd(video_name, start, end, stream_index, video_args, segment_name, last=False):
+    """
+    Build the ffmpeg command that encodes the video of one segment (no audio or subtitles).
+    Args:
+        video_name (str): Input file name (relative to the working folder).
+        start (float): Segment start in seconds (a keyframe).
+        end (float): Segment end in seconds.
+        stream_index (int): Index of the video stream.
+        video_args (list): Encoder arguments (codec, bitrate, preset, filters, threads).
+        segment_name (str): Output file for the segment.
+        last (bool): Read to the end of the input instead of stopping at `end`.
+    Returns:
+        list: ffmpeg command.
+    """
+    cmd = ["ffmpeg", "-ss", f"{start:.6f}", "-i", video_name]
+    if not last:
+        cmd += ["-t", f"{end - start:.6f}"]
+    return cmd + ["-map", f"0:{stream_index}", "-an", "-sn", "-dn"] + video_args + [segment_name, "-y"]
+
+
+def write_concat_list(list_path, segment_paths):
+    """
+    Write a concat demuxer list file.
+    Args:
+        list_path (str): Where to write the list.
+        segment_paths (list): Segment files, in order.
+    """
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            # The concat demuxer uses shell-like quoting
+            escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+
+def subtitle_filter_for_segment(sub_filename, start):
+    """
+    Burn-in filter for a segment: shift timestamps so subtitles line up with the original timeline.
+    Args:
+        sub_filename (str): Subtitle file name, with forward slashes.
+        start (float): Segment start in seconds.
+    Returns:
+        str: Value for -vf.
+    """
+    return f"setpts=PTS+{start:.6f}/TB,subtitles={sub_filename},setpts=PTS-STARTPTS"
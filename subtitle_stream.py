@@ -0,0 +1,298 @@
+"""
+Streaming subtitle reading and writing (SRT and ASS/SSA).
+
+Cues are read lazily and decoded line by line in a single pass: a UTF-8 BOM is dropped, UTF-16 files
+are recognised by their BOM, and a file that turns out not to be UTF-8 switches to cp1252 from the
+first undecodable line on. `translate_subtitles` translates a file in bounded windows of cues and appends
+each finished window to `<output>.part`, so memory stays flat whatever the file size and an
+interrupted run keeps everything translated so far; the part file is renamed when the run completes.
+
+ASS/SSA files are copied line by line and only the text of Dialogue events is translated: script info,
+styles, comments and drawings pass through untouched. Override tags at the start or end of a line stay
+out of the request, tags inside it are masked as short placeholders ({0}, {1}...) and `\\N` breaks
+become plain line breaks, so styling survives the translation without inflating the request.
+"""
+import codecs
+import collections
+import io
+import os
+import re
+from dataclasses import dataclass
+
+DEFAULT_WINDOW = 300  # cues per translation window
+ASS_EXTENSIONS = (".ass", ".ssa")
+# Fields of an event line when the [Events] section has no Format line (same count for ASS and SSA)
+_DEFAULT_ASS_FORMAT = ["Layer", "Start", "End", "Style", "Name", "MarginL", "MarginR", "MarginV", "Effect", "Text"]
+_TIMING_RE = re.compile(r"^\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}\s*-->\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}")
+_TAGS_RE = re.compile(r"(?:\{[^}]*\}|\\[nh])+")  # override blocks, soft breaks and hard spaces
+_TRAILING_TAGS_RE = re.compile(_TAGS_RE.pattern + "$")
+_PLACEHOLDER_RE = re.compile(r"\{\s*(\d+)\s*\}")
+_DRAWING_RE = re.compile(r"\\p[1-9]")
+
+
+@dataclass
+class Cue:
+    """
+    One subtitle cue. `timing` is kept verbatim (including any position hints after the times).
+    """
+    index: int
+    timing: str
+    text: str
+
+
+def read_lines(path):
+    """
+    Decode a text file line by line in one pass.
+    Args:
+        path (str): File to read.
+    Yields:
+        tuple: (line without its end-of-line characters, bytes read so far)
+    """
+    with open(path, "rb") as f:
+        head = f.read(2)
+        f.seek(0)
+        if head in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+            with io.TextIOWrapper(f, encoding="utf-16", newline=None) as text:
+                for line in text:
+                    yield line.rstrip("\r\n"), f.tell()
+            return
+        encoding = "utf-8-sig"
+        position = 0
+        for raw in f:
+            position += len(raw)
+            try:
+                line = raw.decode(encoding)
+            except UnicodeDecodeError:
+                # Not UTF-8 after all: the usual suspect for Western subtitles
+                encoding = "cp1252"
+                line = raw.decode(encoding, errors="replace")
+            if encoding == "utf-8-sig":
+                encoding = "utf-8"  # only the first line can carry the BOM
+            yield line.rstrip("\r\n"), position
+
+
+def iter_srt(path):
+    """
+    Parse an SRT file lazily. Tolerates missing index lines and missing blank lines between cues.
+    Args:
+        path (str): SRT file.
+    Yields:
+        tuple: (Cue, bytes read so far)
+    """
+    index = timing = None
+    text = []
+    position = 0
+    count = 0
+
+    def make_cue():
+        return Cue(index if index is not None else count + 1, timing, "\n".join(text).strip("\n"))
+
+    for line, position in read_lines(path):
+        if _TIMING_RE.match(line):
+            if timing is not None:
+                # The previous cue was not closed by a blank line, its last line may be our index
+                next_index = int(text.pop().strip()) if text and text[-1].strip().isdigit() else None
+                yield make_cue(), position
+                count += 1
+                text = []
+                index = next_index
+            timing = line.strip()
+        elif timing is None:
+            if line.strip().isdigit():
+                index = int(line.strip())
+        elif not line.strip():
+            if text:
+                yield make_cue(), position
+                count += 1
+                index = timing = None
+                text = []
+        else:
+            text.append(line)
+    if timing is not None:
+        yield make_cue(), position
+
+
+class SrtWriter:
+    """
+    Append cues to `<path>.part` as they are finished, then rename it to `path`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.part_path = path + ".part"
+        self._file = open(self.part_path, "w", encoding="utf-8", newline="\n")
+        self.count = 0
+
+    def write(self, cues):
+        """
+        Write cues and flush them to disk, so they survive an interruption.
+        """
+        for cue in cues:
+            self.count += 1
+            self._file.write(f"{self.count}\n{cue.timing}\n{cue.text}\n\n")
+        self._file.flush()
+
+    def close(self, complete=True):
+        """
+        Args:
+            complete (bool): Rename the part file to the final name (False keeps it for inspection).
+        """
+        self._file.close()
+        if complete:
+            os.replace(self.part_path, self.path)
+
+
+@dataclass
+class AssEvent:
+    """
+    A Dialogue line of an ASS/SSA file. `text` is the translatable part: masked inner tags, real line breaks.
+    """
+    prefix: str  # "Dialogue: " and every field before Text
+    lead: str  # override tags before the text
+    text: str
+    trail: str  # override tags after the text
+    tags: list  # inner tags, by placeholder number
+
+    def render(self):
+        """
+        Returns:
+            str: The event line with its tags and `\\N` breaks restored.
+        """
+        def tag(match):
+            number = int(match.group(1))
+            return self.tags[number] if number < len(self.tags) else ""
+        # A placeholder the translator dropped loses its tag, the line itself is kept
+        text = _PLACEHOLDER_RE.sub(tag, self.text).replace("\n", "\\N")
+        return f"{self.prefix}{self.lead}{text}{self.trail}"
+
+
+def mask_ass_text(text):
+    """
+    Split an ASS event text into what needs translating and the tags around it.
+    Args:
+        text (str): Raw Text field.
+    Returns:
+        tuple: (leading tags, masked text, trailing tags, inner tags)
+    """
+    text = text.replace("\\N", "\n")
+    lead = trail = ""
+    match = _TAGS_RE.match(text)
+    if match:
+        lead, text = match.group(0), text[match.end():]
+    match = _TRAILING_TAGS_RE.search(text)
+    if match:
+        text, trail = text[:match.start()], match.group(0)
+    tags = []
+
+    def placeholder(match):
+        tags.append(match.group(0))
+        return "{" + str(len(tags) - 1) + "}"
+    return lead, _TAGS_RE.sub(placeholder, text), trail, tags
+
+
+def iter_ass(path):
+    """
+    Read an ASS/SSA file lazily.
+    Args:
+        path (str): ASS or SSA file.
+    Yields:
+        tuple: (AssEvent for a translatable Dialogue line, or the line itself as a str, bytes read so far)
+    """
+    section = None
+    fields = _DEFAULT_ASS_FORMAT
+    for line, position in read_lines(path):
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            section = stripped.lower()
+        elif section == "[events]" and stripped.lower().startswith("format:"):
+            fields = [f.strip() for f in stripped.split(":", 1)[1].split(",")]
+        elif section == "[events]" and line.startswith("Dialogue:") and fields[-1] == "Text":
+            values = line.split(",", len(fields) - 1)
+            if len(values) == len(fields):
+                text = values[-1]
+                lead, masked, trail, tags = mask_ass_text(text)
+                # Drawings are vector shapes, not words; blank lines have nothing to translate
+                if masked.strip() and not _DRAWING_RE.search(lead + "".join(tags)):
+                    yield AssEvent(line[:len(line) - len(text)], lead, masked, trail, tags), position
+                    continue
+        yield line, position
+
+
+class AssWriter(SrtWriter):
+    """
+    Append ASS/SSA lines to `<path>.part` as they are finished, then rename it to `path`.
+    `count` is the number of translatable events written.
+    """
+
+    def write(self, items):
+        for item in items:
+            if isinstance(item, str):
+                self._file.write(item + "\n")
+            else:
+                self.count += 1
+                self._file.write(item.render() + "\n")
+        self._file.flush()
+
+
+def translated_path(path):
+    """
+    Returns:
+        str: Where the translation of subtitle file `path` is written (`<name>_translated.<ext>`).
+    """
+    base, ext = os.path.splitext(path)
+    return f"{base}_translated{ext if ext.lower() in ASS_EXTENSIONS else '.srt'}"
+
+
+def translate_subtitles(path, output_path, submit, window=DEFAULT_WINDOW, lookahead=1, on_window=None):
+    """
+    Translate an SRT or ASS/SSA file window by window.
+    Args:
+        path (str): Source subtitle file (.ass and .ssa are read as ASS, anything else as SRT).
+        output_path (str): Translated file to write.
+        submit (callable): Takes a list of cue texts, returns a concurrent.futures.Future of the translated
+            texts (None keeps the original text of a cue).
+        window (int): Cues per window.
+        lookahead (int): Windows submitted ahead of the one being written.
+        on_window (callable): Called with (cues written so far, bytes read, file size) after each window.
+    Returns:
+        int: Number of cues written.
+    """
+    if os.path.splitext(path)[1].lower() in ASS_EXTENSIONS:
+        items, writer = iter_ass(path), AssWriter(output_path)
+    else:
+        items, writer = iter_srt(path), SrtWriter(output_path)
+    size = os.path.getsize(path)
+    in_flight = collections.deque()
+    complete = False
+
+    def send(items, position):
+        cues = [item for item in items if not isinstance(item, str)]
+        in_flight.append((items, cues, position, submit([c.text for c in cues])))
+
+    def flush_oldest():
+        items, cues, position, future = in_flight.popleft()
+        for cue, translated in zip(cues, future.result()):
+            if translated is not None:
+                cue.text = translated
+        writer.write(items)
+        if on_window:
+            on_window(writer.count, position, size)
+
+    try:
+        pending, count, position = [], 0, 0
+        for item, position in items:
+            pending.append(item)
+            count += not isinstance(item, str)
+            if count >= window:
+                send(pending, position)
+                pending, count = [], 0
+                while len(in_flight) > lookahead:
+                    flush_oldest()
+        if pending:
+            send(pending, position)
+        while in_flight:
+            flush_oldest()
+        complete = True
+    finally:
+        writer.close(complete)
+    return writer.count
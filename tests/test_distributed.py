@@ -0,0 +1,177 @@
+"""
+End-to-end tests of the distributed protocol on localhost: one coordinator, two workers, and a third
+worker that dies while it holds a job. The first test runs the workers as threads with a fake engine,
+the second runs real `python -m videocompress worker` processes with stub ffmpeg/ffprobe executables.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from distributed import Coordinator, Worker  # noqa: E402
+from scheduler import DONE, RUNNING  # noqa: E402
+
+# Stub executables: ffprobe describes any file as a 60 s 1080p H.264 video with stereo AAC, ffmpeg reports
+# five progress blocks STUB_FFMPEG_SLEEP seconds apart and then writes its output file
+STUB_FFPROBE = """
+import json, os, sys
+print(json.dumps({"format": {"duration": "60.0", "size": str(os.path.getsize(sys.argv[-1])), "bit_rate": "1000"},
+                  "streams": [{"index": 0, "codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+                               "avg_frame_rate": "24/1", "pix_fmt": "yuv420p"},
+                              {"index": 1, "codec_type": "audio", "codec_name": "aac", "bit_rate": "128000",
+                               "channels": 2}]}))
+"""
+STUB_FFMPEG = """
+import os, sys, time
+for i in range(5):
+    print(f"out_time_us={i * 12000000}\\nfps=30\\nspeed=2.0x\\ntotal_size=100\\nprogress=continue", flush=True)
+    time.sleep(float(os.environ.get("STUB_FFMPEG_SLEEP", "0.05")))
+with open(sys.argv[-2] if sys.argv[-1] == "-y" else sys.argv[-1], "wb") as f:
+    f.write(b"x" * 10)
+print("progress=end", flush=True)
+"""
+
+
+class FakeCompressionJob:
+    """
+    Stands in for engine.CompressionJob so the protocol is tested without ffmpeg.
+    """
+
+    def __init__(self, file_path, *args, **kwargs):
+        self.file_path = file_path
+        self.result = None
+        self._done = threading.Event()
+
+    def start(self):
+        def run():
+            time.sleep(0.3)
+            self.result = SimpleNamespace(success=True, error=None, mode="full encode", output_file=self.file_path + ".out",
+                                          output_size=1, timings={}, log=None)
+            self._done.set()
+        threading.Thread(target=run, daemon=True).start()
+        return self
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.result
+
+    def cancel(self):
+        pass
+
+
+class DistributedTest(unittest.TestCase):
+    def test_job_of_dead_worker_is_finished_by_live_workers(self):
+        specs = [{"file": f"/videos/movie{i}.mkv", "max_size_gb": 1} for i in range(3)]
+        coordinator = Coordinator(specs, port=0, lease_timeout=1.0).start()
+        try:
+            # A worker that claims job 0 and then dies without ever reporting
+            dead = Worker(coordinator.address, name="dead")
+            status, job = dead._request("/claim", {"worker": "dead"})
+            self.assertEqual((status, job["id"]), (200, 0))
+
+            workers = [Worker(coordinator.address, name=f"live{i}", heartbeat=0.1) for i in range(2)]
+            outcomes = []
+            with mock.patch("engine.CompressionJob", FakeCompressionJob):
+                threads = [threading.Thread(target=lambda w=w: outcomes.append(w.run()), daemon=True) for w in workers]
+                for t in threads:
+                    t.start()
+                finished = threading.Event()
+                threading.Thread(target=lambda: (coordinator.wait(poll_interval=0.1), finished.set()), daemon=True).start()
+                self.assertTrue(finished.wait(20), "coordinator never finished the batch")
+                for t in threads:
+                    t.join(20)
+                    self.assertFalse(t.is_alive(), "worker did not exit once the batch was drained")
+
+            self.assertEqual([job["state"] for job in coordinator.jobs], [DONE, DONE, DONE])
+            self.assertEqual(coordinator.jobs[0]["attempts"], 2)
+            self.assertNotEqual(coordinator.jobs[0]["worker"], "dead")
+            self.assertEqual(sum(completed for completed, failed in outcomes), 3)
+        finally:
+            coordinator.stop()
+
+
+@unittest.skipIf(os.name != "posix", "stub executables are POSIX scripts")
+class DistributedProcessTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.bin = os.path.join(self.dir, "bin")
+        os.makedirs(self.bin)
+        for name, code in (("ffmpeg", STUB_FFMPEG), ("ffprobe", STUB_FFPROBE)):
+            path = os.path.join(self.bin, name)
+            with open(path, "w") as f:
+                f.write(f"#!{sys.executable}\n" + textwrap.dedent(code))
+            os.chmod(path, 0o755)
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def start_worker(self, url, name, ffmpeg_sleep):
+        env = dict(os.environ, PATH=self.bin + os.pathsep + os.environ.get("PATH", ""), STUB_FFMPEG_SLEEP=str(ffmpeg_sleep),
+                   VIDEOCOMPRESS_PROBE_CACHE="0", XDG_CACHE_HOME=os.path.join(self.dir, "cache"))
+        # Own process group, so killing it also kills the ffmpeg it started
+        process = subprocess.Popen([sys.executable, "-m", "videocompress", "worker", url, "--name", name], cwd=REPO,
+                                   env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+        self.processes.append(process)
+        return process
+
+    def test_job_of_killed_worker_process_is_finished_by_live_workers(self):
+        inputs = []
+        for i in range(3):
+            inputs.append(os.path.join(self.dir, f"movie{i}.mp4"))
+            with open(inputs[-1], "wb") as f:
+                f.write(b"\0" * 1000)
+        specs = [{"file": path, "max_size_gb": 1, "ext": "mp4"} for path in inputs]
+        # Workers post a heartbeat every 2 s
+        coordinator = Coordinator(specs, port=0, lease_timeout=4.0).start()
+        try:
+            # A worker whose ffmpeg is slow, killed once the coordinator has seen it make progress
+            doomed = self.start_worker(coordinator.address, "doomed", ffmpeg_sleep=5)
+            deadline = time.monotonic() + 20
+            while not any(job["worker"] == "doomed" and job["state"] == RUNNING and job["progress"]
+                          for job in coordinator.jobs):
+                self.assertLess(time.monotonic(), deadline, "doomed worker never reported progress")
+                time.sleep(0.1)
+            doomed_job = next(job for job in coordinator.jobs if job["worker"] == "doomed")
+            os.killpg(doomed.pid, signal.SIGKILL)
+            doomed.wait()
+
+            workers = [self.start_worker(coordinator.address, f"live{i}", ffmpeg_sleep=0.05) for i in range(2)]
+            finished = threading.Event()
+            threading.Thread(target=lambda: (coordinator.wait(poll_interval=0.1), finished.set()), daemon=True).start()
+            self.assertTrue(finished.wait(60), "coordinator never finished the batch")
+            for worker in workers:
+                output = worker.communicate(timeout=30)[0].decode(errors="replace")
+                self.assertEqual(worker.returncode, 0, output)
+
+            self.assertEqual([job["state"] for job in coordinator.jobs], [DONE, DONE, DONE])
+            self.assertEqual(doomed_job["attempts"], 2)
+            self.assertIn(doomed_job["worker"], ("live0", "live1"))
+            for job in coordinator.jobs:
+                self.assertTrue(job["result"]["success"], job["result"])
+                self.assertTrue(os.path.exists(job["result"]["output"]))
+        finally:
+            coordinator.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+"""
+Import-time regression test: the entry points and engine modules are imported in a fresh interpreter with
+`-X importtime` (see benchmark.import_time) and must stay under a time budget without loading the GUI or
+translation stack they do not need.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import IMPORT_CHECKS, import_time  # noqa: E402
+
+# Cumulative import time allowed per module, overridable for slow CI machines
+IMPORT_BUDGET_MS = float(os.environ.get("VIDEOCOMPRESS_IMPORT_BUDGET_MS", 150))
+
+
+class ImportTest(unittest.TestCase):
+    def test_modules_import_fast_without_forbidden_modules(self):
+        for module, forbidden in IMPORT_CHECKS.items():
+            with self.subTest(module=module):
+                # Best of three, the first import also warms the bytecode cache
+                runs = [import_time(module, forbidden) for _ in range(3)]
+                self.assertIsNone(runs[-1][2])
+                self.assertEqual(runs[-1][1], [], f"{module} loads {', '.join(runs[-1][1])}")
+                wall = min(run[0] for run in runs if run[0] is not None)
+                self.assertLessEqual(wall * 1000, IMPORT_BUDGET_MS, f"{module} takes {wall * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    unittest.main()
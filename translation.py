@@ -0,0 +1,139 @@
+"""
+Batched subtitle translation.
+
+Cues are packed into requests that stay under the service's character limit. Each cue is preceded by
+a numbered marker line ([[0]], [[1]]...) that translators leave alone, so the translated text can be
+split back per cue with its line breaks intact. If a batch comes back with missing, extra or
+reordered markers, its cues are translated one by one instead. `dedupe` groups repeated lines so each
+distinct line is only sent once.
+"""
+import re
+import unicodedata
+
+DEFAULT_MAX_CHARS = 4500  # Google Translate rejects requests over 5000 characters
+DEFAULT_MAX_CUES = 100
+
+_MARKER_RE = re.compile(r"^[ \t]*\[\[[ \t]*(\d+)[ \t]*\]\][ \t]*$", re.MULTILINE)
+
+
+def normalize_text(text):
+    """
+    Canonical form of a line for caching and deduplication: NFC, trimmed, inner whitespace collapsed,
+    line breaks kept.
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines())
+
+
+def dedupe(texts):
+    """
+    Group identical cues so each distinct line is translated once.
+    Args:
+        texts (list): Cue texts.
+    Returns:
+        tuple: (unique texts, list of index lists into `texts`, one per unique text). Empty cues are left out.
+    """
+    unique, groups, seen = [], [], {}
+    for idx, text in enumerate(texts):
+        key = normalize_text(text)
+        if not key:
+            continue
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(text)
+            groups.append([])
+        groups[seen[key]].append(idx)
+    return unique, groups
+
+
+def _marker(number):
+    return f"[[{number}]]"
+
+
+def join_batch(texts):
+    """
+    Args:
+        texts (list): Cue texts, possibly multi-line.
+    Returns:
+        str: One request body with a marker line before each cue.
+    """
+    return "\n".join(f"{_marker(i)}\n{text}" for i, text in enumerate(texts))
+
+
+def split_batch(translated, count):
+    """
+    Split a translated batch back into cues.
+    Args:
+        translated (str): Response for a `join_batch` request.
+        count (int): Number of cues sent.
+    Returns:
+        list: Translated cue texts, or None if the markers do not line up.
+    """
+    if not translated:
+        return None
+    matches = list(_MARKER_RE.finditer(translated))
+    if [int(m.group(1)) for m in matches] != list(range(count)):
+        return None
+    parts = []
+    for m, nxt in zip(matches, matches[1:] + [None]):
+        end = nxt.start() if nxt else len(translated)
+        parts.append(translated[m.end():end].strip("\n").rstrip())
+    return parts
+
+
+def pack_batches(texts, max_chars=DEFAULT_MAX_CHARS, max_cues=DEFAULT_MAX_CUES):
+    """
+    Group cue indexes into batches whose joined request stays under `max_chars`.
+    Empty cues are left out, they need no translation.
+    Args:
+        texts (list): Cue texts.
+        max_chars (int): Character limit of one request.
+        max_cues (int): Maximum number of cues per request.
+    Returns:
+        list: Lists of indexes into `texts`. A cue longer than the limit gets a batch of its own.
+    """
+    batches, current, size = [], [], 0
+    for idx, text in enumerate(texts):
+        if not text or not text.strip():
+            continue
+        cost = len(text) + len(_marker(len(current))) + 2
+        if current and (size + cost > max_chars or len(current) >= max_cues):
+            batches.append(current)
+            current, size = [], 0
+            cost = len(text) + len(_marker(0)) + 2
+        current.append(idx)
+        size += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def translate_batch(translate, texts, on_error=None):
+    """
+    Translate a batch of cues in one request, falling back to one request per cue if it comes back misaligned.
+    A failed request is not retried cue by cue: a throttled or unreachable service would only get more requests.
+    Args:
+        translate (callable): Translates one string (e.g. GoogleTranslator(...).translate).
+        texts (list): Cue texts of the batch.
+        on_error (callable): Called with the exception when a request fails.
+    Returns:
+        list: Translated texts, None for cues that could not be translated.
+    """
+    if len(texts) > 1:
+        try:
+            parts = split_batch(translate(join_batch(texts)), len(texts))
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            return [None] * len(texts)
+        if parts is not None:
+            return parts
+    results = []
+    for text in texts:
+        try:
+            results.append(translate(text) or None)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            results.append(None)
+    return results
@@ -0,0 +1,193 @@
+"""
+Pluggable translation backends.
+
+`TranslationBackend` is the interface the subtitle pipeline talks to. `GoogleBackend` calls the public
+Google Translate web endpoint through one pooled `requests.Session` and retries rate limits (429) and
+server errors (5xx) with jittered exponential backoff. `LocalBackend` needs no network: it translates
+lines from a dictionary and leaves every other line unchanged, which makes the pipeline testable and
+benchmarkable offline.
+
+Pick the backend with `get_backend(name)`; the GUI reads VIDEOCOMPRESS_TRANSLATOR ('google' or
+'local') and VIDEOCOMPRESS_TRANSLATOR_DICT (a JSON file of line -> translation for the local backend).
+"""
+import html
+import json
+import os
+import random
+import re
+import time
+
+_RESULT_RE = re.compile(r'<div class="(?:result-container|t0)">(.*?)</div>', re.DOTALL)
+
+
+class TranslationError(Exception):
+    """
+    Raised when a line cannot be translated.
+    """
+
+
+class TransientError(TranslationError):
+    """
+    A failure worth retrying (rate limit, server error, network error).
+    """
+
+    def __init__(self, message, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+def with_retries(func, attempts=5, base_delay=0.5, max_delay=20.0, sleep=time.sleep):
+    """
+    Call `func` until it succeeds, sleeping with full-jitter exponential backoff after TransientError.
+    A Retry-After hint from the server is used as the minimum delay.
+    Args:
+        func (callable): Function without arguments.
+        attempts (int): Maximum number of calls.
+        base_delay (float): Delay scale in seconds (doubled after every failure).
+        max_delay (float): Upper bound of one delay.
+    Returns:
+        The result of `func`.
+    Raises:
+        TransientError: If every attempt failed.
+    """
+    for attempt in range(attempts):
+        try:
+            return func()
+        except TransientError as e:
+            if attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            sleep(max(delay, e.retry_after or 0))
+
+
+class TranslationBackend:
+    """
+    Interface of a translation service.
+    """
+    name = "base"
+    max_chars = 4500  # longest request the service accepts
+
+    def translate(self, text, source, target):
+        """
+        Args:
+            text (str): Text to translate (may contain several lines).
+            source (str): Source language code.
+            target (str): Target language code.
+        Returns:
+            str: Translated text, with the same line structure.
+        Raises:
+            TranslationError: If the text cannot be translated.
+        """
+        raise NotImplementedError
+
+    def translate_once(self, text, source, target):
+        """
+        Single attempt, for callers that run their own retry and rate-limit policy.
+        Raises:
+            TransientError: On rate limits and server or network errors.
+        """
+        return self.translate(text, source, target)
+
+    def close(self):
+        """
+        Release pooled connections.
+        """
+
+
+class GoogleBackend(TranslationBackend):
+    """
+    Google Translate web endpoint over one pooled HTTP session. Safe to share between threads.
+    """
+    name = "google"
+    url = "https://translate.google.com/m"
+
+    def __init__(self, pool_size=16, timeout=15, attempts=5):
+        """
+        Args:
+            pool_size (int): Connections kept open to the service.
+            timeout (float): Seconds to wait for one response.
+            attempts (int): Calls per text before giving up on rate limits and server errors.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._requests = requests
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.timeout = timeout
+        self.attempts = attempts
+
+    def _request(self, text, source, target):
+        try:
+            response = self.session.get(self.url, params={"sl": source, "tl": target, "q": text}, timeout=self.timeout)
+        except self._requests.RequestException as e:
+            raise TransientError(f"request failed: {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise TransientError(f"HTTP {response.status_code}", status=response.status_code,
+                                 retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if response.status_code != 200:
+            raise TranslationError(f"HTTP {response.status_code}")
+        match = _RESULT_RE.search(response.text)
+        if not match:
+            raise TranslationError("no translation in the response")
+        return html.unescape(match.group(1))
+
+    def translate(self, text, source, target):
+        return with_retries(lambda: self.translate_once(text, source, target), attempts=self.attempts)
+
+    def translate_once(self, text, source, target):
+        if not text.strip():
+            return text
+        return self._request(text, source, target)
+
+    def close(self):
+        self.session.close()
+
+
+class LocalBackend(TranslationBackend):
+    """
+    Offline backend: translates each line found in a dictionary, leaves the others unchanged.
+    """
+    name = "local"
+
+    def __init__(self, entries=None, latency=0.0):
+        """
+        Args:
+            entries (dict): Source line -> translated line (identity when empty).
+            latency (float): Seconds to wait per call, to simulate a remote service in benchmarks.
+        """
+        self.entries = entries or {}
+        self.latency = latency
+        self.calls = 0
+
+    def translate(self, text, source, target):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return "\n".join(self.entries.get(line.strip(), line) for line in text.split("\n"))
+
+
+def get_backend(name=None, **kwargs):
+    """
+    Build a backend by name.
+    Args:
+        name (str): 'google' or 'local' (default: VIDEOCOMPRESS_TRANSLATOR, else 'google').
+        **kwargs: Passed to the backend constructor.
+    Returns:
+        TranslationBackend
+    Raises:
+        ValueError: For an unknown name.
+    """
+    name = name or os.environ.get("VIDEOCOMPRESS_TRANSLATOR") or "google"
+    if name == "google":
+        return GoogleBackend(**kwargs)
+    if name == "local":
+        dict_path = os.environ.get("VIDEOCOMPRESS_TRANSLATOR_DICT")
+        if dict_path and "entries" not in kwargs:
+            with open(dict_path, encoding="utf-8") as f:
+                kwargs["entries"] = json.load(f)
+        return LocalBackend(**kwargs)
+    raise ValueError(f"Unknown translation backend '{name}' (expected 'google' or 'local').")
@@ -0,0 +1,349 @@
+"""
+Shared asyncio translation engine.
+
+One event loop, running in a background thread, carries every translation request of a session,
+whatever the number of files. Requests pass a token bucket (requests per second) and an adaptive
+concurrency limit: the limit grows slowly while responses are fast, shrinks when latency rises, and is
+halved on every 429. Blocking backend calls run in a thread pool sized to the maximum concurrency.
+
+Example:
+    engine = TranslationEngine(get_backend())
+    future = engine.submit([["Hello", "Bye"]], "en", "fr")
+    print(future.result())
+    engine.close()
+"""
+import asyncio
+import collections
+import concurrent.futures
+import random
+import threading
+import time
+from translation import dedupe, join_batch, normalize_text, pack_batches, split_batch
+from translation_backends import TransientError
+
+
+class TokenBucket:
+    """
+    Allow `rate` acquisitions per second on average, with bursts of up to `burst`. Loop-thread only.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted from observed latency and throttling (additive increase, multiplicative
+    decrease). Loop-thread only.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, target_latency=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._cond = None  # created on the loop, asyncio primitives bind to it
+
+    async def acquire(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency=None, throttled=False):
+        """
+        Args:
+            latency (float): Seconds the request took (None if it failed).
+            throttled (bool): The service answered 429.
+        """
+        if throttled:
+            self.limit = max(self.minimum, self.limit / 2)
+        elif latency is not None and latency > self.target_latency:
+            self.limit = max(self.minimum, self.limit - 1)
+        elif latency is not None:
+            # Roughly +1 per full window of fast responses
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+class TranslationEngine:
+    """
+    Translate batches of cues for any number of files under one global request budget.
+    Safe to call from any thread; results come back as concurrent.futures.Future objects.
+    """
+
+    def __init__(self, backend, max_in_flight=16, rate=8.0, burst=None, initial_concurrency=4,
+                 target_latency=2.0, attempts=5, base_delay=0.5, max_delay=20.0):
+        """
+        Args:
+            backend (TranslationBackend): Service to call.
+            max_in_flight (int): Hard cap on concurrent requests.
+            rate (float): Average requests per second (token bucket).
+            burst (float): Bucket size (default: `rate`).
+            initial_concurrency (int): Starting concurrency limit.
+            target_latency (float): Responses slower than this shrink the concurrency limit.
+            attempts (int): Calls per request before giving up on rate limits and server errors.
+            base_delay (float): Backoff scale in seconds.
+            max_delay (float): Upper bound of one backoff delay.
+        """
+        self.backend = backend
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AdaptiveLimiter(min(initial_concurrency, max_in_flight), 1, max_in_flight, target_latency)
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failed = 0  # requests given up on
+        self.latencies = collections.deque(maxlen=4096)  # seconds, most recent successful requests
+        self.latency_sum = 0.0  # seconds, every successful request
+        self.latency_count = 0
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight)
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(self._pool)
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, batches, source, target, on_batch=None, on_error=None):
+        """
+        Translate batches of cue texts.
+        Args:
+            batches (list): Lists of cue texts, one request each (see `translation.pack_batches`).
+            source (str): Source language code.
+            target (str): Target language code.
+            on_batch (callable): Called from the engine thread with (batch index, translations) as each
+                batch completes.
+            on_error (callable): Called from the engine thread with the exception of a failed request
+                (its cues come back as None).
+        Returns:
+            concurrent.futures.Future: Resolves to one list of translations per batch (None for cues
+            that could not be translated).
+        """
+        return asyncio.run_coroutine_threadsafe(self._run(batches, source, target, on_batch, on_error), self.loop)
+
+    async def _run(self, batches, source, target, on_batch, on_error):
+        async def one(i, texts):
+            result = await self.translate_batch(texts, source, target, on_error)
+            if on_batch:
+                on_batch(i, result)
+            return result
+        return await asyncio.gather(*(one(i, texts) for i, texts in enumerate(batches)))
+
+    async def translate_batch(self, texts, source, target, on_error=None):
+        """
+        Async counterpart of `translation.translate_batch`: one request for the batch, per-cue requests
+        only if the markers come back misaligned. A request that still fails after `call`'s retries marks
+        its cues as failed instead of fanning out into more requests.
+        """
+        if len(texts) > 1:
+            try:
+                parts = split_batch(await self.call(join_batch(texts), source, target), len(texts))
+            except Exception as e:
+                self.failed += 1
+                if on_error:
+                    on_error(e)
+                return [None] * len(texts)
+            if parts is not None:
+                return parts
+        results = await asyncio.gather(*(self.call(text, source, target) for text in texts), return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception):
+                self.failed += 1
+                if on_error:
+                    on_error(r)
+        return [None if isinstance(r, Exception) or not r else r for r in results]
+
+    async def call(self, text, source, target):
+        """
+        One backend request under the rate and concurrency limits, retried with jittered backoff.
+        """
+        for attempt in range(self.attempts):
+            await self.bucket.acquire()
+            await self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                self.requests += 1
+                result = await self.loop.run_in_executor(None, self.backend.translate_once, text, source, target)
+            except TransientError as e:
+                throttled = e.status == 429
+                self.throttled += throttled
+                await self.limiter.release(throttled=throttled)
+                if attempt == self.attempts - 1:
+                    raise
+                self.retries += 1
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                await asyncio.sleep(max(delay, e.retry_after or 0))
+                continue
+            except Exception:
+                await self.limiter.release()
+                raise
+            latency = time.monotonic() - start
+            self.latencies.append(latency)
+            self.latency_sum += latency
+            self.latency_count += 1
+            await self.limiter.release(latency=latency)
+            return result
+
+    def stats(self):
+        """
+        Returns:
+            dict: Request, throttle, retry and failure counters, the current concurrency limit and the latency
+            percentiles of recent requests ({"0.5": seconds, "0.9": ..., "0.99": ...}) with the total latency
+            and count of all successful requests.
+        """
+        latencies = sorted(self.latencies)
+        latency = {q: latencies[min(len(latencies) - 1, int(float(q) * len(latencies)))]
+                   for q in ("0.5", "0.9", "0.99")} if latencies else {}
+        return {"requests": self.requests, "throttled": self.throttled, "retries": self.retries, "failed": self.failed,
+                "concurrency": int(self.limiter.limit), "latency": latency,
+                "latency_sum": self.latency_sum, "latency_count": self.latency_count}
+
+    def close(self):
+        """
+        Stop the event loop and its thread pool.
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self._pool.shutdown(wait=False)
+
+
+class WindowTranslator:
+    """
+    `submit` callable for `subtitle_stream.translate_subtitles`: each window of cues is deduplicated,
+    looked up in the translation memory, and the remaining lines are sent to the engine in batches.
+    Lines already sent for an earlier window of the file are not sent again, their translation (or the
+    request still in flight) is reused. One instance per file.
+    """
+
+    def __init__(self, engine, source, target, memory=None, max_chars=None):
+        """
+        Args:
+            engine (TranslationEngine): Shared engine.
+            source (str): Source language code.
+            target (str): Target language code.
+            memory (TranslationMemory): Translation memory (None disables it).
+            max_chars (int): Request size limit (default: the backend's).
+        """
+        self.engine = engine
+        self.source = source
+        self.target = target
+        self.memory = memory
+        self.max_chars = max_chars or engine.backend.max_chars
+        self.cues = 0
+        self.from_cache = 0
+        self.batches = 0
+        self.errors = []
+        self._lines = {}  # normalized line -> Future of its translation (None if it failed), file thread only
+        self._learned = collections.deque()  # (line, translation) pairs waiting for the memory
+
+    def submit(self, texts):
+        """
+        Args:
+            texts (list): Cue texts of one window.
+        Returns:
+            concurrent.futures.Future: Translated texts, None for cues that keep their original text.
+        """
+        unique, groups = dedupe(texts)
+        results = [None] * len(texts)
+        lines = {}  # position in `unique` -> Future of its translation
+        new = []
+        for u, text in enumerate(unique):
+            line = self._lines.get(normalize_text(text))
+            if line is None or (line.done() and line.result() is None):
+                new.append(u)  # never sent, or failed for an earlier window: try again
+            else:
+                lines[u] = line
+        cached = self.memory.get_many(self.source, self.target, [unique[u] for u in new]) if self.memory and new else {}
+        for i, translated in cached.items():
+            u = new[i]
+            line = concurrent.futures.Future()
+            line.set_result(translated)
+            self._lines[normalize_text(unique[u])] = lines[u] = line
+            self.from_cache += len(groups[u])
+        self.cues += len(texts)
+        pending = [u for i, u in enumerate(new) if i not in cached]
+        for u in pending:
+            self._lines[normalize_text(unique[u])] = lines[u] = concurrent.futures.Future()
+        batches = [[pending[i] for i in batch]
+                   for batch in pack_batches([unique[u] for u in pending], self.max_chars)]
+        self.batches += len(batches)
+        window = concurrent.futures.Future()
+
+        def resolve(u, translated):
+            try:
+                lines[u].set_result(translated)
+            except concurrent.futures.InvalidStateError:
+                pass  # already resolved as failed after a cancellation
+
+        def on_batch(i, translations):
+            # Engine thread
+            for u, translated in zip(batches[i], translations):
+                if translated is not None and self.memory:
+                    self._learned.append((unique[u], translated))
+                resolve(u, translated)
+
+        def done(future):
+            # Lines of batches that never completed fail, they keep their original text
+            if future.cancelled():
+                # Engine shut down or the caller gave up: resolve the window anyway so the writer never blocks
+                self.errors.append(concurrent.futures.CancelledError("translation cancelled"))
+            elif future.exception() is not None:
+                self.errors.append(future.exception())
+            for u in pending:
+                resolve(u, None)
+
+        waiting = set(lines.values())
+        remaining = [len(waiting)]
+        lock = threading.Lock()
+
+        def line_done(_):
+            # Any thread: fill the window once every line it needs is resolved
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            for u, line in lines.items():
+                if line.result() is not None:
+                    for idx in groups[u]:
+                        results[idx] = line.result()
+            window.set_result(results)
+
+        if batches:
+            self.engine.submit([[unique[u] for u in batch] for batch in batches], self.source, self.target,
+                               on_batch=on_batch, on_error=self.errors.append).add_done_callback(done)
+        if waiting:
+            for line in waiting:
+                line.add_done_callback(line_done)
+        else:
+            window.set_result(results)
+        return window
+
+    def store(self):
+        """
+        Write the translations learned so far to the memory. Call from the file thread (e.g. in `on_window`),
+        never from the engine thread.
+        """
+        if not self.memory:
+            return
+        pairs = []
+        while self._learned:
+            pairs.append(self._learned.popleft())
+        self.memory.put_many(self.source, self.target, pairs)
@@ -0,0 +1,160 @@
+"""
+Persistent translation memory.
+
+Translated subtitle lines are stored in an SQLite database in the user cache folder, keyed by source
+language, target language and normalized text, so lines repeated across episodes ("Previously on...",
+names, lyrics) are only sent to the translator once. The database is bounded in size: the least
+recently used entries are evicted first.
+
+Set the environment variable VIDEOCOMPRESS_TRANSLATION_MEMORY=0 to disable it.
+"""
+import os
+import sqlite3
+import threading
+import time
+from translation import normalize_text
+from utils import user_cache_dir
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+_QUERY_CHUNK = 500  # stay under SQLite's bound-parameter limit
+
+
+class TranslationMemory:
+    """
+    SQLite-backed LRU cache of translated lines. Safe to share between threads.
+    """
+
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            db_path (str): Database file (default: translation_memory.sqlite3 in the user cache folder).
+            max_bytes (int): Maximum total size of stored text before LRU eviction.
+        """
+        self.db_path = db_path or os.path.join(user_cache_dir(), "translation_memory.sqlite3")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory ("
+                " source_lang TEXT, target_lang TEXT, text TEXT, translation TEXT, bytes INTEGER, last_used REAL,"
+                " PRIMARY KEY (source_lang, target_lang, text))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS memory_last_used ON memory (last_used)")
+
+    def get_many(self, source_lang, target_lang, texts):
+        """
+        Look up several lines at once.
+        Args:
+            source_lang (str): Source language code.
+            target_lang (str): Target language code.
+            texts (list): Lines to look up (normalized before the lookup).
+        Returns:
+            dict: Position in `texts` -> stored translation, for the lines found.
+        """
+        positions = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(normalize_text(text), []).append(i)
+        keys = list(positions)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _QUERY_CHUNK):
+                chunk = keys[start:start + _QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT text, translation FROM memory WHERE source_lang = ? AND target_lang = ?"
+                    f" AND text IN ({', '.join('?' * len(chunk))})",
+                    [source_lang, target_lang] + chunk
+                ).fetchall()
+                for text, translation in rows:
+                    for i in positions[text]:
+                        found[i] = translation
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE memory SET last_used = ? WHERE source_lang = ? AND target_lang = ? AND text = ?",
+                        [(now, source_lang, target_lang, text) for text, _ in rows]
+                    )
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, source_lang, target_lang, pairs):
+        """
+        Store translated lines and evict old entries if the memory grew too large.
+        Args:
+            source_lang (str): Source language code.
+            target_lang (str): Target language code.
+            pairs (list): (original text, translation) tuples.
+        """
+        now = time.time()
+        rows = []
+        for text, translation in pairs:
+            key = normalize_text(text)
+            rows.append((source_lang, target_lang, key, translation, len(key) + len(translation), now))
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO memory (source_lang, target_lang, text, translation, bytes, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM memory").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT source_lang, target_lang, text, bytes FROM memory ORDER BY last_used").fetchall()
+        for source_lang, target_lang, text, nbytes in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM memory WHERE source_lang = ? AND target_lang = ? AND text = ?",
+                               (source_lang, target_lang, text))
+            total -= nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters for this session plus stored entry count and size.
+        """
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM memory").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        """
+        Remove every stored translation.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM memory")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_memory = None
+_default_lock = threading.Lock()
+
+
+def get_default_memory():
+    """
+    Returns:
+        TranslationMemory: The shared memory, or None if disabled or the database cannot be opened.
+    """
+    global _default_memory
+    if os.environ.get("VIDEOCOMPRESS_TRANSLATION_MEMORY") == "0":
+        return None
+    with _default_lock:
+        if _default_memory is None:
+            try:
+                _default_memory = TranslationMemory()
+            except (sqlite3.Error, OSError):
+                return None
+        return _default_memory
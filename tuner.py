@@ -0,0 +1,213 @@
+"""
+Encoder preset auto-tuner.
+
+Encodes a few short windows of the input with each candidate encoder/preset at the target bitrate,
+measures throughput (fps) and quality (SSIM, PSNR) and picks the fastest candidate that meets the
+quality floor. The choice is cached per content class (source codec, resolution, frame rate and bits
+per pixel of the target), so later files of the same kind skip the trial encodes.
+"""
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from sampling import SAMPLE_COUNT, SAMPLE_SECONDS, encode_sample, measure_quality, sample_windows
+from utils import user_cache_dir
+
+# Presets tried per encoder, fastest first
+DEFAULT_PRESETS = {
+    "libx264": ["veryfast", "faster", "fast", "medium"],
+    "libx265": ["faster", "fast", "medium"],
+    "libsvtav1": ["10", "8", "6"],
+}
+DEFAULT_MIN_SSIM = 0.95
+
+
+@dataclass
+class EncoderSetting:
+    """
+    Video encoder and preset used for a full encode.
+    """
+    codec: str = "libx264"
+    preset: str = "medium"
+
+    @property
+    def label(self):
+        return f"{self.codec}/{self.preset}"
+
+    def args(self, video_bitrate_kbps, threads=None, vf=None, rate_args=None):
+        """
+        Args:
+            video_bitrate_kbps (int): Average bitrate, used when `rate_args` is not given.
+            threads (int): ffmpeg threads.
+            vf (str): Video filter.
+            rate_args (list): Rate-control arguments replacing -b:v (e.g. a capped CRF).
+        Returns:
+            list: ffmpeg video encoding arguments.
+        """
+        rate = rate_args or ["-b:v", f"{video_bitrate_kbps}k"]
+        args = ["-c:v", self.codec] + rate + ["-preset", self.preset]
+        if vf:
+            args += ["-vf", vf]
+        if threads:
+            args += ["-threads", str(threads)]
+        return args
+
+
+DEFAULT_ENCODER = EncoderSetting()
+
+
+@dataclass
+class TuneResult:
+    """
+    Setting picked by the tuner and the measurements behind it.
+    """
+    setting: EncoderSetting
+    content_class: str
+    cached: bool = False
+    trials: list = field(default_factory=list)  # one dict per candidate: codec, preset, fps, ssim, psnr, passed, error
+
+
+def content_class(media, video_bitrate_kbps):
+    """
+    Group inputs that should tune alike.
+    Args:
+        media (MediaInfo): Probed input.
+        video_bitrate_kbps (int): Target video bitrate.
+    Returns:
+        str: e.g. 'h264-1080p-24fps-bpp-3.5'
+    """
+    video = media.video
+    width, height = video.width or 1920, video.height or 1080
+    fps = video.frame_rate or 25.0
+    rows = min((480, 576, 720, 1080, 1440, 2160), key=lambda h: abs(h - height))
+    bpp = video_bitrate_kbps * 1000 / (width * height * fps)
+    # Half-octave buckets of bits per pixel, doubling the bitrate moves two buckets
+    bucket = round(math.log2(max(bpp, 1e-4)) * 2) / 2
+    return f"{video.codec_name}-{rows}p-{round(fps)}fps-bpp{bucket}"
+
+
+class PresetTuner:
+    """
+    Pick the fastest encoder setting that meets a quality floor. Safe to share between jobs.
+    """
+
+    def __init__(self, codecs=("libx264",), min_ssim=DEFAULT_MIN_SSIM, min_psnr=None, cache_path=None,
+                 samples=SAMPLE_COUNT, sample_seconds=SAMPLE_SECONDS):
+        """
+        Args:
+            codecs (tuple): Encoders to try (keys of DEFAULT_PRESETS).
+            min_ssim (float): Minimum average SSIM over the samples.
+            min_psnr (float): Optional minimum average PSNR in dB.
+            cache_path (str): JSON cache of past choices (default: tuner_cache.json in the user cache
+                folder). Pass an empty string to disable the cache.
+            samples (int): Number of sampled windows per candidate.
+            sample_seconds (float): Length of each window.
+        """
+        self.codecs = [c for c in codecs if c in DEFAULT_PRESETS]
+        self.min_ssim = min_ssim
+        self.min_psnr = min_psnr
+        self.cache_path = os.path.join(user_cache_dir(), "tuner_cache.json") if cache_path is None else cache_path
+        self.samples = samples
+        self.sample_seconds = sample_seconds
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """
+        Returns:
+            list: EncoderSetting for every codec/preset to try.
+        """
+        return [EncoderSetting(codec, preset) for codec in self.codecs for preset in DEFAULT_PRESETS[codec]]
+
+    def _cache_key(self, klass):
+        labels = ",".join(c.label for c in self.candidates())
+        return f"{klass}|{labels}|ssim>={self.min_ssim}|psnr>={self.min_psnr}"
+
+    def _load_cache(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, key, result):
+        if not self.cache_path:
+            return
+        with self._lock:
+            cache = self._load_cache()
+            cache[key] = {"codec": result.setting.codec, "preset": result.setting.preset,
+                          "trials": result.trials, "time": time.time()}
+            tmp = self.cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, self.cache_path)
+
+    def _passes(self, ssim, psnr):
+        if self.min_ssim is not None and (ssim is None or ssim < self.min_ssim):
+            return False
+        if self.min_psnr is not None and (psnr is None or psnr < self.min_psnr):
+            return False
+        return True
+
+    def _trial(self, media, setting, video_bitrate_kbps, threads, work_dir):
+        path, index = media.path, media.video.index
+        results = []
+        for i, (start, length) in enumerate(sample_windows(media.duration, self.samples, self.sample_seconds)):
+            sample_file = os.path.join(work_dir, f"{setting.codec}_{setting.preset}_{i}.mkv")
+            result = encode_sample(path, index, start, length, setting.args(video_bitrate_kbps, threads), sample_file)
+            results.append(measure_quality(path, index, result, sample_file))
+        frames = sum(r.frames or 0 for r in results)
+        elapsed = sum(r.elapsed for r in results)
+        ssims = [r.ssim for r in results if r.ssim is not None]
+        psnrs = [r.psnr for r in results if r.psnr is not None]
+        ssim = sum(ssims) / len(ssims) if ssims else None
+        psnr = sum(psnrs) / len(psnrs) if psnrs else None
+        return {"codec": setting.codec, "preset": setting.preset,
+                "fps": frames / elapsed if frames and elapsed > 0 else None,
+                "ssim": ssim, "psnr": psnr, "passed": self._passes(ssim, psnr), "error": None}
+
+    def tune(self, media, video_bitrate_kbps, threads=None):
+        """
+        Choose the encoder setting for one input, from the cache or by trial encodes.
+        Args:
+            media (MediaInfo): Probed input.
+            video_bitrate_kbps (int): Target video bitrate the full encode will use.
+            threads (int): ffmpeg threads for the trial encodes.
+        Returns:
+            TuneResult: The chosen setting. If no candidate could be measured, DEFAULT_ENCODER.
+        """
+        klass = content_class(media, video_bitrate_kbps)
+        key = self._cache_key(klass)
+        hit = self._load_cache().get(key)
+        if hit:
+            return TuneResult(EncoderSetting(hit["codec"], hit["preset"]), klass, cached=True, trials=hit["trials"])
+
+        trials = []
+        work_dir = tempfile.mkdtemp(prefix="videocompress-tune-")
+        try:
+            for setting in self.candidates():
+                try:
+                    trials.append(self._trial(media, setting, video_bitrate_kbps, threads, work_dir))
+                except (RuntimeError, OSError) as e:
+                    # Typically an encoder missing from this ffmpeg build
+                    trials.append(dict(asdict(setting), fps=None, ssim=None, psnr=None, passed=False, error=str(e)))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        measured = [t for t in trials if t["error"] is None and t["fps"]]
+        passing = [t for t in measured if t["passed"]]
+        if passing:
+            best = max(passing, key=lambda t: t["fps"])
+        elif measured:
+            # Nothing meets the floor: keep the best-looking candidate instead of the fastest
+            best = max(measured, key=lambda t: (t["ssim"] or 0, t["psnr"] or 0))
+        else:
+            return TuneResult(DEFAULT_ENCODER, klass, trials=trials)
+        result = TuneResult(EncoderSetting(best["codec"], best["preset"]), klass, trials=trials)
+        self._store(key, result)
+        return result
@@ -1,4 +1,8 @@
+import json
+import os
 import subprocess
+import sys
+from dataclasses import dataclass, field
 
 def ffprobe(cmd):
     """
@@ -14,4 +18,178 @@ def ffprobe(cmd):
         stderr=subprocess.PIPE,
         universal_newlines=True
     )
-    return result.stdout.strip()
\ No newline at end of file
+    return result.stdout.strip()
+
+
+def user_cache_dir():
+    """
+    Return (and create) the per-user cache folder for VideoCompress.
+    Uses %LOCALAPPDATA% on Windows, ~/Library/Caches on macOS and $XDG_CACHE_HOME (or ~/.cache) elsewhere.
+    Returns:
+        str: Absolute path of the cache folder.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        path = os.path.join(base, "VideoCompress", "Cache")
+    elif sys.platform == "darwin":
+        path = os.path.expanduser("~/Library/Caches/VideoCompress")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        path = os.path.join(base, "videocompress")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_rate(value):
+    """
+    Convert an ffprobe rational such as '30000/1001' to frames per second.
+    """
+    if not value or value in ("0/0", "N/A"):
+        return None
+    if "/" in value:
+        num, den = value.split("/", 1)
+        num, den = _to_float(num), _to_float(den)
+        if not num or not den:
+            return None
+        return num / den
+    return _to_float(value)
+
+
+@dataclass
+class StreamInfo:
+    """
+    One stream of a media file, as reported by ffprobe.
+    """
+    index: int
+    codec_type: str
+    codec_name: str = None
+    bit_rate: int = None
+    width: int = None
+    height: int = None
+    frame_rate: float = None
+    pix_fmt: str = None
+    channels: int = None
+    channel_layout: str = None
+    sample_rate: int = None
+    duration: float = None
+    language: str = None
+    title: str = None
+    default: bool = False
+
+    @classmethod
+    def from_ffprobe(cls, data):
+        tags = data.get("tags") or {}
+        disposition = data.get("disposition") or {}
+        return cls(
+            index=data.get("index", 0),
+            codec_type=data.get("codec_type"),
+            codec_name=data.get("codec_name"),
+            bit_rate=_to_int(data.get("bit_rate") or tags.get("BPS")),
+            width=_to_int(data.get("width")),
+            height=_to_int(data.get("height")),
+            frame_rate=_parse_rate(data.get("avg_frame_rate")) or _parse_rate(data.get("r_frame_rate")),
+            pix_fmt=data.get("pix_fmt"),
+            channels=_to_int(data.get("channels")),
+            channel_layout=data.get("channel_layout"),
+            sample_rate=_to_int(data.get("sample_rate")),
+            duration=_to_float(data.get("duration")),
+            language=tags.get("language"),
+            title=tags.get("title"),
+            default=bool(disposition.get("default")),
+        )
+
+
+@dataclass
+class MediaInfo:
+    """
+    Container-level metadata and every stream of a media file.
+    """
+    path: str
+    duration: float = None
+    format_name: str = None
+    size: int = None
+    bit_rate: int = None
+    streams: list = field(default_factory=list)
+
+    @property
+    def video_streams(self):
+        # Cover art is reported as a video stream, skip it
+        return [s for s in self.streams if s.codec_type == "video" and s.codec_name not in ("mjpeg", "png")]
+
+    @property
+    def audio_streams(self):
+        return [s for s in self.streams if s.codec_type == "audio"]
+
+    @property
+    def subtitle_streams(self):
+        return [s for s in self.streams if s.codec_type == "subtitle"]
+
+    @property
+    def video(self):
+        """
+        Returns:
+            StreamInfo: The first video stream, or None.
+        """
+        streams = self.video_streams
+        return streams[0] if streams else None
+
+    @classmethod
+    def from_ffprobe(cls, path, data):
+        fmt = data.get("format") or {}
+        streams = [StreamInfo.from_ffprobe(s) for s in data.get("streams") or []]
+        duration = _to_float(fmt.get("duration"))
+        if not duration:
+            # Some containers only report durations per stream
+            durations = [s.duration for s in streams if s.duration]
+            duration = max(durations) if durations else None
+        return cls(
+            path=path,
+            duration=duration,
+            format_name=fmt.get("format_name"),
+            size=_to_int(fmt.get("size")),
+            bit_rate=_to_int(fmt.get("bit_rate")),
+            streams=streams,
+        )
+
+
+def probe_media_json(path):
+    """
+    Run ffprobe once on a media file and return its raw JSON report.
+    Args:
+        path (str): Path to the media file.
+    Returns:
+        dict: Parsed ffprobe output ({} if ffprobe could not read the file).
+    """
+    output = ffprobe([
+        "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_format", "-show_streams", path
+    ])
+    try:
+        return json.loads(output) if output else {}
+    except ValueError:
+        return {}
+
+
+def probe_media(path):
+    """
+    Probe a media file with a single ffprobe call.
+    Args:
+        path (str): Path to the media file.
+    Returns:
+        MediaInfo: Parsed metadata (duration is None if ffprobe could not read the file).
+    """
+    return MediaInfo.from_ffprobe(path, probe_media_json(path))
@@ -0,0 +1,560 @@
+"""
+Headless command-line entry point for VideoCompress.
+
+Usage:
+    python -m videocompress compress movie1.mkv movie2.mp4 --max-size 2 --ext mp4
+    python -m videocompress compress --manifest batch.json
+
+A manifest is either a JSON list of objects (or {"jobs": [...]}) or a CSV file with a header row.
+Each entry uses the same fields as `run_compression`:
+    file, sub_option ('none', 'soft', 'hard'), sub_file, ext ('mp4', 'mkv'), max_size_gb
+plus the optional audio fields audio_lang (e.g. "eng,fre") and audio_bitrate (kbps), and priority
+('high', 'normal' or 'low': queued files start in that order).
+Missing fields fall back to the command-line defaults. Relative paths are resolved against the manifest's folder.
+
+Nothing in this module imports tkinter, so it runs on machines without a display.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from colorama import Fore, Style
+from scheduler import PRIORITIES, PRIORITY_NORMAL
+
+# Per-file status codes (the process exits with the highest one)
+STATUS_OK = 0
+STATUS_FAILED = 1
+STATUS_INVALID = 2
+
+SUB_OPTIONS = ("none", "soft", "hard")
+CONTAINERS = ("mp4", "mkv")
+
+
+def load_manifest(path):
+    """
+    Read a JSON or CSV batch manifest.
+    Args:
+        path (str): Path to the manifest file (.json or .csv).
+    Returns:
+        list: One dict per entry, with relative paths resolved against the manifest's folder.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            entries = [dict(row) for row in csv.DictReader(f)]
+        else:
+            data = json.load(f)
+            entries = data.get("jobs", []) if isinstance(data, dict) else data
+    for entry in entries:
+        for key in ("file", "sub_file"):
+            value = entry.get(key)
+            if value and not os.path.isabs(value):
+                entry[key] = os.path.join(base_dir, value)
+    return entries
+
+
+def build_jobs(entries, defaults):
+    """
+    Fill in defaults and validate batch entries.
+    Args:
+        entries (list): Dicts with at least a 'file' key.
+        defaults (dict): Default values for sub_option, sub_file, ext and max_size_gb.
+    Returns:
+        list: (job dict, error message or None) tuples, in input order.
+    """
+    jobs = []
+    for entry in entries:
+        job = dict(defaults)
+        job.update({k: v for k, v in entry.items() if v not in (None, "")})
+        job["sub_option"] = str(job.get("sub_option") or "none").lower()
+        job["ext"] = str(job.get("ext") or "mp4").lower().lstrip(".")
+        error = None
+        try:
+            job["max_size_gb"] = float(job.get("max_size_gb"))
+        except (TypeError, ValueError):
+            job["max_size_gb"] = None
+        if not job.get("file") or not os.path.isfile(job["file"]):
+            error = f"Input file not found: {job.get('file')}"
+        elif job["sub_option"] not in SUB_OPTIONS:
+            error = f"Invalid subtitle option '{job['sub_option']}' (expected one of {', '.join(SUB_OPTIONS)})"
+        elif job["sub_option"] != "none" and not (job.get("sub_file") and os.path.isfile(job["sub_file"])):
+            error = f"Subtitle file not found: {job.get('sub_file')}"
+        elif job["ext"] not in CONTAINERS:
+            error = f"Invalid container '{job['ext']}' (expected one of {', '.join(CONTAINERS)})"
+        elif not job["max_size_gb"] or job["max_size_gb"] <= 0:
+            error = "Invalid size. Must be greater than 0."
+        audio_lang = job.get("audio_lang")
+        if isinstance(audio_lang, str):
+            audio_lang = [lang.strip() for lang in audio_lang.split(",") if lang.strip()]
+        job["audio_lang"] = audio_lang or None
+        try:
+            job["audio_bitrate"] = int(job["audio_bitrate"]) if job.get("audio_bitrate") else None
+        except (TypeError, ValueError):
+            error = error or f"Invalid audio bitrate '{job.get('audio_bitrate')}'"
+        priority = str(job.get("priority") or "normal").lower()
+        if priority not in PRIORITIES:
+            error = error or f"Invalid priority '{priority}' (expected one of {', '.join(PRIORITIES)})"
+        job["priority"] = PRIORITIES.get(priority, PRIORITY_NORMAL)
+        if job["sub_option"] == "none":
+            job["sub_file"] = None
+        jobs.append((job, error))
+    return jobs
+
+
+def run_batch(jobs, max_jobs=None, total_threads=None, allow_copy=True, segments=None, journal=None, resume=False,
+              verify=False, tuner=None, predictor=None, bus=None, metrics=None):
+    """
+    Compress every valid job through the bounded scheduler, high priority jobs first. Ctrl+C cancels the
+    batch: running ffmpeg processes are terminated and their partial outputs removed.
+    Args:
+        jobs (list): Output of `build_jobs`.
+        max_jobs (int): Maximum number of concurrent ffmpeg jobs.
+        total_threads (int): ffmpeg thread budget shared by running jobs.
+        allow_copy (bool): Allow remux/stream-copy fast paths.
+        segments (int or str): Parallel segments per file ('auto' or a count).
+        journal (BatchJournal): Record every job state there (None disables the journal).
+        resume (bool): Skip jobs the journal lists as done, and reuse finished segments.
+        verify (bool): With resume, re-check the checksum of outputs before skipping them.
+        tuner (PresetTuner): Pick each file's encoder preset from trial encodes.
+        predictor (SizePredictor): Pick each file's rate control from sampled encodes.
+        bus (ProgressBus): Publish job progress there (default: a bus drawing the terminal progress).
+        metrics (MetricsRegistry): Record per-job stage timings, encode speed, sizes and bitrates there.
+    Returns:
+        list: One result dict per job (file, output, status, error, mode).
+    """
+    from engine import CompressionError, CompressionJob
+    from journal import job_key
+    from progress_bus import ProgressBus, TerminalProgress
+    from scheduler import CANCELLED, DONE, FAILED, RUNNING, JobScheduler
+
+    results = []
+    for job, error in jobs:
+        results.append({
+            "file": job.get("file"),
+            "output": None,
+            "status": STATUS_INVALID if error else None,
+            "error": error,
+            "mode": None,
+            "output_size": 0,
+            "timings": {},
+        })
+        if error:
+            print(Fore.RED + f"Skipping {job.get('file')}: {error}" + Style.RESET_ALL)
+
+    valid = [idx for idx, (job, error) in enumerate(jobs) if not error]
+    lock = threading.Lock()
+    own_bus = bus is None
+    if own_bus:
+        bus = ProgressBus()
+        bus.subscribe(TerminalProgress(single=len(valid) == 1))
+
+    def on_state(idx, state):
+        # Scheduler states are the bus states. Only DONE sets the percent, other state changes (pause,
+        # resume...) keep the last reported one
+        extra = {"percent": 100} if state == DONE else {}
+        bus.publish(jobs[idx][0]["file"], kind="compress", state=state, **extra)
+
+    scheduler = JobScheduler(max_jobs=max_jobs, total_threads=total_threads, on_state=on_state)
+
+    def compress_one(idx, threads=None):
+        job = jobs[idx][0]
+        key = job_key(job, allow_copy=allow_copy) if journal else None
+        if resume and journal:
+            entry = journal.completed(key, verify=verify)
+            if entry:
+                print(Fore.GREEN + f"[{os.path.basename(job['file'])}] Already done, skipping." + Style.RESET_ALL)
+                with lock:
+                    results[idx].update(output=entry["output"], status=STATUS_OK, mode="skipped",
+                                        output_size=entry["output_size"])
+                return True
+        if journal:
+            journal.mark(key, job["file"], RUNNING)
+        record = metrics.compression_job(job["file"]) if metrics is not None else None
+
+        def on_progress(event):
+            bus.publish(job["file"], percent=event.percent, eta=event.remaining, speed=event.speed)
+            if record:
+                record.observe(event)
+        handle = CompressionJob(job["file"], job["sub_option"], job["sub_file"], job["ext"], job["max_size_gb"],
+                                threads=threads, on_progress=on_progress,
+                                allow_copy=allow_copy, audio_languages=job["audio_lang"],
+                                audio_bitrate_kbps=job["audio_bitrate"], segments=segments, resume=resume,
+                                tuner=tuner, predictor=predictor)
+        scheduler.attach(idx, handle)
+        if tuner is not None:
+            try:
+                plan = handle.plan()
+            except (CompressionError, OSError):
+                plan = None  # reported by run()
+            if plan is not None and plan.tuning is not None:
+                source = "cached" if plan.tuning.cached else "measured"
+                print(f"[{os.path.basename(job['file'])}] Encoder {plan.encoder.label} "
+                      f"({source} for {plan.tuning.content_class})")
+        result = handle.run()
+        if record:
+            try:
+                plan = handle.plan()  # cached by run(), unless planning failed
+            except (CompressionError, OSError):
+                plan = None
+            record.finish(result, plan)
+        if journal:
+            journal.mark(key, job["file"], DONE if result.success else FAILED, result.output_file, result.error)
+        with lock:
+            results[idx]["output"] = result.output_file
+            results[idx]["status"] = STATUS_OK if result.success else STATUS_FAILED
+            results[idx]["error"] = result.error
+            results[idx]["mode"] = result.mode
+            results[idx]["output_size"] = result.output_size
+            results[idx]["predicted_size"] = result.predicted_size
+            results[idx]["timings"] = result.timings
+            results[idx]["log"] = result.log
+        return result.success
+
+    for idx in valid:
+        scheduler.submit(idx, compress_one, idx, priority=jobs[idx][0].get("priority", PRIORITY_NORMAL))
+    scheduler.start()
+    try:
+        # Poll rather than join: an interrupted Thread.join() can leave the thread looking finished
+        while scheduler.is_running():
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print(Fore.YELLOW + "\nInterrupted, cancelling the batch..." + Style.RESET_ALL)
+        scheduler.cancel_all()
+        scheduler.join()
+    if own_bus:
+        bus.close()
+    # Jobs cancelled while queued, or that raised inside the scheduler, never reached the result update
+    for idx in valid:
+        if results[idx]["status"] is None:
+            results[idx]["status"] = STATUS_FAILED
+            cancelled = scheduler.states.get(idx) == CANCELLED
+            results[idx]["error"] = "cancelled" if cancelled else "compression raised an exception"
+    return results
+
+
+def collect_jobs(args):
+    """
+    Build the validated job list from positional files, --manifest and the default options.
+    Returns:
+        list: Output of `build_jobs` (empty if no input was given).
+    """
+    entries = [{"file": os.path.abspath(path)} for path in args.files]
+    if args.manifest:
+        entries += load_manifest(args.manifest)
+    defaults = {
+        "sub_option": args.sub_option,
+        "sub_file": os.path.abspath(args.sub_file) if args.sub_file else None,
+        "ext": args.ext,
+        "max_size_gb": args.max_size,
+        "audio_lang": args.audio_lang,
+        "audio_bitrate": args.audio_bitrate,
+    }
+    return build_jobs(entries, defaults)
+
+
+def print_results(results, report=None):
+    """
+    Print one status line per file and optionally write the JSON report.
+    Returns:
+        int: Process exit code (highest per-file status code).
+    """
+    print()
+    for result in results:
+        color = Fore.GREEN if result["status"] == STATUS_OK else Fore.RED
+        detail = f"{result['output']} ({result['mode']})" if result["status"] == STATUS_OK else result["error"]
+        if result["status"] == STATUS_OK and result.get("predicted_size") and result.get("output_size"):
+            error = (result["output_size"] - result["predicted_size"]) / result["predicted_size"] * 100
+            detail += f", {result['output_size'] / 1024 ** 2:.1f} MB vs {result['predicted_size'] / 1024 ** 2:.1f} MB predicted ({error:+.1f}%)"
+        print(color + f"[{result['status']}] {result['file']}: {detail}" + Style.RESET_ALL)
+    if report:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return max(result["status"] for result in results)
+
+
+def make_progress_bus(args, single):
+    """
+    Build the progress bus of a command: terminal progress, plus JSON lines with --progress-json.
+    Returns:
+        tuple: (ProgressBus, JsonLinesProgress or None)
+    """
+    from progress_bus import JsonLinesProgress, ProgressBus, TerminalProgress
+    bus = ProgressBus(rate=args.progress_rate)
+    sink = None
+    if args.progress_json:
+        sink = JsonLinesProgress(args.progress_json)
+        bus.subscribe(sink)
+    if args.progress_json != "-":
+        # JSON on stdout replaces the terminal bar, so the stream stays machine-readable
+        bus.subscribe(TerminalProgress(single=single))
+    return bus, sink
+
+
+def cmd_compress(args):
+    """
+    Handle the `compress` sub-command.
+    Returns:
+        int: Process exit code (highest per-file status code).
+    """
+    jobs = collect_jobs(args)
+    if not jobs:
+        print(Fore.RED + "No input files. Pass video files or --manifest." + Style.RESET_ALL)
+        return STATUS_INVALID
+    from journal import BatchJournal
+    journal = BatchJournal(args.journal)
+    if not args.resume:
+        files = {os.path.abspath(job["file"]) for job, error in jobs if not error}
+        if files.intersection(journal.interrupted()):
+            print(Fore.YELLOW + "Part of this batch was interrupted earlier, use --resume to skip finished work."
+                  + Style.RESET_ALL)
+    tuner = None
+    if args.tune:
+        from tuner import PresetTuner
+        tuner = PresetTuner(codecs=args.tune_codecs, min_ssim=args.min_ssim, min_psnr=args.min_psnr)
+    predictor = None
+    if args.predict:
+        from predictor import SizePredictor
+        predictor = SizePredictor(tolerance=args.size_tolerance)
+    metrics = exporters = None
+    if args.metrics_textfile or args.metrics_port or args.metrics_json:
+        from metrics import Exporters, MetricsRegistry
+        metrics = MetricsRegistry()
+        exporters = Exporters(metrics, args.metrics_textfile, args.metrics_port, args.metrics_json)
+        if exporters.server:
+            print(Fore.YELLOW + f"Serving metrics on {exporters.server.address}" + Style.RESET_ALL)
+    bus, sink = make_progress_bus(args, single=sum(1 for job, error in jobs if not error) == 1)
+    try:
+        results = run_batch(jobs, max_jobs=args.jobs, total_threads=args.threads, allow_copy=not args.force_encode,
+                            segments=args.segments, journal=journal, resume=args.resume, verify=args.verify,
+                            tuner=tuner, predictor=predictor, bus=bus, metrics=metrics)
+    finally:
+        bus.close()
+        if sink:
+            sink.close()
+        journal.close()
+        if exporters:
+            exporters.close()
+    if metrics:
+        stages = metrics.summary()["stage_seconds"]
+        print("Time per stage: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in stages.items()))
+    return print_results(results, args.report)
+
+
+def parse_bind(value):
+    """
+    argparse type for --bind: 'host:port' or just 'port'.
+    """
+    host, _, port = value.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected host:port")
+
+
+def parse_path_map(values):
+    """
+    Convert repeated --path-map 'coordinator_prefix=worker_prefix' options into pairs.
+    """
+    pairs = []
+    for value in values or []:
+        remote, sep, local = value.partition("=")
+        if not sep:
+            raise SystemExit(f"Invalid --path-map '{value}', expected coordinator_prefix=worker_prefix")
+        pairs.append((remote, local))
+    return pairs
+
+
+def cmd_coordinator(args):
+    """
+    Handle the `coordinator` sub-command: serve the batch to remote workers and wait for the results.
+    Returns:
+        int: Process exit code (highest per-file status code).
+    """
+    from distributed import Coordinator
+    jobs = collect_jobs(args)
+    if not jobs:
+        print(Fore.RED + "No input files. Pass video files or --manifest." + Style.RESET_ALL)
+        return STATUS_INVALID
+    results, specs, spec_index = [], [], []
+    for job, error in jobs:
+        results.append({"file": job.get("file"), "output": None, "status": STATUS_INVALID if error else None,
+                        "error": error, "mode": None})
+        if error:
+            print(Fore.RED + f"Skipping {job.get('file')}: {error}" + Style.RESET_ALL)
+            continue
+        specs.append(dict(job, allow_copy=not args.force_encode, segments=args.segments))
+        spec_index.append(len(results) - 1)
+
+    def on_state(job_id, state):
+        print(f"[{os.path.basename(specs[job_id]['file'])}] {state}")
+
+    host, port = args.bind
+    bus, sink = make_progress_bus(args, single=False)
+    coordinator = Coordinator(specs, host=host, port=port, token=args.token, lease_timeout=args.lease_timeout,
+                              on_state=on_state, bus=bus).start()
+    print(Fore.YELLOW + f"Coordinator listening on {coordinator.address} with {len(specs)} job(s)." + Style.RESET_ALL)
+    try:
+        records = coordinator.wait()
+    finally:
+        coordinator.stop(grace=2.0)
+        bus.close()
+        if sink:
+            sink.close()
+    for record in records:
+        result = record["result"] or {}
+        entry = results[spec_index[record["id"]]]
+        entry.update(output=result.get("output"), error=result.get("error"), mode=result.get("mode"),
+                     worker=record["worker"], output_size=result.get("output_size"), timings=result.get("timings"),
+                     status=STATUS_OK if result.get("success") else STATUS_FAILED)
+    return print_results(results, args.report)
+
+
+def cmd_worker(args):
+    """
+    Handle the `worker` sub-command: pull jobs from a coordinator until its batch is drained.
+    Returns:
+        int: 0 if every job this worker ran succeeded, else 1.
+    """
+    from distributed import Worker
+    worker = Worker(args.url, token=args.token, name=args.name, concurrency=args.jobs, total_threads=args.threads,
+                    path_map=parse_path_map(args.path_map), wait_for_jobs=args.wait)
+    completed, failed = worker.run()
+    print(Fore.GREEN + f"Worker {worker.name}: {completed} job(s) done, {failed} failed." + Style.RESET_ALL)
+    return STATUS_FAILED if failed else STATUS_OK
+
+
+def cmd_warm_cache(args):
+    """
+    Handle the `warm-cache` sub-command: probe a folder in parallel to fill the probe cache.
+    Returns:
+        int: Process exit code.
+    """
+    from probe_cache import ProbeCache
+    cache = ProbeCache()
+    for directory in args.directories:
+        count = cache.warm(directory, workers=args.workers, recursive=not args.no_recursive)
+        print(Fore.GREEN + f"{directory}: {count} file(s) probed or already cached." + Style.RESET_ALL)
+    print(json.dumps(cache.stats()))
+    return STATUS_OK
+
+
+def segments_arg(value):
+    """
+    argparse type for --segments: a positive integer or 'auto'.
+    """
+    if value == "auto":
+        return value
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a number or 'auto'")
+    if count < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return count
+
+
+def codecs_arg(value):
+    """
+    argparse type for --tune-codecs.
+    """
+    from tuner import DEFAULT_PRESETS
+    codecs = [c.strip() for c in value.split(",") if c.strip()]
+    unknown = [c for c in codecs if c not in DEFAULT_PRESETS]
+    if unknown or not codecs:
+        raise argparse.ArgumentTypeError(f"choose from {', '.join(DEFAULT_PRESETS)}")
+    return codecs
+
+
+def build_parser():
+    """
+    Returns:
+        argparse.ArgumentParser: Parser for all sub-commands.
+    """
+    parser = argparse.ArgumentParser(prog="videocompress", description="Headless VideoCompress command-line interface.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    def add_job_arguments(sub):
+        sub.add_argument("files", nargs="*", help="Video files to compress.")
+        sub.add_argument("--manifest", help="JSON or CSV batch manifest with per-file options.")
+        sub.add_argument("--sub-option", choices=SUB_OPTIONS, default="none", help="Default subtitle option.")
+        sub.add_argument("--sub-file", help="Default subtitle file (for soft/hard).")
+        sub.add_argument("--ext", choices=CONTAINERS, default="mp4", help="Default output container.")
+        sub.add_argument("--max-size", type=float, help="Default target maximum file size in GB.")
+        sub.add_argument("--audio-lang", help="Keep only these audio languages, comma-separated (e.g. eng,fre).")
+        sub.add_argument("--audio-bitrate", type=int, help="AAC bitrate in kbps for re-encoded audio tracks.")
+        sub.add_argument("--segments", type=segments_arg,
+                         help="Encode each file as N parallel segments joined losslessly ('auto': one per core for long files).")
+        sub.add_argument("--force-encode", action="store_true", help="Always re-encode, even if the input already fits.")
+        sub.add_argument("--report", help="Write per-file results as JSON to this path.")
+        sub.add_argument("--progress-json", metavar="PATH",
+                         help="Append progress updates as JSON lines to PATH ('-' for stdout, replacing the progress bar).")
+        sub.add_argument("--progress-rate", type=float, default=4.0, help="Progress updates per second (default: 4).")
+
+    compress = subparsers.add_parser("compress", help="Compress one or more video files.")
+    add_job_arguments(compress)
+    compress.add_argument("--jobs", type=int, help="Concurrent ffmpeg jobs (default: physical core count).")
+    compress.add_argument("--threads", type=int, help="Total ffmpeg thread budget (default: logical CPU count).")
+    compress.add_argument("--tune", action="store_true",
+                          help="Pick the fastest preset that meets the quality floor from short trial encodes.")
+    compress.add_argument("--tune-codecs", type=codecs_arg, default=["libx264"],
+                          help="Encoders the tuner may pick, comma-separated (libx264, libx265, libsvtav1).")
+    compress.add_argument("--min-ssim", type=float, default=0.95, help="Quality floor for --tune (average SSIM).")
+    compress.add_argument("--min-psnr", type=float, help="Optional PSNR floor in dB for --tune.")
+    compress.add_argument("--predict", action="store_true",
+                          help="Pick CRF or capped VBR from sampled encodes instead of a flat average bitrate.")
+    compress.add_argument("--size-tolerance", type=float, default=0.05,
+                          help="Relative size error accepted by --predict before falling back to capped VBR.")
+    compress.add_argument("--resume", action="store_true",
+                          help="Skip files finished by an earlier run and reuse its finished segments.")
+    compress.add_argument("--verify", action="store_true", help="With --resume, re-check output checksums first.")
+    compress.add_argument("--journal", help="Batch journal database (default: journal.sqlite3 in the user cache folder).")
+    compress.add_argument("--metrics-textfile", metavar="PATH",
+                          help="Keep per-job metrics in this Prometheus textfile (refreshed every 15 s).")
+    compress.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics.")
+    compress.add_argument("--metrics-json", metavar="PATH", help="Write the batch metrics summary as JSON to PATH.")
+    compress.set_defaults(func=cmd_compress)
+
+    coordinator = subparsers.add_parser("coordinator", help="Serve a batch to remote workers over HTTP.")
+    add_job_arguments(coordinator)
+    coordinator.add_argument("--bind", type=parse_bind, default=("127.0.0.1", 8765),
+                             help="host:port to listen on (default 127.0.0.1:8765, use 0.0.0.0 for other hosts).")
+    coordinator.add_argument("--token", help="Shared secret workers must present.")
+    coordinator.add_argument("--lease-timeout", type=float, default=120,
+                             help="Seconds without a heartbeat before a job is handed to another worker.")
+    coordinator.set_defaults(func=cmd_coordinator)
+
+    worker = subparsers.add_parser("worker", help="Pull jobs from a coordinator and compress them locally.")
+    worker.add_argument("url", help="Coordinator URL, e.g. http://encoder-1:8765")
+    worker.add_argument("--token", help="Shared secret expected by the coordinator.")
+    worker.add_argument("--name", help="Worker name shown by the coordinator (default: host-pid).")
+    worker.add_argument("--jobs", type=int, default=1, help="Jobs run at once on this worker.")
+    worker.add_argument("--threads", type=int, help="Total ffmpeg thread budget (default: logical CPU count).")
+    worker.add_argument("--path-map", action="append",
+                        help="coordinator_prefix=worker_prefix for the shared storage (repeatable).")
+    worker.add_argument("--wait", action="store_true", help="Keep polling for new jobs instead of exiting.")
+    worker.set_defaults(func=cmd_worker)
+
+    warm = subparsers.add_parser("warm-cache", help="Probe every video in a folder to fill the probe cache.")
+    warm.add_argument("directories", nargs="+", help="Folders to scan.")
+    warm.add_argument("--workers", type=int, default=8, help="Concurrent ffprobe processes.")
+    warm.add_argument("--no-recursive", action="store_true", help="Do not scan sub-folders.")
+    warm.set_defaults(func=cmd_warm_cache)
+    return parser
+
+
+def main(argv=None):
+    """
+    Parse arguments and run the selected sub-command.
+    Returns:
+        int: Process exit code.
+    """
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())